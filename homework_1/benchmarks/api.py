@@ -0,0 +1,397 @@
+'''Нагрузочный бенчмарк API меню. Заполняет БД каталогом заданного размера,
+гоняет запросы к приложению из main.py внутри процесса через ASGI и через
+uvicorn и для каждого эндпоинта считает задержки p50/p95/p99, пропускную
+способность и количество SQL запросов на запрос к API. Отчет в JSON можно
+сравнивать между коммитами. Запуск из папки проекта:
+
+    python -m benchmarks.api [--menus 100 --submenus 10 --dishes 10]
+        [--database-url sqlite+aiosqlite://] [--transport asgi --transport uvicorn]
+        [--requests 500] [--concurrency 10] [--output report.json]
+        [--baseline previous.json]
+
+По умолчанию используется БД из настроек(DB__*) с накаченными миграциями.
+Каталог бенчмарка удаляется из нее после прогона. С sqlite+aiosqlite схема
+создается по моделям, без триггеров; эндпоинты записи на SQLite пропускаются,
+так как UPDATE ... RETURNING там не поддерживается
+
+'''
+import argparse
+import asyncio
+import json
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any
+
+import httpx
+import sqlalchemy
+import uvicorn
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from core.orm import Base, create_db_session, get_async_engine
+from core.settings.settings import settings
+from main import app
+from tests.catalog import Catalog, drop_catalog, seed_catalog
+
+
+API_PREFIX = settings.app.api_v1_str
+
+
+@dataclass(frozen=True)
+class Scenario:
+    '''Эндпоинт под нагрузкой: метод, шаблон пути и генератор запросов'''
+    name: str
+    method: str
+    make_request: Callable[[Catalog, random.Random], tuple[str, dict | None]]
+    write: bool = False
+
+
+@dataclass
+class ScenarioResult:
+    '''Результат прогона сценария через один транспорт'''
+    transport: str
+    endpoint: str
+    requests: int
+    errors: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    rps: float
+    queries_per_request: float
+    statuses: dict[str, int] = field(default_factory=dict)
+
+
+SCENARIOS = (
+    Scenario(
+        'GET /menus',
+        'GET',
+        lambda catalog, rnd: (f'{API_PREFIX}/menus?limit=50', None),
+    ),
+    Scenario(
+        'GET /menus/{menu_id}',
+        'GET',
+        lambda catalog, rnd: (f'{API_PREFIX}/menus/{rnd.choice(catalog.menu_ids)}', None),
+    ),
+    Scenario(
+        'GET /menus/{menu_id}/submenus',
+        'GET',
+        lambda catalog, rnd: (
+            f'{API_PREFIX}/menus/{rnd.choice(catalog.menu_ids)}/submenus?limit=50',
+            None,
+        ),
+    ),
+    Scenario(
+        'GET /menus/{menu_id}/submenus/{submenu_id}',
+        'GET',
+        lambda catalog, rnd: (
+            '{}/menus/{}/submenus/{}'.format(API_PREFIX, *rnd.choice(catalog.submenu_ids)),
+            None,
+        ),
+    ),
+    Scenario(
+        'GET /submenus/{submenu_id}/dishes',
+        'GET',
+        lambda catalog, rnd: (
+            '{}/submenus/{}/dishes?limit=50'.format(
+                API_PREFIX,
+                rnd.choice(catalog.submenu_ids)[1],
+            ),
+            None,
+        ),
+    ),
+    Scenario(
+        'GET /submenus/{submenu_id}/dishes/{dish_id}',
+        'GET',
+        lambda catalog, rnd: (
+            '{}/submenus/{}/dishes/{}'.format(API_PREFIX, *rnd.choice(catalog.dish_ids)),
+            None,
+        ),
+    ),
+    Scenario(
+        'GET /menus/{menu_id}/tree',
+        'GET',
+        lambda catalog, rnd: (f'{API_PREFIX}/menus/{rnd.choice(catalog.menu_ids)}/tree', None),
+    ),
+    Scenario(
+        'GET /menus/{menu_id}/stats',
+        'GET',
+        lambda catalog, rnd: (
+            f'{API_PREFIX}/menus/{rnd.choice(catalog.menu_ids)}/stats',
+            None,
+        ),
+    ),
+    Scenario(
+        'PATCH /submenus/{submenu_id}/dishes/{dish_id}',
+        'PATCH',
+        lambda catalog, rnd: (
+            '{}/submenus/{}/dishes/{}'.format(API_PREFIX, *rnd.choice(catalog.dish_ids)),
+            {'price': str(Decimal(rnd.randint(100, 100000)) / 100)},
+        ),
+        write=True,
+    ),
+)
+
+
+class QueryCounter:
+    '''Счетчик SQL запросов, выполненных движком'''
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.count = 0
+        event.listen(engine.sync_engine, 'before_cursor_execute', self._increment)
+
+    def _increment(self, *args: Any) -> None:
+        self.count += 1
+
+
+@asynccontextmanager
+async def open_client(transport: str) -> AsyncIterator[httpx.AsyncClient]:
+    '''HTTP клиент к приложению: напрямую через ASGI или через
+    uvicorn на свободном локальном порту в том же процессе
+
+    '''
+    if transport == 'asgi':
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url='http://benchmark',
+        ) as client:
+            yield client
+            return
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning', lifespan='off'),
+    )
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        if server_task.done():
+            server_task.result()
+        await asyncio.sleep(0.01)
+
+    try:
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}') as client:
+            yield client
+    finally:
+        server.should_exit = True
+        await server_task
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    transport: str,
+    scenario: Scenario,
+    catalog: Catalog,
+    query_counter: QueryCounter,
+    arguments: argparse.Namespace,
+) -> ScenarioResult:
+    '''Прогнать сценарий: разогрев, затем requests запросов
+    в concurrency параллельных потоков
+
+    '''
+    rnd = random.Random(arguments.seed)
+    requests = [scenario.make_request(catalog, rnd) for _ in range(arguments.requests)]
+    warmup = [scenario.make_request(catalog, rnd) for _ in range(arguments.warmup)]
+
+    async def send(url: str, body: dict | None) -> httpx.Response:
+        return await client.request(scenario.method, url, json=body)
+
+    for url, body in warmup:
+        await send(url, body)
+
+    latencies = []
+    statuses: dict[str, int] = {}
+    queue = iter(requests)
+
+    async def worker() -> None:
+        for url, body in queue:
+            started_at = time.perf_counter()
+            response = await send(url, body)
+            latencies.append((time.perf_counter() - started_at) * 1000)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    queries_before = query_counter.count
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(arguments.concurrency)))
+    elapsed = time.perf_counter() - started_at
+    queries = query_counter.count - queries_before
+
+    percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+
+    return ScenarioResult(
+        transport=transport,
+        endpoint=scenario.name,
+        requests=len(latencies),
+        errors=sum(amount for status, amount in statuses.items() if not status.startswith('2')),
+        p50_ms=round(percentiles[49], 3),
+        p95_ms=round(percentiles[94], 3),
+        p99_ms=round(percentiles[98], 3),
+        mean_ms=round(statistics.fmean(latencies), 3),
+        rps=round(len(latencies) / elapsed, 1),
+        queries_per_request=round(queries / len(latencies), 2),
+        statuses=dict(sorted(statuses.items())),
+    )
+
+
+def make_meta(arguments: argparse.Namespace, engine: AsyncEngine) -> dict[str, Any]:
+    '''Параметры прогона для отчета'''
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'commit': commit,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlalchemy': sqlalchemy.__version__,
+        'dialect': engine.dialect.name,
+        'catalog': {
+            'menus': arguments.menus,
+            'submenus_per_menu': arguments.submenus,
+            'dishes_per_submenu': arguments.dishes,
+        },
+        'requests': arguments.requests,
+        'warmup': arguments.warmup,
+        'concurrency': arguments.concurrency,
+        'seed': arguments.seed,
+        'cache_enabled': settings.cache.enabled,
+        'fast_serialization': settings.app.fast_serialization,
+    }
+
+
+def print_results(results: list[ScenarioResult], baseline: dict | None) -> None:
+    '''Таблица результатов, при наличии baseline -- с изменением p50 и rps'''
+    baseline_results = {
+        (result['transport'], result['endpoint']): result
+        for result in (baseline or {}).get('results', ())
+    }
+
+    for result in results:
+        line = (
+            f'{result.transport:<8} {result.endpoint:<46} '
+            f'p50 {result.p50_ms:8.2f}  p95 {result.p95_ms:8.2f}  p99 {result.p99_ms:8.2f} ms  '
+            f'{result.rps:8.1f} rps  {result.queries_per_request:5.2f} q/req'
+        )
+        if result.errors:
+            line += f'  errors {result.errors}'
+
+        previous = baseline_results.get((result.transport, result.endpoint))
+        if previous:
+            line += '  p50 {:+.1f}%  rps {:+.1f}%'.format(
+                (result.p50_ms / previous['p50_ms'] - 1) * 100,
+                (result.rps / previous['rps'] - 1) * 100,
+            )
+        print(line)
+
+
+async def run(arguments: argparse.Namespace) -> dict[str, Any]:
+    if arguments.database_url:
+        engine_options = {}
+        if arguments.database_url.startswith('sqlite'):
+            # БД в памяти живет, пока открыто ее единственное соединение
+            engine_options['poolclass'] = StaticPool
+        engine = create_async_engine(arguments.database_url, **engine_options)
+        session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+        async def create_benchmark_db_session() -> AsyncIterator[AsyncSession]:
+            async with session_factory() as db_session:
+                yield db_session
+
+        app.dependency_overrides[create_db_session] = create_benchmark_db_session
+    else:
+        engine = get_async_engine()
+
+    if engine.dialect.name == 'sqlite':
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+    scenarios = [
+        scenario for scenario in SCENARIOS
+        if not scenario.write or engine.dialect.name != 'sqlite'
+    ]
+
+    query_counter = QueryCounter(engine)
+    rnd = random.Random(arguments.seed)
+    catalog = await seed_catalog(engine, arguments.menus, arguments.submenus, arguments.dishes, rnd)
+
+    results = []
+    try:
+        for transport in arguments.transport:
+            async with open_client(transport) as client:
+                for scenario in scenarios:
+                    results.append(await run_scenario(
+                        client,
+                        transport,
+                        scenario,
+                        catalog,
+                        query_counter,
+                        arguments,
+                    ))
+    finally:
+        await drop_catalog(engine, catalog)
+        app.dependency_overrides.pop(create_db_session, None)
+        await engine.dispose()
+
+    return {
+        'meta': make_meta(arguments, engine),
+        'results': [asdict(result) for result in results],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Нагрузочный бенчмарк API меню')
+    parser.add_argument('--menus', type=int, default=100, help='Количество меню')
+    parser.add_argument('--submenus', type=int, default=10, help='Подменю в каждом меню')
+    parser.add_argument('--dishes', type=int, default=10, help='Блюд в каждом подменю')
+    parser.add_argument(
+        '--database-url',
+        help='Урл БД вместо настроек DB__*, например sqlite+aiosqlite:// для CI',
+    )
+    parser.add_argument(
+        '--transport',
+        action='append',
+        choices=('asgi', 'uvicorn'),
+        help='Через что слать запросы, можно указать несколько раз(по умолчанию оба)',
+    )
+    parser.add_argument('--requests', type=int, default=500, help='Запросов на эндпоинт')
+    parser.add_argument('--warmup', type=int, default=20, help='Запросов на разогрев')
+    parser.add_argument('--concurrency', type=int, default=10, help='Параллельных клиентов')
+    parser.add_argument('--seed', type=int, default=0, help='Seed генератора данных и запросов')
+    parser.add_argument('--output', help='Файл для JSON отчета')
+    parser.add_argument('--baseline', help='JSON отчет предыдущего прогона для сравнения')
+    arguments = parser.parse_args()
+    arguments.transport = arguments.transport or ['asgi', 'uvicorn']
+
+    report = asyncio.run(run(arguments))
+
+    baseline = None
+    if arguments.baseline:
+        with open(arguments.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results([ScenarioResult(**result) for result in report['results']], baseline)
+
+    if arguments.output:
+        with open(arguments.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+'''Профиль времени импорта: несколько раз импортирует модуль в отдельном
+процессе с python -X importtime и для каждого импортированного модуля
+считает медиану собственного и накопленного времени импорта. Отчет в JSON
+можно сравнивать между коммитами и использовать в CI, чтобы тяжелые
+зависимости не возвращались в холодный старт. Запуск из папки проекта:
+
+    python -m benchmarks.imports [--module main] [--repeat 5] [--top 25]
+        [--forbid jose --forbid asyncpg] [--output report.json]
+        [--baseline previous.json] [--max-regression-ms 50]
+
+Модуль также импортируется без переменных окружения и .env: импорт не
+должен читать настройки. Код выхода 1, если импорт прочитал настройки,
+импортирован запрещенный модуль или общее время импорта выросло
+относительно baseline больше, чем на --max-regression-ms
+
+'''
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any
+
+
+PROJECT_PACKAGES = ('core', 'main', 'menu', 'migration')
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+@dataclass
+class ModuleImportTime:
+    '''Время импорта модуля в миллисекундах: собственное, без вложенных
+    импортов, и накопленное
+
+    '''
+    module: str
+    self_ms: float
+    cumulative_ms: float
+
+
+def profile_once(module: str) -> dict[str, tuple[float, float]]:
+    '''Импортировать модуль в новом процессе и разобрать вывод importtime'''
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True,
+        text=True,
+        env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'},
+    )
+    if completed.returncode:
+        raise RuntimeError(f'import {module} failed:\n{completed.stderr}')
+
+    timings = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            timings[name] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+
+    return timings
+
+
+def reads_settings_on_import(module: str) -> bool:
+    '''Импортировать модуль в новом процессе без переменных окружения
+    проекта и вне папки проекта, где нет .env, и проверить, что
+    настройки не загружались
+
+    '''
+    check = (
+        f'import {module}\n'
+        'from core.settings.settings import get_settings\n'
+        'print(get_settings.cache_info().currsize)\n'
+    )
+    with tempfile.TemporaryDirectory() as empty_directory:
+        completed = subprocess.run(
+            [sys.executable, '-c', check],
+            capture_output=True,
+            text=True,
+            cwd=empty_directory,
+            env={
+                'PATH': os.environ.get('PATH', ''),
+                'PYTHONDONTWRITEBYTECODE': '1',
+                'PYTHONPATH': os.getcwd(),
+            },
+        )
+    if completed.returncode:
+        raise RuntimeError(f'import {module} without settings failed:\n{completed.stderr}')
+
+    return int(completed.stdout) > 0
+
+
+def profile(module: str, repeat: int) -> list[ModuleImportTime]:
+    '''Медианы времени импорта по repeat прогонам. Первый прогон
+    отбрасывается: он прогревает файловый кэш и байткод
+
+    '''
+    profile_once(module)
+    runs = [profile_once(module) for _ in range(repeat)]
+
+    results = []
+    for name in runs[0]:
+        measurements = [run[name] for run in runs if name in run]
+        results.append(ModuleImportTime(
+            module=name,
+            self_ms=round(statistics.median(self_ms for self_ms, _ in measurements), 3),
+            cumulative_ms=round(
+                statistics.median(cumulative_ms for _, cumulative_ms in measurements),
+                3,
+            ),
+        ))
+
+    return results
+
+
+def is_project_module(name: str) -> bool:
+    return name.split('.')[0] in PROJECT_PACKAGES
+
+
+def find_forbidden(results: list[ModuleImportTime], forbidden: list[str]) -> list[str]:
+    '''Запрещенные модули(и их подмодули), которые попали в импорт'''
+    return sorted({
+        prefix
+        for result in results
+        for prefix in forbidden
+        if result.module == prefix or result.module.startswith(f'{prefix}.')
+    })
+
+
+def make_meta(arguments: argparse.Namespace) -> dict[str, Any]:
+    '''Параметры прогона для отчета'''
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'commit': commit,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'module': arguments.module,
+        'repeat': arguments.repeat,
+    }
+
+
+def print_results(
+    results: list[ModuleImportTime],
+    module: str,
+    top: int,
+    baseline: dict | None,
+) -> None:
+    '''Общее время импорта, самые дорогие модули по собственному времени
+    и модули проекта по накопленному, при наличии baseline -- с изменением
+
+    '''
+    baseline_results = {
+        result['module']: result
+        for result in (baseline or {}).get('results', ())
+    }
+
+    def format_line(result: ModuleImportTime) -> str:
+        line = (
+            f'{result.module:<60} self {result.self_ms:8.2f}  '
+            f'cumulative {result.cumulative_ms:8.2f} ms'
+        )
+        previous = baseline_results.get(result.module)
+        if previous:
+            line += f'  {result.cumulative_ms - previous["cumulative_ms"]:+.2f} ms'
+        elif baseline is not None:
+            line += '  new'
+
+        return line
+
+    total = next(result for result in results if result.module == module)
+    print(f'Total: {format_line(total)}')
+
+    print(f'\nTop {top} modules by self time:')
+    for result in sorted(results, key=lambda result: -result.self_ms)[:top]:
+        print(format_line(result))
+
+    print('\nProject modules by cumulative time:')
+    for result in sorted(results, key=lambda result: -result.cumulative_ms):
+        if is_project_module(result.module):
+            print(format_line(result))
+
+    if baseline is not None:
+        imported = {result.module for result in results}
+        dropped = sorted({name.split('.')[0] for name in set(baseline_results) - imported})
+        if dropped:
+            print(f'\nNo longer imported: {", ".join(dropped)}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Профиль времени импорта')
+    parser.add_argument('--module', default='main', help='Импортируемый модуль')
+    parser.add_argument('--repeat', type=int, default=5, help='Количество прогонов')
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=25,
+        help='Сколько самых дорогих модулей вывести',
+    )
+    parser.add_argument(
+        '--forbid',
+        action='append',
+        default=[],
+        help='Модуль, который не должен импортироваться, можно указать несколько раз',
+    )
+    parser.add_argument('--output', help='Файл для JSON отчета')
+    parser.add_argument('--baseline', help='JSON отчет предыдущего прогона для сравнения')
+    parser.add_argument(
+        '--max-regression-ms',
+        type=float,
+        help='Допустимый рост общего времени импорта относительно baseline',
+    )
+    arguments = parser.parse_args()
+
+    results = profile(arguments.module, arguments.repeat)
+
+    baseline = None
+    if arguments.baseline:
+        with open(arguments.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+    print_results(results, arguments.module, arguments.top, baseline)
+
+    if arguments.output:
+        report = {
+            'meta': make_meta(arguments),
+            'results': [asdict(result) for result in results],
+        }
+        with open(arguments.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, ensure_ascii=False, indent=2, sort_keys=True)
+
+    failures = []
+    if reads_settings_on_import(arguments.module):
+        failures.append(f'import {arguments.module} reads settings')
+
+    forbidden = find_forbidden(results, arguments.forbid)
+    if forbidden:
+        failures.append(f'forbidden modules imported: {", ".join(forbidden)}')
+
+    if baseline is not None and arguments.max_regression_ms is not None:
+        total = next(result for result in results if result.module == arguments.module)
+        previous = next(
+            (result for result in baseline['results'] if result['module'] == arguments.module),
+            None,
+        )
+        regression = total.cumulative_ms - previous['cumulative_ms'] if previous else 0
+        if regression > arguments.max_regression_ms:
+            failures.append(f'import time grew by {regression:.2f} ms')
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
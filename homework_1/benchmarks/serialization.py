@@ -0,0 +1,137 @@
+'''Микробенчмарк сериализации ответов эндпоинтов чтения: стандартный путь
+FastAPI(валидация response_model в orm_mode + jsonable_encoder + JSONResponse)
+против FastSerializer. Перед замером проверяется, что ответы совпадают
+байт в байт. Запуск из папки проекта:
+
+    python -m benchmarks.serialization [--items 50] [--repeat 2000] [--seed 0]
+
+'''
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from collections.abc import Callable
+from decimal import Decimal
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from core.schemas.pagination import PageSchema
+from core.utils.serialization import FastSerializer
+from menu.models.dish import DishModel
+from menu.models.menu import MenuModel
+from menu.schemas.dish import DishReadSchema, dish_read_serializer, quantize_price
+from menu.schemas.menu import MenuReadSchema, menu_read_serializer
+
+
+def make_dishes(amount: int) -> list[DishModel]:
+    '''Блюда со случайными ценами в копейках, как они хранятся в NUMERIC(10, 2)'''
+    return [
+        DishModel(
+            id=uuid.uuid4(),
+            name=f'Блюдо {index}',
+            price=quantize_price(Decimal(random.randint(1, 99999999)) / 100),
+            submenu_id=uuid.uuid4(),
+            version=1,
+        )
+        for index in range(amount)
+    ]
+
+
+def make_menus(amount: int) -> list[MenuModel]:
+    return [
+        MenuModel(
+            id=uuid.uuid4(),
+            name=f'Меню {index}',
+            version=1,
+            submenus_amount=random.randint(0, 100),
+            dishes_amount=random.randint(0, 10000),
+        )
+        for index in range(amount)
+    ]
+
+
+def fastapi_renderer(response_model: Any) -> Callable[[Any], bytes]:
+    '''Сериализация так же, как ее выполняет FastAPI для response_model'''
+    field = create_response_field(name='response', type_=response_model)
+    loop = asyncio.new_event_loop()
+
+    def render(content: Any) -> bytes:
+        serialized = loop.run_until_complete(
+            serialize_response(field=field, response_content=content),
+        )
+        return JSONResponse(serialized).body
+
+    return render
+
+
+def measure(render: Callable[[Any], bytes], content: Any, repeat: int) -> float:
+    '''Среднее время одной сериализации в микросекундах'''
+    started_at = time.perf_counter()
+    for _ in range(repeat):
+        render(content)
+
+    return (time.perf_counter() - started_at) / repeat * 1_000_000
+
+
+def run_case(
+    name: str,
+    response_model: Any,
+    serializer: FastSerializer,
+    content: Any,
+    repeat: int,
+) -> None:
+    render_fastapi = fastapi_renderer(response_model)
+    if isinstance(content, dict):
+        def render_fast(page):
+            return serializer.page_response(page['items'], page['next_cursor']).body
+    else:
+        def render_fast(obj):
+            return serializer.response(obj).body
+
+    assert render_fastapi(content) == render_fast(content), f'{name}: ответы отличаются'
+
+    fastapi_us = measure(render_fastapi, content, repeat)
+    fast_us = measure(render_fast, content, repeat)
+    print(
+        f'{name:<24} pydantic: {fastapi_us:10.1f} us   '
+        f'fast: {fast_us:10.1f} us   x{fastapi_us / fast_us:.1f}'
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Бенчмарк сериализации ответов')
+    parser.add_argument('--items', type=int, default=50, help='Размер страницы списка')
+    parser.add_argument('--repeat', type=int, default=2000, help='Количество повторов')
+    parser.add_argument('--seed', type=int, default=0, help='Seed генератора случайных данных')
+    arguments = parser.parse_args()
+
+    random.seed(arguments.seed)
+
+    dishes = make_dishes(arguments.items)
+    menus = make_menus(arguments.items)
+    next_cursor = 'eyJpZCI6IDF9'
+
+    run_case('dish', DishReadSchema, dish_read_serializer, dishes[0], arguments.repeat)
+    run_case(
+        f'dish page({arguments.items})',
+        PageSchema[DishReadSchema],
+        dish_read_serializer,
+        {'items': dishes, 'next_cursor': next_cursor},
+        arguments.repeat,
+    )
+    run_case('menu', MenuReadSchema, menu_read_serializer, menus[0], arguments.repeat)
+    run_case(
+        f'menu page({arguments.items})',
+        PageSchema[MenuReadSchema],
+        menu_read_serializer,
+        {'items': menus, 'next_cursor': next_cursor},
+        arguments.repeat,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -4,6 +4,20 @@ from core.errors.base import BaseAppError
 from core.errors.error_codes import AppErrorCode
 
 
+class BadRequestError(BaseAppError):
+    '''Некорректные параметры запроса'''
+    _http_status_code = status.HTTP_400_BAD_REQUEST
+    _message: str = 'Некорректный запрос'
+    _code: AppErrorCode = AppErrorCode.BADREQUEST
+
+
+class UnauthorizedError(BaseAppError):
+    '''Запрос без валидных данных авторизации'''
+    _http_status_code = status.HTTP_401_UNAUTHORIZED
+    _message: str = 'Требуется авторизация'
+    _code: AppErrorCode = AppErrorCode.UNAUTHORIZED
+
+
 class ResourceNotFoundError(BaseAppError):
     '''Не найден запрашиваемый ресурс -- запись в БД и тд'''
     _http_status_code = status.HTTP_404_NOT_FOUND
@@ -1,23 +1,130 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+import asyncio
+import logging
+import os
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from core.settings.db import DBSettings
 from core.settings.settings import settings
+from core.utils.db_pool import InstrumentedAsyncQueuePool
+
+
+logger = logging.getLogger('db')
+
+
+def make_connect_args(db_settings: DBSettings) -> dict[str, Any]:
+    '''Собрать параметры подключения asyncpg для режима кэша
+    подготовленных выражений
+
+    '''
+    if db_settings.statement_cache_mode == 'enabled':
+        return dict(
+            prepared_statement_cache_size=db_settings.statement_cache_size,
+            statement_cache_size=db_settings.statement_cache_size,
+        )
+
+    connect_args = dict(prepared_statement_cache_size=0, statement_cache_size=0)
+    if db_settings.statement_cache_mode == 'pgbouncer':
+        from core.utils.asyncpg_connection import UniqueStatementNameConnection
+
+        connect_args['connection_class'] = UniqueStatementNameConnection
+
+    return connect_args
+
+
+def create_db_engine(db_settings: DBSettings) -> AsyncEngine:
+    '''Создать движок БД с инструментированным пулом. Соединения
+    открываются при первом обращении, а не при создании движка.
+    Трассировка и метрики импортируются здесь, чтобы импорт моделей
+    (например, в миграциях) не тянул их и не читал настройки
+
+    '''
+    from core.utils.request_metrics import get_request_metrics
+    from core.utils.sql_tracer import get_sql_tracer
+
+    engine = create_async_engine(
+        db_settings.url,
+        connect_args=make_connect_args(db_settings),
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=db_settings.pool_size,
+        max_overflow=db_settings.max_overflow,
+        pool_timeout=db_settings.pool_timeout,
+        pool_recycle=db_settings.pool_recycle,
+        pool_pre_ping=db_settings.pool_pre_ping,
+    )
+    get_sql_tracer().instrument(engine.sync_engine)
+    get_request_metrics().instrument(engine.sync_engine)
+
+    return engine
 
 
-async_engine = create_async_engine(
-    settings.db.url,
-    echo=True,
-    connect_args=dict(prepared_statement_cache_size=0),
-)
-async_db_session = sessionmaker(
-    async_engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
+# Движок и pid процесса, в котором он создан: после fork воркер создает
+# свой движок и пул, соединения родительского процесса не используются
+_async_engine: AsyncEngine | None = None
+_async_engine_pid: int | None = None
+
+async_db_session = sessionmaker(class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
 
+def get_async_engine() -> AsyncEngine:
+    '''Движок БД текущего процесса, создается при первом обращении'''
+    global _async_engine, _async_engine_pid
+
+    if _async_engine is None or _async_engine_pid != os.getpid():
+        _async_engine = create_db_engine(settings.db)
+        _async_engine_pid = os.getpid()
+        async_db_session.configure(bind=_async_engine)
+
+    return _async_engine
+
+
+async def warm_up_db_engine() -> None:
+    '''Заранее открыть соединения пула, чтобы первые запросы воркера
+    не ждали их установки. Недоступность БД при старте не мешает
+    запуску: соединения будут открыты при первых запросах
+
+    '''
+    engine = get_async_engine()
+    warmup_size = settings.db.pool_warmup_size
+    if warmup_size is None:
+        warmup_size = settings.db.pool_size
+
+    connections = [engine.connect() for _ in range(min(warmup_size, settings.db.pool_size))]
+    results = await asyncio.gather(
+        *(connection.start() for connection in connections),
+        return_exceptions=True,
+    )
+    # Соединения возвращаются в пул и остаются открытыми
+    await asyncio.gather(*(
+        connection.close()
+        for connection, result in zip(connections, results)
+        if not isinstance(result, BaseException)
+    ))
+
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        logger.warning(
+            'Pool warm-up opened %s of %s connections: %r',
+            len(connections) - len(errors),
+            len(connections),
+            errors[0],
+        )
+
+
+async def dispose_db_engine() -> None:
+    '''Закрыть соединения пула движка текущего процесса'''
+    global _async_engine, _async_engine_pid
+
+    if _async_engine is not None and _async_engine_pid == os.getpid():
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_engine_pid = None
+
+
 async def create_db_session() -> AsyncSession:
     '''Генератор для создания объекта асинхронной сессии'''
-    async with async_db_session() as db_session:
+    async with async_db_session(bind=get_async_engine()) as db_session:
         yield db_session
@@ -1,22 +1,51 @@
-from collections.abc import Sequence
+import uuid
+from collections.abc import AsyncIterator, Iterable, Sequence
 from typing import Any, TypeVar
 
-from sqlalchemy import delete, insert, select, update, func
+from sqlalchemy import (
+    Table,
+    UniqueConstraint,
+    bindparam,
+    cast,
+    column as sql_column,
+    delete,
+    insert,
+    select,
+    tuple_,
+    update,
+    values as sql_values,
+    func,
+    inspect,
+)
+from sqlalchemy.sql.base import Executable
 from sqlalchemy.sql.dml import (
-    Delete as DeleteQuery,
     Insert as InsertQuery,
     Update as UpdateQuery,
+    UpdateBase as DMLQuery,
 )
 from sqlalchemy.engine.row import Row as SQLAlchemyRow
 from sqlalchemy.engine.result import ChunkedIteratorResult
 from sqlalchemy.exc import IntegrityError, NoResultFound
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.sql.selectable import Select as SelectQuery
 
 from core.errors.app_errors import ResourceConflictError, ResourceNotFoundError
 from core.orm import Base
+from core.repositories.cache import Generations, RepositoryCache, find_related_tables
 from core.repositories.enums import SQLOperators
-from core.repositories.utils import convert_sqlalchemy_row_to_model
+from core.repositories.statements import (
+    LIKE_ESCAPE_CHAR,
+    conditions_params,
+    conditions_shape,
+    prefix_upper_bound,
+    statement_cache,
+)
+from core.repositories.utils import (
+    decode_cursor,
+    encode_cursor,
+    get_integrity_error_details,
+)
 
 
 Model = TypeVar('Model', bound=Base)
@@ -26,18 +55,31 @@ WhereCondition = tuple[str, SQLOperators, Any]
 class Repository:
     '''Репозиторный слой для работы с БД'''
 
-    def __init__(self, session: AsyncSession) -> None:
+    def __init__(
+        self,
+        session: AsyncSession,
+        cache: RepositoryCache | None = None,
+    ) -> None:
         self.session = session
+        self.cache = cache
+        # Модели, измененные в текущей транзакции: их записи в кэше
+        # инвалидируются повторно после коммита
+        self._changed_models: set[type[Model]] = set()
+        # Промахи кэша, ожидающие сохранения результата: теги записи
+        # и их поколения до чтения из БД
+        self._pending_cache_sets: dict[str, tuple[Sequence[type[Model]], Generations]] = {}
 
     def add_obj_to_session(self, model: type[Model], data: dict[str, Any]) -> Model:
         '''Добавить объект в сессию для его создания при следующем коммите'''
         obj = model(**data)
         self.session.add(obj)
+        self._changed_models.add(model)
 
         return obj
 
     async def commit(self) -> None:
         '''Закоммитить изменения из сессии'''
+        new_objs = list(self.session.new)
         try:
             await self.session.commit()
         except IntegrityError as exception:
@@ -46,16 +88,63 @@ class Repository:
                 system_error_message=str(exception),
             )
 
+        # Триггеры БД при вставке созданных объектов могли изменить их
+        # родительские строки. Сами созданные объекты остаются загруженными
+        self._expire_related_objs({type(obj) for obj in new_objs}, keep_objs=new_objs)
+
+        changed_models, self._changed_models = self._changed_models, set()
+        if self.cache is not None and changed_models:
+            await self.cache.invalidate(changed_models)
+
     async def delete(
         self,
         *,
         model: type[Model],
         conditions: Sequence[WhereCondition],
-    ) -> None:
-        '''Удалить объекты из БД по условию'''
-        query = self._generate_delete_query(model, conditions)
+    ) -> dict[str, int]:
+        '''Удалить объекты из БД по условию одним DELETE ... RETURNING.
+        Возвращает количество удаленных строк по таблицам, включая
+        каскадно удаленные дочерние. Если ничего не удалено, ошибка 404
+
+        '''
+        deleted_ids, deleted_counts = await self._delete_returning(model, conditions)
+        if not deleted_ids:
+            raise ResourceNotFoundError(
+                user_error_message='Объект не может быть удален, так как не найден',
+                details={
+                    'conditions': {
+                        str(condition[0]): str(condition[2]) for condition in conditions
+                    },
+                },
+            )
+
+        return deleted_counts
+
+    async def delete_by_ids(
+        self,
+        *,
+        model: type[Model],
+        ids: Sequence[uuid.UUID],
+        conditions: Sequence[WhereCondition] = (),
+    ) -> dict[str, int]:
+        '''Удалить объекты по списку id одним DELETE ... RETURNING и вернуть
+        количество удаленных строк по таблицам. Если часть id не найдена,
+        ошибка 404 со списком ненайденных id: изменения не коммитятся
+
+        '''
+        deleted_ids, deleted_counts = await self._delete_returning(
+            model,
+            (*conditions, ('id', SQLOperators.IN, list(ids))),
+        )
+
+        not_found_ids = [obj_id for obj_id in ids if obj_id not in deleted_ids]
+        if not_found_ids:
+            raise ResourceNotFoundError(
+                user_error_message='Часть объектов не может быть удалена, так как не найдена',
+                details={'ids': [str(obj_id) for obj_id in not_found_ids]},
+            )
 
-        await self.session.execute(query)
+        return deleted_counts
 
     async def insert(
         self,
@@ -73,10 +162,105 @@ class Repository:
                 user_error_message='Создаваемый объект нарушает существующие ограничения данных',
                 system_error_message=str(exception),
             )
+        await self._invalidate_cache(model)
+
+    async def insert_and_return(
+        self,
+        *,
+        model: type[Model],
+        data: list[dict[str, Any]],
+    ) -> list[Model]:
+        '''Создать записи одним INSERT ... RETURNING и вернуть объекты
+        в порядке data. Конфликты уникальных ограничений проверяются
+        заранее и возвращаются в деталях ошибки с номерами строк
+
+        '''
+        data = [{'id': uuid.uuid4(), **row} for row in data]
+        await self._raise_for_unique_conflicts(model, data)
+
+        query = self._select_returned_objs(model, insert(model).values(data).returning(model))
+        try:
+            results = await self.session.execute(query)
+        except IntegrityError as exception:
+            raise ResourceConflictError(
+                user_error_message='Создаваемые объекты нарушают существующие ограничения данных',
+                system_error_message=str(exception),
+                details=get_integrity_error_details(exception),
+            )
+
+        objs_by_id = {obj.id: obj for obj in results.scalars().all()}
+        await self._invalidate_cache(model, fresh_objs=objs_by_id.values())
+
+        return [objs_by_id[row['id']] for row in data]
+
+    async def update_many_and_return(
+        self,
+        *,
+        model: type[Model],
+        data: list[dict[str, Any]],
+        conditions: Sequence[WhereCondition] = (),
+    ) -> list[Model]:
+        '''Обновить записи по id из data через UPDATE ... FROM (VALUES ...)
+        и вернуть объекты в порядке data. Строки с одинаковым набором
+        обновляемых колонок обновляются одним запросом
+
+        '''
+        await self._raise_for_unique_conflicts(model, data)
+
+        rows_by_columns: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+        for row in data:
+            columns = tuple(column for column in row if column != 'id')
+            rows_by_columns.setdefault(columns, []).append(row)
+
+        objs_by_id = {}
+        for columns, rows in rows_by_columns.items():
+            if not columns:
+                continue
+
+            query = self._select_returned_objs(
+                model,
+                self._generate_update_from_values_query(model, columns, rows, conditions),
+            )
+            try:
+                results = await self.session.execute(query, self._query_params(conditions))
+            except IntegrityError as exception:
+                raise ResourceConflictError(
+                    user_error_message=(
+                        'Обновление объектов нарушает существующие ограничения данных'
+                    ),
+                    system_error_message=str(exception),
+                    details=get_integrity_error_details(exception),
+                )
+            objs_by_id.update((obj.id, obj) for obj in results.scalars().all())
+        await self._invalidate_cache(model, fresh_objs=objs_by_id.values())
+
+        # Строки без обновляемых колонок только проверяются на существование
+        ids_without_changes = [row['id'] for row in data if row.keys() == {'id'}]
+        if ids_without_changes:
+            existing_objs = await self.select_list(
+                model=model,
+                conditions=(*conditions, ('id', SQLOperators.IN, ids_without_changes)),
+            )
+            objs_by_id.update((obj.id, obj) for obj in existing_objs)
+
+        not_found_rows = [index for index, row in enumerate(data) if row['id'] not in objs_by_id]
+        if not_found_rows:
+            raise ResourceNotFoundError(
+                user_error_message='Часть объектов не может быть обновлена, так как не найдена',
+                details={
+                    'errors': [
+                        {'index': index, 'id': str(data[index]['id'])} for index in not_found_rows
+                    ],
+                },
+            )
+
+        return [objs_by_id[row['id']] for row in data]
 
     async def rollback(self) -> None:
         '''Откатить изменения сессии'''
         await self.session.rollback()
+        self.session.expunge_all()
+        self._changed_models.clear()
 
     async def select_list(
         self,
@@ -90,9 +274,27 @@ class Repository:
         списка объектов
 
         '''
+        cache_key = self._make_cache_key(
+            'select_list',
+            model,
+            conditions=conditions,
+            joins=joins,
+            joins_conditions=joins_conditions,
+        )
+        cached = await self._get_from_cache(
+            cache_key,
+            model,
+            models=(model, *(joins or ()), *(joins_conditions or {})),
+        )
+        if cached is not None:
+            return cached[0]
+
         results = await self._select(model, conditions, joins, joins_conditions)
+        objs = results.scalars().all()
+
+        await self._set_to_cache(cache_key, objs)
 
-        return results.scalars().all()
+        return objs
 
     async def select_one(
         self,
@@ -106,10 +308,30 @@ class Repository:
         одного объекта
 
         '''
+        if not joins and not joins_conditions:
+            obj = self._get_from_identity_map(model, conditions)
+            if obj is not None:
+                return obj
+
+        cache_key = self._make_cache_key(
+            'select_one',
+            model,
+            conditions=conditions,
+            joins=joins,
+            joins_conditions=joins_conditions,
+        )
+        cached = await self._get_from_cache(
+            cache_key,
+            model,
+            models=(model, *(joins or ()), *(joins_conditions or {})),
+        )
+        if cached is not None:
+            return cached[0][0]
+
         results = await self._select(model, conditions, joins, joins_conditions)
 
         try:
-            return results.scalar_one()
+            obj = results.scalar_one()
         except NoResultFound as exception:
             raise ResourceNotFoundError(
                 user_error_message='Запрашиваемый объект не найден',
@@ -121,6 +343,10 @@ class Repository:
                 },
             )
 
+        await self._set_to_cache(cache_key, [obj])
+
+        return obj
+
     async def select_count(
         self,
         *,
@@ -128,9 +354,96 @@ class Repository:
         conditions: Sequence[WhereCondition] | None = None,
     ) -> int:
         '''Получить количество записей'''
-        conditions = self._parse_conditions(model, conditions)
-        query = select(func.count()).select_from(model).where(conditions)
-        return await self.select_scalar_one(query=query)
+        conditions = conditions or ()
+        shape = ('count', model, conditions_shape(conditions))
+        query = statement_cache.get(shape)
+        if query is None:
+            parsed_conditions = self._parse_conditions(model, conditions)
+            query = select(func.count()).select_from(model).where(*parsed_conditions)
+            statement_cache.set(shape, query)
+
+        return await self.select_scalar_one(query=query, params=self._query_params(conditions))
+
+    async def select_version(
+        self,
+        *,
+        model: type[Model],
+        conditions: Sequence[WhereCondition],
+    ) -> int:
+        '''Получить только версию одного объекта, не читая строку целиком.
+        Используется для проверки условных запросов(ETag)
+
+        '''
+        obj = self._get_from_identity_map(model, conditions)
+        if obj is not None:
+            return obj.version
+
+        shape = ('version', model, conditions_shape(conditions))
+        query = statement_cache.get(shape)
+        if query is None:
+            parsed_conditions = self._parse_conditions(model, conditions)
+            query = select(model.version).where(*parsed_conditions)
+            statement_cache.set(shape, query)
+
+        return await self.select_scalar_one(query=query, params=self._query_params(conditions))
+
+    async def select_page(
+        self,
+        *,
+        model: type[Model],
+        conditions: Sequence[WhereCondition],
+        limit: int,
+        cursor: str | None = None,
+        order_by: Sequence[str] = ('name', 'id'),
+        joins: Sequence[Model] | None = None,
+    ) -> tuple[list[Model], str | None]:
+        '''Выполнить SELECT страницы объектов с keyset пагинацией
+        по колонкам order_by. Вернуть объекты страницы и курсор
+        следующей страницы(None, если страница последняя)
+
+        '''
+        cache_key = self._make_cache_key(
+            'select_page',
+            model,
+            conditions=conditions,
+            limit=limit,
+            cursor=cursor,
+            order_by=order_by,
+            joins=joins,
+        )
+        cached = await self._get_from_cache(cache_key, model, models=(model, *(joins or ())))
+        if cached is not None:
+            return cached
+
+        order_columns = [getattr(model, column) for column in order_by]
+        query = self._generate_select_page_query(
+            model,
+            conditions,
+            order_by=order_by,
+            with_cursor=cursor is not None,
+            joins=joins,
+        )
+
+        params = self._query_params(conditions)
+        if cursor is not None:
+            cursor_values = decode_cursor(cursor, order_columns)
+            params.update(
+                (f'cursor_{index}', value) for index, value in enumerate(cursor_values)
+            )
+        # Берем на одну запись больше, чтобы понять, есть ли следующая страница
+        params['limit'] = limit + 1
+
+        results = await self.session.execute(query, params)
+        rows = results.all()
+
+        objs = [row[0] for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = encode_cursor([getattr(objs[-1], column) for column in order_by])
+
+        await self._set_to_cache(cache_key, objs, meta=next_cursor)
+
+        return objs, next_cursor
 
     async def update(
         self,
@@ -143,28 +456,31 @@ class Repository:
         query = self._generate_update_query(model, data, conditions)
 
         try:
-            await self.session.execute(query)
+            await self.session.execute(query, self._update_params(data, conditions))
         except IntegrityError as exception:
             raise ResourceConflictError(
                 user_error_message='Обновление объекта нарушает существующие ограничения данных',
                 system_error_message=str(exception),
             )
+        await self._invalidate_cache(model)
 
-    @convert_sqlalchemy_row_to_model
     async def update_and_return_one(
         self,
         *,
         model: type[Model],
         data: dict[str, Any],
         conditions: Sequence[WhereCondition],
-    ) -> SQLAlchemyRow:
-        '''Обновить и вернуть один объект из БД'''
-        query = self._generate_update_query(model, data, conditions)
+    ) -> Model:
+        '''Обновить и вернуть один объект из БД. Если объект уже есть
+        в identity map сессии, он обновляется на месте
+
+        '''
+        query = self._generate_update_query(model, data, conditions, returning=True)
 
-        results = await self.session.execute(query.returning(model))
+        results = await self.session.execute(query, self._update_params(data, conditions))
 
         try:
-            return results.one()
+            obj = results.scalar_one()
         except NoResultFound as exception:
             raise ResourceNotFoundError(
                 user_error_message='Объект не может быть обновлен, так как не найден',
@@ -175,13 +491,21 @@ class Repository:
                     },
                 },
             )
+        await self._invalidate_cache(model, fresh_objs=(obj,))
 
-    async def select_scalar_one(self, *, query: SelectQuery) -> Model:
+        return obj
+
+    async def select_scalar_one(
+        self,
+        *,
+        query: SelectQuery,
+        params: dict[str, Any] | None = None,
+    ) -> Model:
         '''Выполнить SELECT данных из нужной таблицы для получения
         одного объекта
 
         '''
-        results = await self.session.execute(query)
+        results = await self.session.execute(query, params)
         try:
             return results.unique().scalar_one()
         except NoResultFound as exception:
@@ -191,17 +515,256 @@ class Repository:
                 details={},
             )
 
+    async def select_rows(
+        self,
+        *,
+        operation: str,
+        query: SelectQuery,
+        params: dict[str, Any],
+        models: Sequence[type[Model]],
+    ) -> list[dict[str, Any]]:
+        '''Выполнить произвольный SELECT(например, с агрегатами) и вернуть
+        строки словарями. Результат кэшируется по имени операции
+        и параметрам запроса с тегами таблиц из models
+
+        '''
+        cache_key = self._make_cache_key(operation, models[0], params=params)
+        cached = await self._get_from_cache(cache_key, models[0], models=models)
+        if cached is not None:
+            return cached[1]
+
+        results = await self.session.execute(query, params)
+        rows = [row._asdict() for row in results.all()]
+
+        await self._set_to_cache(cache_key, [], meta=rows)
+
+        return rows
+
+    async def stream_rows(
+        self,
+        *,
+        query: SelectQuery,
+        params: dict[str, Any] | None = None,
+        chunk_size: int,
+    ) -> AsyncIterator[SQLAlchemyRow]:
+        '''Выполнить SELECT через серверный курсор и отдавать строки
+        по мере чтения пачками по chunk_size, не загружая весь
+        результат в память
+
+        '''
+        results = await self.session.stream(
+            query.execution_options(yield_per=chunk_size),
+            params,
+        )
+        async for partition in results.partitions():
+            for row in partition:
+                yield row
+
+    def _make_cache_key(self, operation: str, model: type[Model], **params: Any) -> str | None:
+        '''Составить ключ кэша для чтения. Если кэш выключен или в текущей
+        транзакции есть незакоммиченные изменения, кэш не используется
+
+        '''
+        if self.cache is None or self._changed_models:
+            return None
+
+        return self.cache.make_key(operation, model, **params)
+
+    async def _get_from_cache(
+        self,
+        cache_key: str | None,
+        model: type[Model],
+        *,
+        models: Sequence[type[Model]],
+    ) -> tuple[list[Model], Any] | None:
+        '''Получить результат чтения из кэша. При промахе запомнить
+        поколения таблиц models до чтения из БД: результат сохранится
+        в кэш, только если их никто не инвалидировал за время чтения
+
+        '''
+        if cache_key is None:
+            return None
+
+        cached = await self.cache.get(cache_key, model)
+        if cached is None:
+            generations = await self.cache.get_generations(models)
+            self._pending_cache_sets[cache_key] = (models, generations)
+
+        return cached
+
+    async def _set_to_cache(
+        self,
+        cache_key: str | None,
+        objs: Sequence[Model],
+        *,
+        meta: Any = None,
+    ) -> None:
+        '''Сохранить в кэш результат чтения, для которого был промах'''
+        if cache_key is None or cache_key not in self._pending_cache_sets:
+            return
+
+        models, generations = self._pending_cache_sets.pop(cache_key)
+        await self.cache.set(cache_key, objs, models=models, generations=generations, meta=meta)
+
+    async def _invalidate_cache(
+        self,
+        model: type[Model],
+        fresh_objs: Iterable[Model] = (),
+        deleted: bool = False,
+    ) -> None:
+        '''Инвалидировать записи кэша, зависящие от измененной модели,
+        и пометить устаревшими затронутые изменением объекты сессии.
+        fresh_objs только что загружены из RETURNING и остаются актуальными
+
+        '''
+        self._changed_models.add(model)
+        self._expire_related_objs((model,), keep_objs=fresh_objs, cascade_children=deleted)
+
+        if self.cache is not None:
+            await self.cache.invalidate((model,))
+
+    def _expire_related_objs(
+        self,
+        models: Iterable[type[Model]],
+        keep_objs: Iterable[Model] = (),
+        cascade_children: bool = False,
+    ) -> None:
+        '''Пометить устаревшими объекты сессии из таблиц моделей и их
+        родительских таблиц, а при удалении -- и каскадно удаляемых дочерних:
+        их строки могли изменить триггеры или каскад. Объекты остаются
+        в identity map и перечитываются на месте при следующем чтении,
+        объекты остальных таблиц переиспользуются без запросов. keep_objs
+        держит вызывающий код, их атрибуты должны остаться загруженными
+
+        '''
+        affected_tables = set()
+        for model in models:
+            affected_tables |= find_related_tables(model.__table__, cascade_children)
+        if not affected_tables:
+            return
+
+        keep_objs = set(map(id, keep_objs))
+        for obj in list(self.session.identity_map.values()):
+            if obj.__table__ in affected_tables and id(obj) not in keep_objs:
+                self.session.expire(obj)
+
+    def _get_from_identity_map(
+        self,
+        model: type[Model],
+        conditions: Sequence[WhereCondition],
+    ) -> Model | None:
+        '''Найти объект в identity map сессии, если он запрашивается только
+        по первичному ключу и уже был загружен в рамках текущего запроса
+
+        '''
+        if len(conditions) != 1:
+            return None
+
+        column_name, sql_operator, value = conditions[0]
+        if column_name != 'id' or sql_operator != SQLOperators.EQ:
+            return None
+
+        obj = self.session.identity_map.get(identity_key(model, value))
+        if obj is None:
+            return None
+
+        state = inspect(obj)
+        if state.expired_attributes or state.deleted:
+            return None
+
+        return obj
+
+    @staticmethod
+    def _select_returned_objs(model: type[Model], query: DMLQuery) -> Executable:
+        '''Загрузить строки из RETURNING как объекты модели через identity
+        map: уже загруженные в сессию объекты обновляются на месте
+
+        '''
+        return (
+            select(model)
+            .from_statement(query)
+            .execution_options(populate_existing=True)
+        )
+
+    async def _delete_returning(
+        self,
+        model: type[Model],
+        conditions: Sequence[WhereCondition],
+    ) -> tuple[set[uuid.UUID], dict[str, int]]:
+        '''Выполнить запрос удаления и вернуть id удаленных объектов
+        и количество удаленных строк по таблицам
+
+        '''
+        query = self._generate_delete_query(model, conditions)
+
+        results = await self.session.execute(query, self._query_params(conditions))
+        rows = results.all()
+        if rows:
+            await self._invalidate_cache(model, deleted=True)
+
+        deleted_counts = {model.__tablename__: len(rows)}
+        # Количества дочерних строк одинаковы во всех строках результата
+        for column in list(query.selected_columns)[1:]:
+            deleted_counts[column.name] = rows[0]._mapping[column.name] if rows else 0
+
+        return {row.id for row in rows}, deleted_counts
+
     def _generate_delete_query(
         self,
         model: type[Model],
         conditions: Sequence[WhereCondition],
-    ) -> DeleteQuery:
-        '''Составить DELETE запрос в соответсвии с условиями'''
-        parsed_conditions = self._parse_conditions(model, conditions)
-        query = delete(model).where(*parsed_conditions)
+    ) -> SelectQuery:
+        '''Составить запрос удаления в соответсвии с формой условий:
+        DELETE ... RETURNING в CTE и SELECT id удаленных строк вместе
+        с количеством каскадно удаляемых строк дочерних таблиц. Весь
+        запрос видит снимок БД до удаления, поэтому дочерние строки
+        считаются в том же запросе, до срабатывания каскада
+
+        '''
+        shape = ('delete', model, conditions_shape(conditions))
+        query = statement_cache.get(shape)
+        if query is None:
+            parsed_conditions = self._parse_conditions(model, conditions)
+            deleted = delete(model).where(*parsed_conditions).returning(model.id).cte('deleted')
+            cascade_counts = [
+                select(func.count())
+                .select_from(table)
+                .where(condition)
+                .scalar_subquery()
+                .label(table.name)
+                for table, condition in self._find_cascade_conditions(
+                    model.__table__,
+                    select(deleted.c.id),
+                ).items()
+            ]
+            query = select(deleted.c.id, *cascade_counts)
+            statement_cache.set(shape, query)
 
         return query
 
+    @staticmethod
+    def _find_cascade_conditions(table: Table, deleted_ids: Any) -> dict[Table, Any]:
+        '''Условия отбора строк дочерних таблиц, которые удаляются
+        каскадно вместе со строками table с id из deleted_ids
+
+        '''
+        cascade_conditions = {}
+
+        parents = [(table, deleted_ids)]
+        while parents:
+            parent, parent_ids = parents.pop()
+            for child in parent.metadata.sorted_tables:
+                for foreign_key in child.foreign_keys:
+                    is_cascade = (
+                        foreign_key.column.table is parent and foreign_key.ondelete == 'CASCADE'
+                    )
+                    if is_cascade and child not in cascade_conditions:
+                        condition = foreign_key.parent.in_(parent_ids)
+                        cascade_conditions[child] = condition
+                        parents.append((child, select(child.c.id).where(condition)))
+
+        return cascade_conditions
+
     def _generate_insert_query(
         self,
         model: type[Model],
@@ -212,6 +775,46 @@ class Repository:
 
         return query
 
+    @staticmethod
+    def _generate_update_from_values_query(
+        model: type[Model],
+        columns: Sequence[str],
+        rows: Sequence[dict[str, Any]],
+        conditions: Sequence[WhereCondition],
+    ) -> UpdateQuery:
+        '''Составить UPDATE ... FROM (VALUES ...) RETURNING запрос
+        для строк с одинаковым набором колонок
+
+        '''
+        data_columns = ['id', *columns]
+        column_types = [getattr(model, column).type for column in data_columns]
+        # Типы параметров внутри VALUES Postgres иначе выводит как text,
+        # поэтому значения явно приводятся к типам колонок модели
+        data = sql_values(
+            *(
+                sql_column(column, column_type)
+                for column, column_type in zip(data_columns, column_types)
+            ),
+            name='data',
+        ).data([
+            tuple(
+                cast(row[column], column_type)
+                for column, column_type in zip(data_columns, column_types)
+            )
+            for row in rows
+        ])
+
+        parsed_conditions = Repository._parse_conditions(model, conditions)
+        query = (
+            update(model)
+            .where(model.id == data.c.id, *parsed_conditions)
+            .values({column: data.c[column] for column in columns})
+            .returning(model)
+            .execution_options(synchronize_session=False)
+        )
+
+        return query
+
     def _generate_select_query(
         self,
         model: type[Model],
@@ -219,10 +822,52 @@ class Repository:
         joins: Sequence[Model] | None = None,
         joins_conditions: dict[Model, Sequence[WhereCondition]] | None = None,
     ) -> SelectQuery:
-        '''Составить SELECT запрос в соответсвии с условиями'''
-        parsed_conditions = self._parse_conditions(model, conditions)
-        query: SelectQuery = select(model).where(*parsed_conditions)
-        query = self._join_and_filter(query, joins=joins, joins_conditions=joins_conditions)
+        '''Составить SELECT запрос в соответсвии с формой условий'''
+        shape = (
+            'select',
+            model,
+            conditions_shape(conditions),
+            tuple(joins or ()),
+            self._joins_conditions_shape(joins_conditions),
+        )
+        query = statement_cache.get(shape)
+        if query is None:
+            query = self._build_select_query(model, conditions, joins, joins_conditions)
+            statement_cache.set(shape, query)
+
+        return query
+
+    def _generate_select_page_query(
+        self,
+        model: type[Model],
+        conditions: Sequence[WhereCondition],
+        *,
+        order_by: Sequence[str],
+        with_cursor: bool,
+        joins: Sequence[Model] | None = None,
+    ) -> SelectQuery:
+        '''Составить SELECT запрос страницы с keyset условием по курсору'''
+        shape = (
+            'select_page',
+            model,
+            conditions_shape(conditions),
+            tuple(order_by),
+            with_cursor,
+            tuple(joins or ()),
+        )
+        query = statement_cache.get(shape)
+        if query is None:
+            query = self._build_select_query(model, conditions, joins)
+
+            order_columns = [getattr(model, column) for column in order_by]
+            if with_cursor:
+                cursor_params = [
+                    bindparam(f'cursor_{index}', type_=column.type)
+                    for index, column in enumerate(order_columns)
+                ]
+                query = query.where(tuple_(*order_columns) > tuple_(*cursor_params))
+            query = query.order_by(*order_columns).limit(bindparam('limit'))
+            statement_cache.set(shape, query)
 
         return query
 
@@ -231,10 +876,39 @@ class Repository:
         model: type[Model],
         data: dict[str, Any],
         conditions: Sequence[WhereCondition],
-    ) -> UpdateQuery:
-        '''Сгенерировать объект запроса на обновление'''
+        returning: bool = False,
+    ) -> UpdateQuery | Executable:
+        '''Сгенерировать объект запроса на обновление по форме данных
+        и условий
+
+        '''
+        shape = ('update', model, tuple(data), conditions_shape(conditions), returning)
+        query = statement_cache.get(shape)
+        if query is None:
+            parsed_conditions = self._parse_conditions(model, conditions)
+            query = (
+                update(model)
+                .values({column: bindparam(f'value_{column}') for column in data})
+                .where(*parsed_conditions)
+                .execution_options(synchronize_session=False)
+            )
+            if returning:
+                query = self._select_returned_objs(model, query.returning(model))
+            statement_cache.set(shape, query)
+
+        return query
+
+    def _build_select_query(
+        self,
+        model: type[Model],
+        conditions: Sequence[WhereCondition],
+        joins: Sequence[Model] | None = None,
+        joins_conditions: dict[Model, Sequence[WhereCondition]] | None = None,
+    ) -> SelectQuery:
+        '''Построить SELECT запрос с параметрами вместо значений условий'''
         parsed_conditions = self._parse_conditions(model, conditions)
-        query = update(model).values(**data).where(*parsed_conditions)
+        query: SelectQuery = select(model).where(*parsed_conditions)
+        query = self._join_and_filter(query, joins=joins, joins_conditions=joins_conditions)
 
         return query
 
@@ -242,25 +916,154 @@ class Repository:
     def _parse_conditions(
         model: type[Model],
         conditions: Sequence[WhereCondition],
+        param_prefix: str = 'where',
     ) -> list[tuple]:
         '''Распарсить переданные условия запроса и подготовить их
-        для работы с ORM
+        для работы с ORM. Значения условий заменяются параметрами
+        с именами {param_prefix}_{номер условия}
 
         '''
         parsed_conditions = []
 
-        for column, sql_operator, value in conditions:
+        for index, (column_name, sql_operator, value) in enumerate(conditions):
+            column = getattr(model, column_name)
+            param_name = f'{param_prefix}_{index}'
             if sql_operator == SQLOperators.EQ:
-                parsed_conditions.append(getattr(model, column) == value)
-            elif sql_operator == SQLOperators.IN:
-                parsed_conditions.append(getattr(model, column).in_(value))
+                parsed_conditions.append(column == bindparam(param_name))
             elif sql_operator == SQLOperators.NE:
-                parsed_conditions.append(getattr(model, column) != value)
+                parsed_conditions.append(column != bindparam(param_name))
+            elif sql_operator == SQLOperators.GT:
+                parsed_conditions.append(column > bindparam(param_name))
+            elif sql_operator == SQLOperators.GE:
+                parsed_conditions.append(column >= bindparam(param_name))
+            elif sql_operator == SQLOperators.LT:
+                parsed_conditions.append(column < bindparam(param_name))
+            elif sql_operator == SQLOperators.LE:
+                parsed_conditions.append(column <= bindparam(param_name))
+            elif sql_operator == SQLOperators.IN:
+                parsed_conditions.append(column.in_(bindparam(param_name, expanding=True)))
+            elif sql_operator == SQLOperators.BETWEEN:
+                parsed_conditions.append(
+                    column.between(
+                        bindparam(f'{param_name}_low'),
+                        bindparam(f'{param_name}_high'),
+                    ),
+                )
+            elif sql_operator == SQLOperators.STARTSWITH:
+                # LIKE с параметром не использует индекс в generic плане
+                # подготовленного выражения, поэтому префикс дополнительно
+                # задается диапазоном операторов text_pattern_ops
+                parsed_conditions.append(
+                    column.like(bindparam(f'{param_name}_pattern'), escape=LIKE_ESCAPE_CHAR),
+                )
+                parsed_conditions.append(
+                    column.op('~>=~', is_comparison=True)(
+                        bindparam(f'{param_name}_low', type_=column.type),
+                    ),
+                )
+                if prefix_upper_bound(value) is not None:
+                    parsed_conditions.append(
+                        column.op('~<~', is_comparison=True)(
+                            bindparam(f'{param_name}_high', type_=column.type),
+                        ),
+                    )
+            elif sql_operator == SQLOperators.IS_NULL:
+                parsed_conditions.append(column.is_(None))
+            elif sql_operator == SQLOperators.IS_NOT_NULL:
+                parsed_conditions.append(column.is_not(None))
             else:
                 raise NotImplementedError('Operator is not supported')
-        print('*' * 100, parsed_conditions)
+
         return parsed_conditions
 
+    @staticmethod
+    def _joins_conditions_shape(
+        joins_conditions: dict[Model, Sequence[WhereCondition]] | None,
+    ) -> tuple:
+        '''Форма условий по джойнам без значений'''
+        return tuple(
+            (join_model, conditions_shape(join_conditions))
+            for join_model, join_conditions in (joins_conditions or {}).items()
+        )
+
+    @staticmethod
+    def _query_params(
+        conditions: Sequence[WhereCondition],
+        joins_conditions: dict[Model, Sequence[WhereCondition]] | None = None,
+    ) -> dict[str, Any]:
+        '''Значения параметров запроса из условий и условий по джойнам'''
+        params = conditions_params(conditions, 'where')
+        for index, join_conditions in enumerate((joins_conditions or {}).values()):
+            params.update(conditions_params(join_conditions, f'join{index}'))
+
+        return params
+
+    def _update_params(
+        self,
+        data: dict[str, Any],
+        conditions: Sequence[WhereCondition],
+    ) -> dict[str, Any]:
+        '''Значения параметров запроса на обновление'''
+        params = self._query_params(conditions)
+        params.update((f'value_{column}', value) for column, value in data.items())
+
+        return params
+
+    async def _raise_for_unique_conflicts(
+        self,
+        model: type[Model],
+        data: Sequence[dict[str, Any]],
+    ) -> None:
+        '''Найти строки data, нарушающие уникальные ограничения модели:
+        дубликаты внутри data и совпадения с другими записями в БД.
+        Выбросить ResourceConflictError с номерами таких строк
+
+        '''
+        errors = []
+
+        for constraint in model.__table__.constraints:
+            if not isinstance(constraint, UniqueConstraint):
+                continue
+
+            column_names = [column.name for column in constraint.columns]
+            rows_values = {}
+            for index, row in enumerate(data):
+                if not all(column_name in row for column_name in column_names):
+                    continue
+
+                row_values = tuple(row[column_name] for column_name in column_names)
+                if row_values in rows_values:
+                    errors.append({
+                        'index': index,
+                        'constraint': constraint.name,
+                        'duplicate_of_index': rows_values[row_values],
+                    })
+                else:
+                    rows_values[row_values] = index
+
+            if not rows_values:
+                continue
+
+            unique_columns = [getattr(model, column_name) for column_name in column_names]
+            query = select(model.id, *unique_columns).where(
+                tuple_(*unique_columns).in_(list(rows_values)),
+            )
+            results = await self.session.execute(query)
+            for existing_id, *existing_values in results.all():
+                index = rows_values[tuple(existing_values)]
+                if data[index].get('id') != existing_id:
+                    errors.append({
+                        'index': index,
+                        'constraint': constraint.name,
+                        'existing_id': str(existing_id),
+                    })
+
+        if errors:
+            raise ResourceConflictError(
+                user_error_message='Объекты нарушают существующие ограничения данных',
+                details={'errors': sorted(errors, key=lambda error: error['index'])},
+            )
+
     def _join_and_filter(
         self,
         query: SelectQuery,
@@ -277,10 +1080,11 @@ class Repository:
             query = query.join(join, isouter=True)
 
         joins_conditions = joins_conditions or {}
-        for join_model in joins_conditions:
+        for index, join_model in enumerate(joins_conditions):
             parsed_join_conditions = self._parse_conditions(
                 join_model,
                 joins_conditions[join_model],
+                param_prefix=f'join{index}',
             )
             query = query.where(*parsed_join_conditions)
 
@@ -296,6 +1100,9 @@ class Repository:
         '''Выполнить SELECT запрос с нужными условиями'''
         query = self._generate_select_query(model, conditions, joins, joins_conditions)
 
-        results = await self.session.execute(query)
+        results = await self.session.execute(
+            query,
+            self._query_params(conditions, joins_conditions),
+        )
 
         return results
@@ -0,0 +1,468 @@
+import abc
+import decimal
+import enum
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Iterable, Sequence
+from typing import Any, TypeVar
+
+from sqlalchemy import Table, inspect
+
+from core.orm import Base
+from core.settings.cache import CacheSettings
+from core.settings.settings import settings
+
+
+Model = TypeVar('Model', bound=Base)
+# Снимок объекта в кэше: значения колонок модели
+CachedObject = dict[str, Any]
+# Поколения тегов на момент промаха кэша: результат чтения сохраняется,
+# только если с тех пор ни один из тегов не инвалидировался
+Generations = tuple[int, ...]
+# Типы значений, которые JSON хранит строкой с меткой типа
+JSON_TAGGED_TYPES = {'$decimal': decimal.Decimal, '$uuid': uuid.UUID}
+
+
+def find_related_tables(table: Table, cascade_children: bool = True) -> set[Table]:
+    '''Найти таблицу, все её родительские таблицы по внешним ключам
+    и, если cascade_children, все дочерние таблицы, удаляемые каскадно
+
+    '''
+    related_tables = {table}
+
+    parents = [table]
+    while parents:
+        for foreign_key in parents.pop().foreign_keys:
+            parent = foreign_key.column.table
+            if parent not in related_tables:
+                related_tables.add(parent)
+                parents.append(parent)
+
+    children = [table] if cascade_children else []
+    while children:
+        current_table = children.pop()
+        for child in current_table.metadata.tables.values():
+            is_cascade_child = any(
+                foreign_key.column.table is current_table and foreign_key.ondelete == 'CASCADE'
+                for foreign_key in child.foreign_keys
+            )
+            if is_cascade_child and child not in related_tables:
+                related_tables.add(child)
+                children.append(child)
+
+    return related_tables
+
+
+class CacheBackend(abc.ABC):
+    '''Базовый класс бэкенда кэша. Записи помечаются тегами(именами таблиц),
+    по которым их можно инвалидировать. У каждого тега есть поколение,
+    которое увеличивается при инвалидации: запись, прочитанная из БД до
+    инвалидации, не сохраняется поверх нее
+
+    '''
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> Any | None:
+        '''Получить значение по ключу, None -- если его нет в кэше'''
+
+    @abc.abstractmethod
+    async def get_generations(self, tags: Sequence[str]) -> Generations:
+        '''Текущие поколения тегов'''
+
+    @abc.abstractmethod
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        *,
+        ttl: int,
+        tags: Sequence[str],
+        generations: Generations,
+    ) -> bool:
+        '''Сохранить значение по ключу с временем жизни ttl и тегами, если
+        поколения тегов не изменились с generations. Вернуть, сохранено ли
+        значение
+
+        '''
+
+    @abc.abstractmethod
+    async def invalidate_tags(self, tags: Iterable[str]) -> None:
+        '''Удалить все записи, помеченные любым из тегов, и увеличить
+        поколения тегов
+
+        '''
+
+    async def close(self) -> None:
+        '''Освободить соединения бэкенда при остановке процесса'''
+
+
+class LRUCacheBackend(CacheBackend):
+    '''Кэш в памяти процесса с вытеснением LRU и временем жизни записей.
+    Запись инвалидируется только в процессе, который изменил данные,
+    поэтому бэкенд подходит только для одного процесса-воркера: с
+    несколькими воркерами нужен общий бэкенд(redis)
+
+    '''
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[float, Any, frozenset[str]]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._generations: dict[str, int] = {}
+
+    async def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+
+        self._entries.move_to_end(key)
+
+        return value
+
+    async def get_generations(self, tags: Sequence[str]) -> Generations:
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        *,
+        ttl: int,
+        tags: Sequence[str],
+        generations: Generations,
+    ) -> bool:
+        if await self.get_generations(tags) != generations:
+            return False
+
+        self._remove(key)
+
+        tags = frozenset(tags)
+        self._entries[key] = (time.monotonic() + ttl, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+        return True
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+            for key in self._tags.pop(tag, set()).copy():
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        '''Удалить запись и её ключ из множеств тегов'''
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+
+        for tag in entry[2]:
+            tag_keys = self._tags.get(tag)
+            if tag_keys is not None:
+                tag_keys.discard(key)
+                if not tag_keys:
+                    del self._tags[tag]
+
+
+class RedisCacheBackend(CacheBackend):
+    '''Кэш во внешнем хранилище с протоколом Redis, общий для всех
+    процессов. Принимает клиент с интерфейсом redis.asyncio.Redis(подходит
+    и fakeredis для тестов). Значения хранятся в JSON. Ключи записей тега
+    хранятся в множестве, а поколение тега -- в счетчике.
+
+    Запись и инвалидация -- оптимистичные транзакции WATCH/MULTI: запись
+    следит за поколениями своих тегов и не сохраняется, если тег успели
+    инвалидировать, а инвалидация следит за множествами тегов и
+    повторяется, если в них успели добавить ключ
+
+    '''
+
+    def __init__(self, client: Any, *, key_prefix: str) -> None:
+        self.client = client
+        self.key_prefix = key_prefix
+
+    async def get(self, key: str) -> Any | None:
+        raw_value = await self.client.get(key)
+        if raw_value is None:
+            return None
+
+        return json.loads(raw_value, object_hook=_decode_tagged)
+
+    async def get_generations(self, tags: Sequence[str]) -> Generations:
+        if not tags:
+            return ()
+
+        return _parse_generations(await self.client.mget(self._generation_keys(tags)))
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        *,
+        ttl: int,
+        tags: Sequence[str],
+        generations: Generations,
+    ) -> bool:
+        from redis.exceptions import WatchError
+
+        raw_value = json.dumps(value, default=_encode_tagged)
+        generation_keys = self._generation_keys(tags)
+        async with self.client.pipeline(transaction=True) as pipeline:
+            try:
+                await pipeline.watch(*generation_keys)
+                current_generations = await pipeline.mget(generation_keys)
+                if _parse_generations(current_generations) != generations:
+                    return False
+
+                pipeline.multi()
+                pipeline.set(key, raw_value, ex=ttl)
+                for tag in tags:
+                    tag_key = self._tag_key(tag)
+                    pipeline.sadd(tag_key, key)
+                    pipeline.expire(tag_key, ttl)
+                await pipeline.execute()
+            except WatchError:
+                return False
+
+        return True
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> None:
+        from redis.exceptions import WatchError
+
+        tags = list(tags)
+        if not tags:
+            return
+
+        tag_keys = [self._tag_key(tag) for tag in tags]
+        async with self.client.pipeline(transaction=True) as pipeline:
+            while True:
+                try:
+                    await pipeline.watch(*tag_keys)
+                    keys = set()
+                    for tag_key in tag_keys:
+                        keys |= await pipeline.smembers(tag_key)
+
+                    pipeline.multi()
+                    for generation_key in self._generation_keys(tags):
+                        pipeline.incr(generation_key)
+                    pipeline.delete(*tag_keys, *keys)
+                    await pipeline.execute()
+                    return
+                except WatchError:
+                    continue
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    def _tag_key(self, tag: str) -> str:
+        '''Ключ множества с ключами записей тега'''
+        return f'{self.key_prefix}:tag:{tag}'
+
+    def _generation_keys(self, tags: Sequence[str]) -> list[str]:
+        '''Ключи счетчиков поколений тегов'''
+        return [f'{self.key_prefix}:generation:{tag}' for tag in tags]
+
+
+class RepositoryCache:
+    '''Read-through кэш для чтений репозитория. Ключ строится из модели,
+    операции и нормализованных условий запроса, теги записи -- таблицы,
+    от которых зависит результат
+
+    '''
+
+    def __init__(self, backend: CacheBackend, *, ttl: int, key_prefix: str) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+
+    def make_key(self, operation: str, model: type[Model], **params: Any) -> str:
+        '''Составить ключ кэша из модели, операции и параметров запроса'''
+        normalized_params = json.dumps(
+            {name: self._normalize(value) for name, value in params.items()},
+            sort_keys=True,
+        )
+        params_digest = hashlib.sha1(normalized_params.encode()).hexdigest()
+
+        return f'{self.key_prefix}:{model.__tablename__}:{operation}:{params_digest}'
+
+    async def get(self, key: str, model: type[Model]) -> tuple[list[Model], Any] | None:
+        '''Получить из кэша объекты модели и дополнительные данные
+        результата(например, курсор следующей страницы)
+
+        '''
+        cached_value = await self.backend.get(key)
+        if cached_value is None:
+            return None
+
+        cached_objects, meta = cached_value
+
+        return [self._restore(model, cached_object) for cached_object in cached_objects], meta
+
+    async def get_generations(self, models: Iterable[type[Model]]) -> Generations:
+        '''Поколения таблиц моделей. Снимаются до чтения из БД и
+        передаются в set
+
+        '''
+        return await self.backend.get_generations(self._tags(models))
+
+    async def set(
+        self,
+        key: str,
+        objs: Sequence[Model],
+        *,
+        models: Iterable[type[Model]],
+        generations: Generations,
+        meta: Any = None,
+    ) -> bool:
+        '''Сохранить в кэш снимки объектов с тегами таблиц из models, если
+        с момента снятия generations эти таблицы не инвалидировались
+
+        '''
+        cached_objects = [self._snapshot(obj) for obj in objs]
+
+        return await self.backend.set(
+            key,
+            (cached_objects, meta),
+            ttl=self.ttl,
+            tags=self._tags(models),
+            generations=generations,
+        )
+
+    async def invalidate(self, models: Iterable[type[Model]]) -> None:
+        '''Инвалидировать записи, зависящие от таблиц моделей, а также
+        от их родительских таблиц(агрегаты) и дочерних таблиц
+        с каскадным удалением
+
+        '''
+        tables = set()
+        for model in models:
+            tables |= find_related_tables(model.__table__)
+
+        await self.backend.invalidate_tags(sorted(table.name for table in tables))
+
+    async def close(self) -> None:
+        '''Закрыть соединения бэкенда'''
+        await self.backend.close()
+
+    @staticmethod
+    def _tags(models: Iterable[type[Model]]) -> list[str]:
+        '''Теги записи: имена таблиц моделей в постоянном порядке'''
+        return sorted({model.__tablename__ for model in models})
+
+    @classmethod
+    def _normalize(cls, value: Any) -> Any:
+        '''Привести параметры запроса к сериализуемому в json виду'''
+        if isinstance(value, dict):
+            return sorted([cls._normalize(key), cls._normalize(item)] for key, item in value.items())
+        if isinstance(value, (list, tuple, set, frozenset)):
+            normalized_items = [cls._normalize(item) for item in value]
+            if isinstance(value, (set, frozenset)):
+                return sorted(normalized_items, key=str)
+            return normalized_items
+        if isinstance(value, type) and issubclass(value, Base):
+            return value.__tablename__
+        if isinstance(value, enum.Enum):
+            return value.name
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+
+        return str(value)
+
+    @staticmethod
+    def _snapshot(obj: Model) -> CachedObject:
+        '''Снять значения колонок объекта'''
+        return {
+            column_attr.key: getattr(obj, column_attr.key)
+            for column_attr in inspect(type(obj)).column_attrs
+        }
+
+    @staticmethod
+    def _restore(model: type[Model], cached_object: CachedObject) -> Model:
+        '''Восстановить объект модели из снимка'''
+        return model(**cached_object)
+
+
+def _encode_tagged(value: Any) -> dict[str, str]:
+    '''Представить в JSON значение, у которого нет JSON типа'''
+    for tag, value_type in JSON_TAGGED_TYPES.items():
+        if isinstance(value, value_type):
+            return {tag: str(value)}
+
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _decode_tagged(obj: dict[str, Any]) -> Any:
+    '''Восстановить значение, сохраненное _encode_tagged'''
+    if len(obj) == 1:
+        tag, value = next(iter(obj.items()))
+        if tag in JSON_TAGGED_TYPES:
+            return JSON_TAGGED_TYPES[tag](value)
+
+    return obj
+
+
+def _parse_generations(raw_generations: Sequence[bytes | None]) -> Generations:
+    return tuple(int(raw_generation or 0) for raw_generation in raw_generations)
+
+
+def create_repository_cache(cache_settings: CacheSettings) -> RepositoryCache | None:
+    '''Создать кэш репозитория в соответствии с настройками'''
+    if not cache_settings.enabled:
+        return None
+
+    if cache_settings.backend == 'redis':
+        from redis import asyncio as aioredis
+
+        backend = RedisCacheBackend(
+            aioredis.from_url(cache_settings.redis_url),
+            key_prefix=cache_settings.key_prefix,
+        )
+    else:
+        backend = LRUCacheBackend(max_size=cache_settings.max_size)
+
+    return RepositoryCache(
+        backend,
+        ttl=cache_settings.ttl_seconds,
+        key_prefix=cache_settings.key_prefix,
+    )
+
+
+# Кэш и pid процесса, в котором он создан: после fork воркер создает
+# свой кэш и соединения с Redis
+_repository_cache: RepositoryCache | None = None
+_repository_cache_pid: int | None = None
+
+
+def get_repository_cache() -> RepositoryCache | None:
+    '''Кэш репозитория текущего процесса, создается при первом
+    обращении. None -- кэш выключен
+
+    '''
+    global _repository_cache, _repository_cache_pid
+
+    if _repository_cache_pid != os.getpid():
+        _repository_cache = create_repository_cache(settings.cache)
+        _repository_cache_pid = os.getpid()
+
+    return _repository_cache
+
+
+async def close_repository_cache() -> None:
+    '''Закрыть соединения кэша текущего процесса'''
+    global _repository_cache, _repository_cache_pid
+
+    if _repository_cache is not None and _repository_cache_pid == os.getpid():
+        await _repository_cache.close()
+    _repository_cache = None
+    _repository_cache_pid = None
@@ -7,5 +7,11 @@ class SQLOperators(enum.Enum):
     EQ = 'equal'
     NE = 'not equal'
     GT = 'greater than'
+    GE = 'greater than or equal'
     LT = 'less than'
+    LE = 'less than or equal'
     IN = 'in list'
+    BETWEEN = 'between'
+    STARTSWITH = 'starts with'
+    IS_NULL = 'is null'
+    IS_NOT_NULL = 'is not null'
@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from collections.abc import Hashable, Sequence
+from typing import Any
+
+from sqlalchemy.sql import Executable
+
+from core.repositories.enums import SQLOperators
+
+
+# Сколько форм запросов держать в кэше. Репозиторий генерирует
+# ограниченное число форм, поэтому вытеснение -- защита от утечек
+STATEMENT_CACHE_SIZE = 512
+
+
+class StatementCache:
+    '''LRU кэш параметризованных выражений SQLAlchemy по форме запроса:
+    модель, колонки и операторы условий, джойны. Значения условий
+    в выражение не входят и передаются при выполнении
+
+    '''
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._statements: OrderedDict[Hashable, Executable] = OrderedDict()
+
+    def get(self, shape: Hashable) -> Executable | None:
+        '''Получить выражение по форме запроса'''
+        statement = self._statements.get(shape)
+        if statement is not None:
+            self._statements.move_to_end(shape)
+
+        return statement
+
+    def set(self, shape: Hashable, statement: Executable) -> None:
+        '''Сохранить выражение для формы запроса'''
+        self._statements[shape] = statement
+        self._statements.move_to_end(shape)
+        if len(self._statements) > self.max_size:
+            self._statements.popitem(last=False)
+
+
+def conditions_shape(conditions: Sequence[tuple[str, Any, Any]]) -> tuple:
+    '''Форма условий: колонки и операторы без значений. Для префикса
+    в форму входит и то, есть ли у него верхняя граница диапазона
+
+    '''
+    return tuple(
+        (column, sql_operator, prefix_upper_bound(value) is not None)
+        if sql_operator == SQLOperators.STARTSWITH
+        else (column, sql_operator)
+        for column, sql_operator, value in conditions
+    )
+
+
+def conditions_params(conditions: Sequence[tuple[str, Any, Any]], prefix: str) -> dict[str, Any]:
+    '''Значения условий для подстановки в параметры выражения.
+    Имена параметров должны совпадать с теми, что использует
+    Repository._parse_conditions
+
+    '''
+    params = {}
+
+    for index, (_, sql_operator, value) in enumerate(conditions):
+        param_name = f'{prefix}_{index}'
+        if sql_operator == SQLOperators.BETWEEN:
+            params[f'{param_name}_low'], params[f'{param_name}_high'] = value
+        elif sql_operator == SQLOperators.STARTSWITH:
+            params[f'{param_name}_pattern'] = escape_like(value) + '%'
+            params[f'{param_name}_low'] = value
+            upper_bound = prefix_upper_bound(value)
+            if upper_bound is not None:
+                params[f'{param_name}_high'] = upper_bound
+        elif sql_operator in (SQLOperators.IS_NULL, SQLOperators.IS_NOT_NULL):
+            continue
+        else:
+            params[param_name] = value
+
+    return params
+
+
+# Максимальная кодовая точка Unicode и суррогаты, которые не кодируются в UTF-8
+MAX_CODE_POINT = 0x10FFFF
+SURROGATES = range(0xD800, 0xE000)
+
+# Экранирующий символ для LIKE. Не обратный слэш, чтобы литерал ESCAPE
+# не зависел от настройки standard_conforming_strings
+LIKE_ESCAPE_CHAR = '!'
+
+
+def escape_like(value: str) -> str:
+    '''Экранировать спецсимволы LIKE'''
+    return (
+        value
+        .replace(LIKE_ESCAPE_CHAR, LIKE_ESCAPE_CHAR * 2)
+        .replace('%', f'{LIKE_ESCAPE_CHAR}%')
+        .replace('_', f'{LIKE_ESCAPE_CHAR}_')
+    )
+
+
+def prefix_upper_bound(prefix: str) -> str | None:
+    '''Строка, которая больше всех строк с префиксом prefix при побайтовом
+    сравнении(операторы text_pattern_ops). Порядок байт UTF-8 совпадает
+    с порядком кодовых точек, поэтому увеличивается последний символ,
+    минуя суррогаты. Символ U+10FFFF увеличить нельзя, он отбрасывается
+    и увеличивается предыдущий. Если префикс состоит только из U+10FFFF,
+    границы нет и возвращается None: префикс ищется одним LIKE
+
+    '''
+    if not prefix:
+        raise ValueError('Prefix must not be empty')
+
+    prefix = prefix.rstrip(chr(MAX_CODE_POINT))
+    if not prefix:
+        return None
+
+    next_code_point = ord(prefix[-1]) + 1
+    if next_code_point in SURROGATES:
+        next_code_point = SURROGATES.stop
+
+    return prefix[:-1] + chr(next_code_point)
+
+
+statement_cache = StatementCache(STATEMENT_CACHE_SIZE)
@@ -0,0 +1,61 @@
+from collections.abc import AsyncIterator
+from typing import Any, TypeVar
+
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.orm import Base, create_db_session
+from core.repositories.base import Repository
+from core.repositories.cache import RepositoryCache, get_repository_cache
+
+
+Model = TypeVar('Model', bound=Base)
+
+
+class UnitOfWork:
+    '''Единица работы одного запроса: общий репозиторий поверх одной
+    сессии. Новые объекты копятся в сессии и отправляются в БД одним
+    flush при коммите, а объекты, уже загруженные в рамках запроса,
+    берутся из identity map сессии без повторных запросов
+
+    '''
+
+    def __init__(
+        self,
+        session: AsyncSession,
+        cache: RepositoryCache | None = None,
+    ) -> None:
+        self.session = session
+        self.repository = Repository(session, cache)
+
+    async def __aenter__(self) -> 'UnitOfWork':
+        return self
+
+    async def __aexit__(self, exc_type: Any, exc_value: Any, traceback: Any) -> None:
+        # Незакоммиченные изменения не должны переживать запрос
+        if self.session.in_transaction():
+            await self.rollback()
+
+    def add(self, model: type[Model], data: dict[str, Any]) -> Model:
+        '''Добавить объект для создания при коммите'''
+        return self.repository.add_obj_to_session(model=model, data=data)
+
+    async def commit(self) -> None:
+        '''Отправить накопленные изменения в БД и закоммитить их'''
+        await self.repository.commit()
+
+    async def rollback(self) -> None:
+        '''Откатить накопленные изменения'''
+        await self.repository.rollback()
+
+
+async def create_unit_of_work(
+    db_session: AsyncSession = Depends(create_db_session),
+) -> AsyncIterator[UnitOfWork]:
+    '''Зависимость FastAPI: одна единица работы на запрос. FastAPI кэширует
+    зависимости в рамках запроса, поэтому все ее потребители получают
+    один и тот же объект
+
+    '''
+    async with UnitOfWork(db_session, get_repository_cache()) as unit_of_work:
+        yield unit_of_work
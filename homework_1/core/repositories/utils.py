@@ -1,21 +1,55 @@
-from functools import wraps
-from typing import Callable, TypeVar
+import base64
+import decimal
+import json
+from collections.abc import Sequence
+from typing import Any
 
-from core.orm import Base
+from sqlalchemy import Column
+from sqlalchemy.exc import IntegrityError
 
+from core.errors.app_errors import BadRequestError
 
-Model = TypeVar('Model', bound=Base)
 
+def encode_cursor(values: Sequence[Any]) -> str:
+    '''Закодировать значения колонок сортировки последней записи
+    страницы в непрозрачный курсор
+
+    '''
+    raw_cursor = json.dumps([str(value) for value in values])
+
+    return base64.urlsafe_b64encode(raw_cursor.encode()).decode()
 
-def convert_sqlalchemy_row_to_model(repo_method: Callable) -> Callable:
-    '''Преобразовать sqlalchemy.engine.row.Row объект
-    в экземпляр соответсвующей модели
+
+def decode_cursor(cursor: str, columns: Sequence[Column]) -> list[Any]:
+    '''Раскодировать курсор и привести значения к python типам
+    колонок сортировки
 
     '''
-    @wraps(repo_method)
-    async def wrapper(*args, **kwargs) -> Model:
-        sqlalchemy_row = await repo_method(*args, **kwargs)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError('Cursor does not match sort columns')
+        # encode_cursor сохраняет значения строками, другие типы -- подделка
+        if not all(isinstance(value, str) for value in values):
+            raise ValueError('Cursor values must be strings')
+
+        return [column.type.python_type(value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError, decimal.InvalidOperation) as exception:
+        raise BadRequestError(
+            user_error_message='Некорректный курсор пагинации',
+            system_error_message=str(exception),
+            details={'cursor': cursor},
+        )
+
+
+def get_integrity_error_details(exception: IntegrityError) -> dict[str, Any]:
+    '''Достать из ошибки БД имя нарушенного ограничения и описание
+    конфликтующего ключа
 
-        return kwargs['model'](**sqlalchemy_row._asdict())
+    '''
+    db_error = getattr(exception.orig, '__cause__', None)
 
-    return wrapper
+    return {
+        'constraint': getattr(db_error, 'constraint_name', None),
+        'detail': getattr(db_error, 'detail', None),
+    }
@@ -0,0 +1,11 @@
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+
+class BulkDeleteSchema(BaseModel):
+    '''Схема данных для пакетного удаления объектов'''
+    ids: list[UUID] = Field(
+        description='Идентификаторы удаляемых объектов',
+        min_items=1,
+    )
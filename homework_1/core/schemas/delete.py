@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+
+
+class DeleteResultSchema(BaseModel):
+    '''Результат удаления объектов'''
+    deleted: dict[str, int] = Field(
+        description='Количество удаленных строк по таблицам, включая каскадно удаленные',
+    )
@@ -0,0 +1,16 @@
+from typing import Generic, TypeVar
+
+from pydantic import Field
+from pydantic.generics import GenericModel
+
+
+ItemSchema = TypeVar('ItemSchema')
+
+
+class PageSchema(GenericModel, Generic[ItemSchema]):
+    '''Страница списка объектов с курсором на следующую страницу'''
+    items: list[ItemSchema] = Field(description='Объекты текущей страницы')
+    next_cursor: str | None = Field(
+        None,
+        description='Курсор для получения следующей страницы, null -- страница последняя',
+    )
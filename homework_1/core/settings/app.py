@@ -1,3 +1,4 @@
+from decimal import Decimal
 from pydantic import Field
 
 from core.settings.base import CommonSettings
@@ -10,3 +11,31 @@ class AppSettings(CommonSettings):
         '/v1',
         description='Строка с номером 1й версии API для добавления к эндпоинтам 1й версии',
     )
+    page_size_default: int = Field(
+        50,
+        description='Размер страницы по умолчанию для списочных эндпоинтов',
+    )
+    page_size_max: int = Field(
+        500,
+        description='Максимальный размер страницы для списочных эндпоинтов',
+    )
+    bulk_max_items: int = Field(
+        1000,
+        description='Максимальное количество объектов в одном пакетном запросе',
+    )
+    export_chunk_size: int = Field(
+        1000,
+        description='Количество строк, читаемых за раз из серверного курсора при выгрузке данных',
+    )
+    fast_serialization: bool = Field(
+        False,
+        description='Сериализовать ответы эндпоинтов чтения напрямую через orjson, без схем pydantic',
+    )
+    internal_routes_enabled: bool = Field(
+        False,
+        description='Отдавать статистику воркера без авторизации по эндпоинтам /internal/*',
+    )
+    stats_price_buckets: list[Decimal] = Field(
+        [Decimal(100), Decimal(250), Decimal(500), Decimal(1000)],
+        description='Границы корзин гистограммы цен в статистике по умолчанию',
+    )
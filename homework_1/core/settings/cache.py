@@ -0,0 +1,22 @@
+from typing import Literal
+
+from pydantic import Field
+
+from core.settings.base import CommonSettings
+
+
+class CacheSettings(CommonSettings):
+    '''Настройки read-through кэша репозитория'''
+    enabled: bool = Field(False, description='Включить кэширование чтений репозитория')
+    backend: Literal['memory', 'redis'] = Field(
+        'memory',
+        description='Бэкенд кэша: memory -- LRU в памяти процесса, redis -- внешний Redis',
+    )
+    ttl_seconds: int = Field(60, gt=0, description='Время жизни записи в кэше')
+    max_size: int = Field(
+        10000,
+        gt=0,
+        description='Максимальное количество записей в памяти для бэкенда memory',
+    )
+    redis_url: str = Field('redis://localhost:6379/0', description='Урл для подключения к Redis')
+    key_prefix: str = Field('menu-app', description='Префикс ключей кэша')
@@ -1,8 +1,14 @@
-from pydantic import PostgresDsn, validator
+from typing import Literal
+
+from pydantic import Field, PostgresDsn, validator
 
 from core.settings.base import CommonSettings
 
 
+# Значение таймаута Postgres: число с необязательной единицей, 0 -- без ограничения
+TIMEOUT_REGEX = r'^\d+(us|ms|s|min|h|d)?$'
+
+
 class DBSettings(CommonSettings):
     '''Настройки БД'''
     name: str
@@ -11,6 +17,62 @@ class DBSettings(CommonSettings):
     host: str
     port: int
     url: PostgresDsn | None = None
+    statement_cache_mode: Literal['enabled', 'pgbouncer', 'disabled'] = Field(
+        'enabled',
+        description=(
+            'Режим кэша подготовленных выражений: enabled -- LRU кэш выражений на соединение '
+            '(прямое подключение к Postgres, PgBouncer в session режиме или PgBouncer >= 1.21 '
+            'с max_prepared_statements), pgbouncer -- без кэша и с уникальными именами '
+            'выражений для PgBouncer в transaction/statement режиме, disabled -- без кэша'
+        ),
+    )
+    statement_cache_size: int = Field(
+        256,
+        gt=0,
+        description='Максимальное количество подготовленных выражений в LRU кэше соединения',
+    )
+    pool_size: int = Field(5, ge=0, description='Количество постоянных соединений в пуле')
+    max_overflow: int = Field(
+        10,
+        ge=-1,
+        description='Сколько соединений можно открыть сверх pool_size, -1 -- без ограничения',
+    )
+    pool_timeout: float = Field(
+        30,
+        gt=0,
+        description='Сколько секунд ждать свободное соединение из пула',
+    )
+    pool_recycle: int = Field(
+        -1,
+        description='Через сколько секунд пересоздавать соединение, -1 -- не пересоздавать',
+    )
+    pool_pre_ping: bool = Field(
+        False,
+        description='Проверять соединение перед выдачей из пула',
+    )
+    pool_warmup_size: int | None = Field(
+        None,
+        ge=0,
+        description='Сколько соединений пула открыть при старте воркера, null -- pool_size',
+    )
+    migration_lock_timeout: str = Field(
+        '5s',
+        regex=TIMEOUT_REGEX,
+        description=(
+            'lock_timeout шагов миграций по умолчанию: сколько DDL ждет блокировку, '
+            'прежде чем упасть, а не держать очередь запросов к таблице, 0 -- без ограничения'
+        ),
+    )
+    migration_statement_timeout: str = Field(
+        '0',
+        regex=TIMEOUT_REGEX,
+        description='statement_timeout шагов миграций по умолчанию, 0 -- без ограничения',
+    )
+    migration_batch_size: int = Field(
+        5000,
+        gt=0,
+        description='Сколько строк обновлять за одну транзакцию при заполнении колонок пачками',
+    )
 
     @validator('url', pre=True, always=True)
     def make_db_connection_url(cls, value, values):
@@ -0,0 +1,89 @@
+from typing import Literal
+
+from pydantic import Field
+
+from core.settings.base import CommonSettings
+
+
+TimePeriod = Literal['seconds', 'minutes', 'hours', 'days', 'weeks']
+# EdDSA python-jose не поддерживает
+Algorithm = Literal['HS256', 'HS384', 'HS512', 'ES256', 'ES384', 'ES512', 'RS256', 'RS384', 'RS512']
+
+
+class JWTSettings(CommonSettings):
+    '''Настройки выпуска и проверки JWT токенов'''
+    algorithm: Algorithm = Field(
+        'HS256',
+        description=(
+            'Алгоритм подписи токенов: HS* -- общий секрет, ES*/RS* -- приватный ключ '
+            'для подписи и публичный для проверки'
+        ),
+    )
+    access_token_secret_key: str | None = Field(
+        None,
+        description=(
+            'Ключ подписи access токенов: секрет для HS*, приватный ключ в PEM для ES*/RS*'
+        ),
+    )
+    access_token_public_key: str | None = Field(
+        None,
+        description=(
+            'Публичный ключ в PEM для проверки access токенов в режиме ES*/RS*, '
+            'null -- вывести из приватного'
+        ),
+    )
+    refresh_token_secret_key: str | None = Field(
+        None,
+        description=(
+            'Ключ подписи refresh токенов: секрет для HS*, приватный ключ в PEM для ES*/RS*'
+        ),
+    )
+    refresh_token_public_key: str | None = Field(
+        None,
+        description=(
+            'Публичный ключ в PEM для проверки refresh токенов в режиме ES*/RS*, '
+            'null -- вывести из приватного'
+        ),
+    )
+    audience: str = Field('menu-app', description='Получатель токенов(aud)')
+    issuer: str = Field('menu-app', description='Издатель токенов(iss)')
+    access_token_exp_in_time_period: TimePeriod = Field(
+        'minutes',
+        description='Единица времени жизни access токена',
+    )
+    access_token_exp_in_value: int = Field(15, gt=0, description='Время жизни access токена')
+    refresh_token_exp_in_time_period: TimePeriod = Field(
+        'days',
+        description='Единица времени жизни refresh токена',
+    )
+    refresh_token_exp_in_value: int = Field(30, gt=0, description='Время жизни refresh токена')
+    validation_cache_size: int = Field(
+        10000,
+        ge=0,
+        description=(
+            'Сколько проверенных токенов держать в кэше до истечения их срока действия, '
+            '0 -- не кэшировать'
+        ),
+    )
+    issuance_executor: Literal['thread', 'process'] = Field(
+        'thread',
+        description=(
+            'Где подписывать пачки токенов: thread -- пул потоков, process -- пул процессов '
+            '(для ES*/RS*, подпись которых упирается в CPU)'
+        ),
+    )
+    issuance_workers: int | None = Field(
+        None,
+        ge=1,
+        description='Размер пула подписи токенов, null -- по умолчанию для пула',
+    )
+    issuance_batch_size: int = Field(
+        64,
+        gt=0,
+        description='Максимум пар токенов, подписываемых за одну задачу пула',
+    )
+    issuance_batch_delay_ms: float = Field(
+        2,
+        ge=0,
+        description='Сколько ждать одновременные запросы на выпуск токенов, чтобы собрать пачку',
+    )
@@ -0,0 +1,23 @@
+from pydantic import Field
+
+from core.settings.base import CommonSettings
+
+
+class MetricsSettings(CommonSettings):
+    '''Настройки метрик запросов к API'''
+    enabled: bool = Field(
+        False,
+        description='Собирать метрики запросов и SQL запросов и отдавать их в /metrics',
+    )
+    server_timing: bool = Field(
+        True,
+        description='Добавлять в ответы заголовок Server-Timing с временем работы с БД',
+    )
+    duration_buckets: list[float] = Field(
+        [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5],
+        description='Границы корзин гистограммы длительности запросов, в секундах',
+    )
+    statements_buckets: list[float] = Field(
+        [1, 2, 3, 5, 10, 25, 50, 100],
+        description='Границы корзин гистограммы количества SQL запросов на запрос к API',
+    )
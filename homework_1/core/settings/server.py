@@ -0,0 +1,19 @@
+from pydantic import Field
+
+from core.settings.base import CommonSettings
+
+
+class ServerSettings(CommonSettings):
+    '''Настройки запуска API в несколько процессов(serve.py)'''
+    host: str = Field('0.0.0.0', description='Адрес, на котором слушает сервер')
+    port: int = Field(8000, description='Порт сервера')
+    workers: int | None = Field(
+        None,
+        ge=1,
+        description='Количество процессов-воркеров, null -- по количеству ядер CPU',
+    )
+    timeout_keep_alive: int = Field(
+        5,
+        ge=0,
+        description='Сколько секунд держать неактивное keep-alive соединение с клиентом',
+    )
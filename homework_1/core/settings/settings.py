@@ -1,13 +1,28 @@
+from functools import lru_cache
+from typing import Any
+
 from pydantic import BaseSettings
 
 from core.settings.app import AppSettings
+from core.settings.cache import CacheSettings
 from core.settings.db import DBSettings
+from core.settings.jwt import JWTSettings
+from core.settings.metrics import MetricsSettings
+from core.settings.server import ServerSettings
+from core.settings.single_flight import SingleFlightSettings
+from core.settings.sql_tracing import SQLTracingSettings
 
 
 class Settings(BaseSettings):
     '''Класс с настройками и переменными всего проекта'''
     app: AppSettings = AppSettings()
+    cache: CacheSettings = CacheSettings()
     db: DBSettings
+    jwt: JWTSettings = JWTSettings()
+    metrics: MetricsSettings = MetricsSettings()
+    server: ServerSettings = ServerSettings()
+    single_flight: SingleFlightSettings = SingleFlightSettings()
+    sql_tracing: SQLTracingSettings = SQLTracingSettings()
 
     class Config:
         allow_mutation = False
@@ -15,4 +30,25 @@ class Settings(BaseSettings):
         env_file = '.env'
 
 
-settings = Settings()
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    '''Настройки проекта. Окружение и .env читаются один раз, при первом
+    вызове. Чтобы перечитать их, нужно вызвать get_settings.cache_clear()
+
+    '''
+    return Settings()
+
+
+class LazySettings:
+    '''Настройки, которые загружаются при первом обращении к любому
+    полю, а не при импорте модуля
+
+    '''
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_settings(), name)
+
+    def __repr__(self) -> str:
+        return repr(get_settings())
+
+
+settings = LazySettings()
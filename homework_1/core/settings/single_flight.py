@@ -0,0 +1,33 @@
+from pydantic import Field
+
+from core.settings.base import CommonSettings
+
+
+class SingleFlightSettings(CommonSettings):
+    '''Настройки объединения одинаковых одновременных запросов на чтение'''
+    enabled: bool = Field(
+        False,
+        description=(
+            'Объединять одновременные одинаковые GET запросы: они ждут один общий '
+            'вызов эндпоинта вместо собственных запросов к БД'
+        ),
+    )
+    window_ms: float = Field(
+        100,
+        ge=0,
+        description=(
+            'Сколько миллисекунд после начала вызова к нему можно присоединиться. '
+            'Более поздние запросы делают свой вызов, чтобы не получить устаревшие данные'
+        ),
+    )
+    redis_url: str | None = Field(
+        None,
+        description=(
+            'Урл Redis для общего между воркерами счетчика запросов на запись. Без него '
+            'запись закрывает для присоединения только вызовы своего воркера'
+        ),
+    )
+    generation_key: str = Field(
+        'menu-app:single-flight:generation',
+        description='Ключ счетчика запросов на запись в Redis',
+    )
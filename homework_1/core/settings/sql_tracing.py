@@ -0,0 +1,27 @@
+from typing import Literal
+
+from pydantic import Field
+
+from core.settings.base import CommonSettings
+
+
+class SQLTracingSettings(CommonSettings):
+    '''Настройки трассировки SQL запросов'''
+    enabled: bool = Field(False, description='Включить трассировку SQL запросов')
+    sample_rate: float = Field(
+        0.01,
+        ge=0,
+        le=1,
+        description='Доля запросов к API, для которых записываются все SQL запросы',
+    )
+    slow_query_threshold_ms: float = Field(
+        200,
+        ge=0,
+        description='SQL запросы дольше порога записываются всегда, независимо от сэмплирования',
+    )
+    sink: Literal['log', 'buffer'] = Field(
+        'log',
+        description='Куда писать записи: log -- структурированный лог, buffer -- кольцевой буфер в памяти',
+    )
+    buffer_size: int = Field(1000, gt=0, description='Размер кольцевого буфера записей')
+    log_parameters: bool = Field(False, description='Записывать параметры SQL запросов')
@@ -0,0 +1,19 @@
+import uuid
+
+from asyncpg import Connection as AsyncpgConnection
+
+
+class UniqueStatementNameConnection(AsyncpgConnection):
+    '''Соединение asyncpg, которое дает подготовленным выражениям
+    глобально уникальные имена. Стандартные имена asyncpg
+    (__asyncpg_stmt_N__) уникальны только в рамках клиентского
+    соединения и конфликтуют на серверных соединениях PgBouncer
+    в transaction режиме
+
+    '''
+    async def prepare(self, query, *, name=None, **kwargs):
+        return await super().prepare(
+            query,
+            name=name or f'__stmt_{uuid.uuid4().hex}__',
+            **kwargs,
+        )
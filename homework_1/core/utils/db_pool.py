@@ -0,0 +1,101 @@
+import time
+from collections.abc import Callable
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class PoolStatistics:
+    '''Накопительная статистика пула соединений: ожидание соединения
+    при checkout и время открытия новых соединений
+
+    '''
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.connects = 0
+        self.connect_time_total = 0.0
+        self.connect_time_max = 0.0
+
+    def record_wait(self, wait_time: float) -> None:
+        '''Учесть время ожидания соединения из пула'''
+        self.checkouts += 1
+        self.wait_time_total += wait_time
+        self.wait_time_max = max(self.wait_time_max, wait_time)
+
+    def record_connect(self, connect_time: float) -> None:
+        '''Учесть время открытия нового соединения'''
+        self.connects += 1
+        self.connect_time_total += connect_time
+        self.connect_time_max = max(self.connect_time_max, connect_time)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    '''Пул соединений, который собирает PoolStatistics.
+    Время ожидания включает время открытия соединения,
+    если свободного в пуле не нашлось
+
+    '''
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.statistics = PoolStatistics()
+        # Обработчики времени ожидания каждого checkout, в секундах
+        self.wait_listeners: list[Callable[[float], None]] = []
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.statistics.checkout_timeouts += 1
+            raise
+        wait_time = time.perf_counter() - started_at
+        self.statistics.record_wait(wait_time)
+        for listener in self.wait_listeners:
+            listener(wait_time)
+
+        return connection
+
+    def recreate(self):
+        # Пул пересоздается при dispose движка, обработчики переносятся в новый
+        pool = super().recreate()
+        pool.wait_listeners = self.wait_listeners
+
+        return pool
+
+    def _create_connection(self):
+        started_at = time.perf_counter()
+        connection = super()._create_connection()
+        self.statistics.record_connect(time.perf_counter() - started_at)
+
+        return connection
+
+    def get_statistics(self) -> dict:
+        '''Текущее состояние пула и накопленная статистика'''
+        statistics = self.statistics
+        return {
+            'size': self.size(),
+            'checked_in': self.checkedin(),
+            'checked_out': self.checkedout(),
+            'overflow': max(self.overflow(), 0),
+            'checkouts': statistics.checkouts,
+            'checkout_timeouts': statistics.checkout_timeouts,
+            'wait_time_avg_ms': _average_ms(statistics.wait_time_total, statistics.checkouts),
+            'wait_time_max_ms': round(statistics.wait_time_max * 1000, 3),
+            'connects': statistics.connects,
+            'connect_time_avg_ms': _average_ms(
+                statistics.connect_time_total,
+                statistics.connects,
+            ),
+            'connect_time_max_ms': round(statistics.connect_time_max * 1000, 3),
+        }
+
+
+def _average_ms(total_seconds: float, count: int) -> float:
+    '''Среднее значение в миллисекундах'''
+    if not count:
+        return 0.0
+
+    return round(total_seconds / count * 1000, 3)
@@ -0,0 +1,52 @@
+import hashlib
+import json
+from collections.abc import Sequence
+from typing import Any
+
+from fastapi import Response, status
+
+from core.orm import Base
+
+
+def make_etag(model: type[Base], obj_id: Any, version: int) -> str:
+    '''Сильный ETag объекта: представление объекта меняется
+    только вместе с его версией
+
+    '''
+    return _hash_etag([model.__tablename__, str(obj_id), version])
+
+
+def make_page_etag(objs: Sequence[Base], next_cursor: str | None) -> str:
+    '''Сильный ETag страницы списка из идентификаторов и версий объектов'''
+    return _hash_etag([
+        [[obj.__tablename__, str(obj.id), obj.version] for obj in objs],
+        next_cursor,
+    ])
+
+
+def is_etag_matched(if_none_match: str | None, etag: str) -> bool:
+    '''Совпадает ли ETag с одним из значений заголовка If-None-Match.
+    Для If-None-Match используется слабое сравнение(RFC 7232)
+
+    '''
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+
+    return any(
+        client_etag.strip().removeprefix('W/') == etag
+        for client_etag in if_none_match.split(',')
+    )
+
+
+def not_modified_response(etag: str) -> Response:
+    '''Ответ 304 без тела'''
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+
+def _hash_etag(parts: list[Any]) -> str:
+    '''Значение ETag в кавычках из хэша частей'''
+    digest = hashlib.sha1(json.dumps(parts).encode()).hexdigest()
+
+    return f'"{digest}"'
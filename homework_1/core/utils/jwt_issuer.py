@@ -1,74 +1,280 @@
+import asyncio
+import os
+from collections.abc import Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from functools import cached_property
+from typing import TYPE_CHECKING, Any
 
-from jose import jwt
-
+from core.settings.jwt import JWTSettings
 from core.settings.settings import settings
+from core.utils.jwt_keys import (
+    is_asymmetric,
+    make_key_id,
+    make_public_jwk,
+    prepare_signing_key,
+    prepare_verification_key,
+)
+
+if TYPE_CHECKING:
+    from jose.backends.base import Key
 
 
 class JWTIssuer:
-    '''Класс для создания JWT токенов'''
+    '''Класс для создания JWT токенов. Сроки жизни токенов считаются при
+    создании, а ключи готовятся один раз, при выпуске первого токена,
+    вместе с импортом python-jose. Одновременные запросы на выпуск
+    через issue_tokens_async собираются в пачки и подписываются в пуле
+    потоков или процессов, не блокируя event loop
+
+    '''
+    def __init__(self, jwt_settings: JWTSettings) -> None:
+        self.settings = jwt_settings
+        self._access_token_lifetime = timedelta(
+            **{
+                jwt_settings.access_token_exp_in_time_period:
+                    jwt_settings.access_token_exp_in_value,
+            },
+        )
+        self._refresh_token_lifetime = timedelta(
+            **{
+                jwt_settings.refresh_token_exp_in_time_period:
+                    jwt_settings.refresh_token_exp_in_value,
+            },
+        )
+
+        self._executor: Executor | None = None
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+
     # TODO: скорее всего, позже надо будет зашить данные о юзере в токен
     def issue_tokens(self, user_id: str) -> dict:
         '''Выпустить пару JWT токенов(access и refresh)'''
-        access_token_data = self._arrange_token_data(
-            {settings.jwt.access_token_exp_in_time_period: settings.jwt.access_token_exp_in_value},
-            user_id,
+        return self.issue_tokens_batch([user_id])[0]
+
+    def issue_tokens_batch(
+        self,
+        user_ids: Sequence[str],
+        now: datetime | None = None,
+    ) -> list[dict]:
+        '''Выпустить пары токенов для нескольких пользователей. Время
+        выпуска и сроки действия считаются один раз на пачку
+
+        '''
+        now = now or datetime.now(timezone.utc)
+        issued_at = int(now.timestamp())
+        access_token_exp = int((now + self._access_token_lifetime).timestamp())
+        refresh_token_exp = int((now + self._refresh_token_lifetime).timestamp())
+        access_key, access_headers = self._signing_keys['access']
+        refresh_key, refresh_headers = self._signing_keys['refresh']
+
+        return [
+            {
+                'access_token': self._sign_token(
+                    self._arrange_token_data(user_id, issued_at, access_token_exp),
+                    access_key,
+                    access_headers,
+                ),
+                'exp': access_token_exp,
+                'refresh_token': self._sign_token(
+                    self._arrange_token_data(user_id, issued_at, refresh_token_exp),
+                    refresh_key,
+                    refresh_headers,
+                ),
+            }
+            for user_id in user_ids
+        ]
+
+    async def issue_tokens_async(self, user_id: str) -> dict:
+        '''Выпустить пару токенов в пуле. Запросы, пришедшие в течение
+        issuance_batch_delay_ms, подписываются одной задачей пула
+
+        '''
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((user_id, future))
+
+        if len(self._pending) >= self.settings.issuance_batch_size:
+            self._flush_pending()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(
+                self.settings.issuance_batch_delay_ms / 1000,
+                self._flush_pending,
+            )
+
+        return await future
+
+    def public_jwks(self) -> dict[str, list[dict[str, Any]]]:
+        '''Публичные ключи проверки access токенов в формате JWKS. Пусто,
+        если токены подписываются общим секретом
+
+        '''
+        if (
+            self.settings.access_token_secret_key is None
+            or not is_asymmetric(self.settings.algorithm)
+        ):
+            return {'keys': []}
+
+        verification_key = prepare_verification_key(
+            self.settings.access_token_secret_key,
+            self.settings.access_token_public_key,
+            self.settings.algorithm,
         )
-        refresh_token_data = self._arrange_token_data(
-            {settings.jwt.refresh_token_exp_in_time_period: settings.jwt.refresh_token_exp_in_value},
-            user_id,
+
+        return {'keys': [make_public_jwk(verification_key)]}
+
+    def close(self) -> None:
+        '''Остановить пул подписи'''
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _flush_pending(self) -> None:
+        '''Отправить накопленные запросы на выпуск в пул одной задачей'''
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        loop = asyncio.get_running_loop()
+        batch = loop.run_in_executor(
+            self._get_executor(),
+            issue_tokens_batch_in_pool,
+            [user_id for user_id, _ in pending],
+            datetime.now(timezone.utc),
         )
+        batch.add_done_callback(lambda batch: _resolve_pending(batch, pending))
 
+    @cached_property
+    def _signing_keys(self) -> dict[str, tuple['Key | None', dict[str, str] | None]]:
+        '''Ключи подписи и заголовки access и refresh токенов'''
         return {
-            'access_token': self._sign_token(
-                access_token_data,
-                settings.jwt.access_token_secret_key,
+            'access': self._prepare_key(
+                self.settings.access_token_secret_key,
+                self.settings.access_token_public_key,
             ),
-            'exp': access_token_data['exp'],
-            'refresh_token': self._sign_token(
-                refresh_token_data,
-                settings.jwt.refresh_token_secret_key,
+            'refresh': self._prepare_key(
+                self.settings.refresh_token_secret_key,
+                self.settings.refresh_token_public_key,
             ),
         }
 
-    def _arrange_token_data(self, token_exp_data: dict[str, int], user_id: str) -> dict:
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.settings.issuance_executor == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.settings.issuance_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.settings.issuance_workers,
+                    thread_name_prefix='jwt-issuer',
+                )
+
+        return self._executor
+
+    def _prepare_key(
+        self,
+        key: str | None,
+        public_key: str | None,
+    ) -> tuple['Key | None', dict[str, str] | None]:
+        '''Ключ подписи и заголовки токена. Для алгоритмов с парой
+        ключей в заголовок пишется kid публичного ключа
+
+        '''
+        if key is None:
+            return None, None
+
+        algorithm = self.settings.algorithm
+        signing_key = prepare_signing_key(key, algorithm)
+        if not is_asymmetric(algorithm):
+            return signing_key, None
+
+        verification_key = prepare_verification_key(key, public_key, algorithm)
+
+        return signing_key, {'kid': make_key_id(verification_key)}
+
+    def _arrange_token_data(self, user_id: str, issued_at: int, exp: int) -> dict:
         '''Сгруппировать данные токена'''
         token_data = {
-            'aud': settings.jwt.audience,
-            'exp': self._calculate_exp_timestamp(token_exp_data),
-            'iat': datetime.now(timezone.utc),
-            'iss': settings.jwt.issuer,
+            'aud': self.settings.audience,
+            'exp': exp,
+            'iat': issued_at,
+            'iss': self.settings.issuer,
             'sub': user_id,
         }
 
         return token_data
 
-    @staticmethod
-    def _calculate_exp_timestamp(token_exp_data: dict[str, int]) -> int:
-        '''Расчитать timestamp в UTC, когда токен перестанет
-        быть валидным
-        '''
-        token_exp_timedelta = timedelta(
-            **token_exp_data,
-        )
-        utc_datetime_now = datetime.now(timezone.utc)
-        token_exp_timestamp = int((utc_datetime_now + token_exp_timedelta).timestamp())
-
-        return token_exp_timestamp
-
-    @staticmethod
-    def _sign_token(token_data: dict, secret_key: str) -> str:
+    def _sign_token(
+        self,
+        token_data: dict,
+        key: 'Key | None',
+        headers: dict[str, str] | None,
+    ) -> str:
         '''Закодировать данные токена, используя нужный алгоритм
         и подпись
 
         '''
+        from jose import jwt
+
+        if key is None:
+            raise RuntimeError('JWT signing key is not set')
+
         token = jwt.encode(
             token_data,
-            secret_key,
-            settings.jwt.algorithm,
+            key,
+            self.settings.algorithm,
+            headers=headers,
         )
 
         return token
 
 
-jwt_issuer = JWTIssuer()
+def issue_tokens_batch_in_pool(user_ids: Sequence[str], now: datetime) -> list[dict]:
+    '''Задача пула подписи. Функция модуля, чтобы ее можно было передать
+    в пул процессов: там используется JWTIssuer процесса пула
+
+    '''
+    return get_jwt_issuer().issue_tokens_batch(user_ids, now)
+
+
+def _resolve_pending(batch: asyncio.Future, pending: list[tuple[str, asyncio.Future]]) -> None:
+    '''Раздать результаты пачки ожидающим запросам'''
+    for index, (_, future) in enumerate(pending):
+        if future.done():
+            continue
+        if batch.cancelled():
+            future.cancel()
+        elif batch.exception() is not None:
+            future.set_exception(batch.exception())
+        else:
+            future.set_result(batch.result()[index])
+
+
+# JWTIssuer и pid процесса, в котором он создан: воркер после fork и
+# процесс пула подписи создают свой, без пула родительского процесса
+_jwt_issuer: JWTIssuer | None = None
+_jwt_issuer_pid: int | None = None
+
+
+def get_jwt_issuer() -> JWTIssuer:
+    '''JWTIssuer текущего процесса, создается при первом обращении'''
+    global _jwt_issuer, _jwt_issuer_pid
+
+    if _jwt_issuer is None or _jwt_issuer_pid != os.getpid():
+        _jwt_issuer = JWTIssuer(settings.jwt)
+        _jwt_issuer_pid = os.getpid()
+
+    return _jwt_issuer
+
+
+def close_jwt_issuer() -> None:
+    '''Остановить пул подписи JWTIssuer текущего процесса'''
+    global _jwt_issuer, _jwt_issuer_pid
+
+    if _jwt_issuer is not None and _jwt_issuer_pid == os.getpid():
+        _jwt_issuer.close()
+    _jwt_issuer = None
+    _jwt_issuer_pid = None
@@ -0,0 +1,59 @@
+import hashlib
+import json
+from typing import TYPE_CHECKING, Any
+
+# python-jose с криптографическими бэкендами импортируется при первой
+# подготовке ключа, а не при импорте модуля
+if TYPE_CHECKING:
+    from jose.backends.base import Key
+
+
+# Алгоритмы с парой ключей: токены подписываются приватным ключом,
+# а проверить их можно публичным, не зная секрета
+ASYMMETRIC_ALGORITHMS = frozenset(
+    ('ES256', 'ES384', 'ES512', 'RS256', 'RS384', 'RS512'),
+)
+
+
+def is_asymmetric(algorithm: str) -> bool:
+    '''Подписывается ли токен приватным ключом'''
+    return algorithm in ASYMMETRIC_ALGORITHMS
+
+
+def prepare_signing_key(key: str, algorithm: str) -> 'Key':
+    '''Ключ подписи: секрет HMAC или приватный ключ в PEM'''
+    from jose import jwk
+
+    return jwk.construct(key, algorithm)
+
+
+def prepare_verification_key(key: str, public_key: str | None, algorithm: str) -> 'Key':
+    '''Ключ проверки подписи. Для алгоритмов с парой ключей -- публичный
+    ключ из настроек или выведенный из приватного
+
+    '''
+    from jose import jwk
+
+    if not is_asymmetric(algorithm):
+        return jwk.construct(key, algorithm)
+
+    if public_key is not None:
+        return jwk.construct(public_key, algorithm)
+
+    return jwk.construct(key, algorithm).public_key()
+
+
+def make_key_id(verification_key: 'Key') -> str:
+    '''Идентификатор ключа(kid) по отпечатку его публичной части'''
+    public_jwk = json.dumps(verification_key.to_dict(), sort_keys=True)
+
+    return hashlib.sha256(public_jwk.encode()).hexdigest()[:16]
+
+
+def make_public_jwk(verification_key: 'Key') -> dict[str, Any]:
+    '''Публичный ключ в формате JWK для проверки токенов другими сервисами'''
+    return {
+        **verification_key.to_dict(),
+        'kid': make_key_id(verification_key),
+        'use': 'sig',
+    }
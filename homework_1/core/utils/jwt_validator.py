@@ -1,38 +1,177 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from functools import cached_property
+from typing import TYPE_CHECKING, Any
+
 from fastapi import Depends
 from fastapi.security import OAuth2PasswordBearer
-from jose import exceptions as jwt_exceptions, jwt
 
 from core.errors.app_errors import UnauthorizedError
+from core.settings.jwt import JWTSettings
 from core.settings.settings import settings
+from core.utils.jwt_keys import is_asymmetric, prepare_verification_key
+
+if TYPE_CHECKING:
+    from jose.backends.base import Key
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='token')
 
 
+class TokenClaimsCache:
+    '''LRU кэш проверенных токенов: ключ -- дайджест токена, значение --
+    его claims. Запись живет до exp токена, при переполнении вытесняется
+    давно не использованная
+
+    '''
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: OrderedDict[bytes, tuple[dict[str, Any], float]] = OrderedDict()
+
+    def get(self, key: bytes, now: float) -> dict[str, Any] | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        claims, expires_at = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+
+        return claims
+
+    def set(self, key: bytes, claims: dict[str, Any], expires_at: float) -> None:
+        if not self.max_size:
+            return
+
+        self._entries[key] = (claims, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: bytes) -> None:
+        self._entries.pop(key, None)
+
+    def delete_subject(self, subject: str) -> None:
+        '''Удалить записи всех токенов субъекта'''
+        for key in [key for key, (claims, _) in self._entries.items() if claims['sub'] == subject]:
+            del self._entries[key]
+
+
 class JWTValidator:
-    '''Сервис для валидации JWT токенов'''
-    def validate_access_token(self, access_token: str = Depends(oauth2_scheme)) -> str:
+    '''Сервис для валидации JWT токенов. Ключи подписи готовятся один
+    раз, при первой проверке, результаты проверки кэшируются до истечения срока
+    действия токена, поэтому повторный запрос с тем же токеном не
+    проверяет подпись. Отзыв токенов и кэш хранятся в памяти процесса:
+    при нескольких воркерах revoke_* нужно вызвать в каждом из них
+
+    '''
+    def __init__(self, jwt_settings: JWTSettings) -> None:
+        self.settings = jwt_settings
+        self._algorithms = [jwt_settings.algorithm]
+        self._cache = TokenClaimsCache(jwt_settings.validation_cache_size)
+        # Отозванные токены(дайджест -> exp) и субъекты(sub -> токены,
+        # выпущенные раньше этого момента, невалидны)
+        self._revoked_tokens: dict[bytes, float] = {}
+        self._revoked_subjects: dict[str, float] = {}
+        # Через это время после отзыва субъекта все его отозванные токены
+        # истекли, и запись об отзыве больше не нужна
+        self._max_token_lifetime = max(
+            timedelta(
+                **{
+                    jwt_settings.access_token_exp_in_time_period:
+                        jwt_settings.access_token_exp_in_value,
+                },
+            ),
+            timedelta(
+                **{
+                    jwt_settings.refresh_token_exp_in_time_period:
+                        jwt_settings.refresh_token_exp_in_value,
+                },
+            ),
+        ).total_seconds()
+
+    async def validate_access_token(self, access_token: str = Depends(oauth2_scheme)) -> str:
         '''Проверить валидность access token'''
-        user_id = self._validate_token(access_token, settings.jwt.access_token_secret_key)
+        user_id = self._validate_token(access_token, 'access')
 
         return user_id
 
-    def validate_refresh_token(self, refresh_token: str = Depends(oauth2_scheme)) -> str:
+    async def validate_refresh_token(self, refresh_token: str = Depends(oauth2_scheme)) -> str:
         '''Проверить валидность refresh token'''
-        user_id = self._validate_token(refresh_token, settings.jwt.refresh_token_secret_key)
+        user_id = self._validate_token(refresh_token, 'refresh')
 
         return user_id
 
-    @staticmethod
-    def _validate_token(token, token_secret_key) -> str:
-        '''Проверить валидность токена и верну'''
+    def revoke_token(self, token: str) -> None:
+        '''Отозвать токен до истечения его срока действия'''
+        from jose import exceptions as jwt_exceptions, jwt
+
+        try:
+            claims = jwt.get_unverified_claims(token)
+        except jwt_exceptions.JWTError:
+            # Нераскодируемый токен и так не пройдет проверку
+            return
+
+        now = time.time()
+        self._revoked_tokens = {
+            cache_key: exp for cache_key, exp in self._revoked_tokens.items() if exp > now
+        }
+        exp = claims.get('exp', now)
+        for token_type in ('access', 'refresh'):
+            cache_key = self._make_cache_key(token_type, token)
+            self._cache.delete(cache_key)
+            self._revoked_tokens[cache_key] = exp
+
+    def revoke_subject(self, subject: str) -> None:
+        '''Отозвать все выпущенные до текущего момента токены субъекта'''
+        now = time.time()
+        self._revoked_subjects = {
+            revoked_subject: revoked_at
+            for revoked_subject, revoked_at in self._revoked_subjects.items()
+            if revoked_at + self._max_token_lifetime > now
+        }
+        self._revoked_subjects[subject] = now
+        self._cache.delete_subject(subject)
+
+    def _validate_token(self, token: str, token_type: str) -> str:
+        '''Проверить валидность токена и вернуть его субъект'''
+        cache_key = self._make_cache_key(token_type, token)
+        now = time.time()
+        claims = self._cache.get(cache_key, now)
+        if claims is None:
+            claims = self._decode_token(token, token_type)
+            if 'exp' in claims:
+                self._cache.set(cache_key, claims, expires_at=claims['exp'])
+
+        if self._is_revoked(cache_key, claims, now):
+            raise UnauthorizedError(
+                user_error_message='Токен отозван',
+                details={'token': token},
+            )
+
+        return claims['sub']
+
+    def _decode_token(self, token: str, token_type: str) -> dict[str, Any]:
+        '''Проверить подпись и claims токена'''
+        from jose import exceptions as jwt_exceptions, jwt
+
+        key = self._keys[token_type]
+        if key is None:
+            raise RuntimeError(f'JWT__{token_type.upper()}_TOKEN_SECRET_KEY is not set')
+
         try:
-            token_data = jwt.decode(
+            return jwt.decode(
                 token,
-                token_secret_key,
-                algorithms=settings.jwt.algorithm,
-                audience=settings.jwt.audience,
-                issuer=settings.jwt.issuer,
+                key,
+                algorithms=self._algorithms,
+                audience=self.settings.audience,
+                issuer=self.settings.issuer,
             )
         except jwt_exceptions.ExpiredSignatureError as e:
             user_error_message='Истёк срок действия токена'
@@ -43,10 +182,6 @@ class JWTValidator:
         except jwt_exceptions.JWTError as e:
             user_error_message='Невалидный токен'
             exception = e
-        else:
-            user_id = token_data['sub']
-
-            return user_id
 
         raise UnauthorizedError(
             user_error_message=user_error_message,
@@ -54,5 +189,78 @@ class JWTValidator:
             details={'token': token},
         )
 
+    def _is_revoked(self, cache_key: bytes, claims: dict[str, Any], now: float) -> bool:
+        revoked_until = self._revoked_tokens.get(cache_key)
+        if revoked_until is not None:
+            if revoked_until > now:
+                return True
+            del self._revoked_tokens[cache_key]
+
+        revoked_before = self._revoked_subjects.get(claims['sub'])
+
+        return revoked_before is not None and claims.get('iat', 0) <= revoked_before
+
+    @cached_property
+    def _keys(self) -> dict[str, 'Key | None']:
+        '''Ключи проверки access и refresh токенов'''
+        return {
+            'access': self._prepare_key(
+                self.settings.access_token_secret_key,
+                self.settings.access_token_public_key,
+            ),
+            'refresh': self._prepare_key(
+                self.settings.refresh_token_secret_key,
+                self.settings.refresh_token_public_key,
+            ),
+        }
+
+    def _prepare_key(self, secret_key: str | None, public_key: str | None) -> 'Key | None':
+        '''Ключ проверки подписи в виде объекта python-jose. Для ES*/RS*
+        достаточно публичного ключа
+
+        '''
+        if secret_key is None:
+            if public_key is None or not is_asymmetric(self.settings.algorithm):
+                return None
+            from jose import jwk
+
+            return jwk.construct(public_key, self.settings.algorithm)
+
+        return prepare_verification_key(secret_key, public_key, self.settings.algorithm)
+
+    @staticmethod
+    def _make_cache_key(token_type: str, token: str) -> bytes:
+        return hashlib.sha256(f'{token_type}:{token}'.encode()).digest()
+
+
+# JWTValidator и pid процесса, в котором он создан: после fork воркер
+# создает свой с пустыми кэшем и списками отзыва
+_jwt_validator: JWTValidator | None = None
+_jwt_validator_pid: int | None = None
+
+
+def get_jwt_validator() -> JWTValidator:
+    '''JWTValidator текущего процесса, создается при первом обращении'''
+    global _jwt_validator, _jwt_validator_pid
+
+    if _jwt_validator is None or _jwt_validator_pid != os.getpid():
+        _jwt_validator = JWTValidator(settings.jwt)
+        _jwt_validator_pid = os.getpid()
+
+    return _jwt_validator
+
+
+async def validate_access_token(access_token: str = Depends(oauth2_scheme)) -> str:
+    '''Зависимость FastAPI: проверить access токен запроса и вернуть
+    идентификатор пользователя
+
+    '''
+    return await get_jwt_validator().validate_access_token(access_token)
+
+
+async def validate_refresh_token(refresh_token: str = Depends(oauth2_scheme)) -> str:
+    '''Зависимость FastAPI: проверить refresh токен запроса и вернуть
+    идентификатор пользователя
 
-jwt_validator = JWTValidator()
+    '''
+    return await get_jwt_validator().validate_refresh_token(refresh_token)
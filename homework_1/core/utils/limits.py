@@ -0,0 +1,43 @@
+'''Ограничения размера запросов из настроек. Настройки читаются при
+обработке запроса, а не при импорте модулей эндпоинтов
+
+'''
+from collections.abc import Sized
+
+from fastapi import Query
+
+from core.errors.app_errors import BadRequestError
+from core.settings.settings import settings
+
+
+async def get_page_limit(
+    limit: int | None = Query(
+        None,
+        ge=1,
+        description=(
+            'Размер страницы, по умолчанию APP__PAGE_SIZE_DEFAULT, не больше APP__PAGE_SIZE_MAX'
+        ),
+    ),
+) -> int:
+    '''Размер страницы из запроса или из настроек'''
+    if limit is None:
+        return settings.app.page_size_default
+
+    if limit > settings.app.page_size_max:
+        raise BadRequestError(
+            user_error_message=f'Размер страницы не может быть больше {settings.app.page_size_max}',
+            details={'limit': limit},
+        )
+
+    return limit
+
+
+def validate_bulk_size(items: Sized, field: str) -> None:
+    '''Проверить, что в пакетном запросе не больше APP__BULK_MAX_ITEMS объектов'''
+    if len(items) > settings.app.bulk_max_items:
+        raise BadRequestError(
+            user_error_message=(
+                f'В одном запросе можно передать не больше {settings.app.bulk_max_items} объектов'
+            ),
+            details={field: len(items)},
+        )
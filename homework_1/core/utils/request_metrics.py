@@ -0,0 +1,274 @@
+import time
+from bisect import bisect_left
+from collections.abc import Sequence
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.settings.metrics import MetricsSettings
+from core.settings.settings import settings
+from core.utils.db_pool import InstrumentedAsyncQueuePool
+
+
+# Метка маршрута для запросов, не попавших ни в один эндпоинт: путь
+# запроса в метку не попадает, чтобы не раздувать число временных рядов
+UNMATCHED_ROUTE = '<unmatched>'
+
+
+@dataclass
+class RequestStats:
+    '''Работа с БД в рамках одного запроса к API'''
+    statements: int = 0
+    db_time: float = 0.0
+    pool_wait_time: float = 0.0
+    rows: int = 0
+
+
+class Histogram:
+    '''Гистограмма в формате Prometheus: счетчики по корзинам, сумма
+    и количество наблюдений
+
+    '''
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> list[str]:
+        '''Строки гистограммы с накопительными значениями корзин'''
+        lines = []
+        cumulative = 0
+        for bucket, count in zip([*self.buckets, '+Inf'], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bucket}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+
+        return lines
+
+
+class RouteMetrics:
+    '''Накопленные метрики одного маршрута'''
+    def __init__(self, metrics_settings: MetricsSettings) -> None:
+        self.responses: dict[int, int] = {}
+        self.duration = Histogram(metrics_settings.duration_buckets)
+        self.statements = Histogram(metrics_settings.statements_buckets)
+        self.db_time = 0.0
+        self.pool_wait_time = 0.0
+        self.rows = 0
+
+
+class RequestMetrics:
+    '''Метрики запросов к API: длительность, количество SQL запросов,
+    время в БД, ожидание соединения из пула и прочитанные строки, с
+    метками по шаблону маршрута. Работа с БД считается через события
+    движка SQLAlchemy в статистику текущего запроса из contextvar.
+    Выключенные метрики не вешают обработчики событий на движок.
+    Метрики хранятся в памяти процесса, каждый воркер отдает свои
+
+    '''
+    def __init__(self, metrics_settings: MetricsSettings) -> None:
+        self.settings = metrics_settings
+        self.routes: dict[tuple[str, str], RouteMetrics] = {}
+        self._request_stats: ContextVar[RequestStats | None] = ContextVar(
+            'request_metrics_stats',
+            default=None,
+        )
+
+    def instrument(self, engine: Engine) -> None:
+        '''Повесить обработчики событий на синхронный движок и его пул'''
+        if not self.settings.enabled:
+            return
+
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        if isinstance(engine.pool, InstrumentedAsyncQueuePool):
+            engine.pool.wait_listeners.append(self._record_pool_wait)
+
+    def start_request(self) -> RequestStats:
+        '''Начать сбор статистики для текущего запроса к API'''
+        stats = RequestStats()
+        self._request_stats.set(stats)
+
+        return stats
+
+    def record_request(
+        self,
+        method: str,
+        route: str,
+        status_code: int,
+        duration: float,
+        stats: RequestStats,
+    ) -> None:
+        '''Учесть завершенный запрос к API'''
+        route_metrics = self.routes.get((method, route))
+        if route_metrics is None:
+            route_metrics = self.routes[(method, route)] = RouteMetrics(self.settings)
+
+        route_metrics.responses[status_code] = route_metrics.responses.get(status_code, 0) + 1
+        route_metrics.duration.observe(duration)
+        route_metrics.statements.observe(stats.statements)
+        route_metrics.db_time += stats.db_time
+        route_metrics.pool_wait_time += stats.pool_wait_time
+        route_metrics.rows += stats.rows
+
+    def render(self) -> str:
+        '''Метрики в текстовом формате Prometheus'''
+        routes = sorted(self.routes.items())
+        lines = [
+            '# HELP http_requests_total Количество запросов к API',
+            '# TYPE http_requests_total counter',
+        ]
+        for (method, route), route_metrics in routes:
+            for status_code, amount in sorted(route_metrics.responses.items()):
+                labels = _format_labels(method, route)
+                lines.append(f'http_requests_total{{{labels},status="{status_code}"}} {amount}')
+
+        for name, description, histogram_name in (
+            (
+                'http_request_duration_seconds',
+                'Длительность запросов к API',
+                'duration',
+            ),
+            (
+                'http_request_db_statements',
+                'Количество SQL запросов на запрос к API',
+                'statements',
+            ),
+        ):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} histogram')
+            for (method, route), route_metrics in routes:
+                histogram = getattr(route_metrics, histogram_name)
+                lines.extend(histogram.render(name, _format_labels(method, route)))
+
+        for name, description, attribute in (
+            (
+                'http_request_db_time_seconds_total',
+                'Время выполнения SQL запросов',
+                'db_time',
+            ),
+            (
+                'http_request_db_pool_wait_seconds_total',
+                'Время ожидания соединения из пула',
+                'pool_wait_time',
+            ),
+            (
+                'http_request_db_rows_affected_total',
+                'Количество строк, измененных SQL запросами, по rowcount драйвера',
+                'rows',
+            ),
+        ):
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} counter')
+            for (method, route), route_metrics in routes:
+                value = getattr(route_metrics, attribute)
+                lines.append(f'{name}{{{_format_labels(method, route)}}} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._request_metrics_started_at = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        stats = self._request_stats.get()
+        if stats is None:
+            return
+
+        stats.statements += 1
+        stats.db_time += time.perf_counter() - context._request_metrics_started_at
+        row_count = cursor_row_count(cursor)
+        if row_count is not None:
+            stats.rows += row_count
+
+    def _record_pool_wait(self, wait_time: float) -> None:
+        stats = self._request_stats.get()
+        if stats is not None:
+            stats.pool_wait_time += wait_time
+
+
+class RequestMetricsMiddleware:
+    '''ASGI middleware: собирает метрики запроса и добавляет в ответ
+    заголовок Server-Timing. Тело ответа не буферизуется, поэтому
+    Server-Timing включает работу с БД до начала ответа
+
+    '''
+    def __init__(self, app: ASGIApp, metrics: 'RequestMetrics') -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        stats = self.metrics.start_request()
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_server_timing(message: Message) -> None:
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                if self.metrics.settings.server_timing:
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        'Server-Timing',
+                        _format_server_timing(stats, time.perf_counter() - started_at),
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            route = scope.get('route')
+            self.metrics.record_request(
+                scope['method'],
+                getattr(route, 'path', UNMATCHED_ROUTE),
+                status_code,
+                time.perf_counter() - started_at,
+                stats,
+            )
+
+
+def cursor_row_count(cursor: Any) -> int | None:
+    '''Количество строк, затронутых запросом, по rowcount курсора DB-API.
+    None -- драйвер его не сообщает: asyncpg и aiosqlite не сообщают
+    rowcount для SELECT
+
+    '''
+    row_count = cursor.rowcount
+
+    return row_count if row_count >= 0 else None
+
+
+def _format_labels(method: str, route: str) -> str:
+    route = route.replace('\\', '\\\\').replace('"', '\\"')
+
+    return f'method="{method}",route="{route}"'
+
+
+def _format_server_timing(stats: RequestStats, app_time: float) -> str:
+    return (
+        f'db;dur={stats.db_time * 1000:.3f};desc="{stats.statements} statements", '
+        f'db-pool;dur={stats.pool_wait_time * 1000:.3f}, '
+        f'app;dur={app_time * 1000:.3f}'
+    )
+
+
+@lru_cache(maxsize=None)
+def get_request_metrics() -> RequestMetrics:
+    '''Метрики запросов процесса, создаются при первом обращении'''
+    return RequestMetrics(settings.metrics)
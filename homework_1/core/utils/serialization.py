@@ -0,0 +1,60 @@
+from collections.abc import Callable, Sequence
+from typing import Any
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+from core.orm import Base
+
+
+class FastSerializer:
+    '''Сериализация объектов моделей в JSON байты в обход валидации
+    схемы чтения в orm_mode. Поля и их порядок берутся из схемы,
+    значения -- из атрибутов объекта как при from_orm. Валидаторы
+    схемы, меняющие значения, повторяются через converters
+
+    '''
+
+    def __init__(
+        self,
+        schema: type[BaseModel],
+        converters: dict[str, Callable[[Any], Any]] | None = None,
+    ) -> None:
+        self.schema = schema
+        self.converters = converters or {}
+        self._fields = tuple(
+            (field.alias, field.default) for field in schema.__fields__.values()
+        )
+
+    def to_dict(self, obj: Base) -> dict[str, Any]:
+        '''Представление объекта в виде словаря с полями схемы'''
+        data = {name: getattr(obj, name, default) for name, default in self._fields}
+        for name, convert in self.converters.items():
+            data[name] = convert(data[name])
+
+        return data
+
+    def response(self, obj: Base, headers: dict[str, str] | None = None) -> Response:
+        '''Ответ с одним объектом'''
+        return self._json_response(self.to_dict(obj), headers)
+
+    def page_response(
+        self,
+        objs: Sequence[Base],
+        next_cursor: str | None,
+        headers: dict[str, str] | None = None,
+    ) -> Response:
+        '''Ответ со страницей объектов в формате PageSchema'''
+        return self._json_response(
+            {'items': [self.to_dict(obj) for obj in objs], 'next_cursor': next_cursor},
+            headers,
+        )
+
+    @staticmethod
+    def _json_response(content: Any, headers: dict[str, str] | None) -> Response:
+        return Response(
+            content=orjson.dumps(content),
+            media_type='application/json',
+            headers=headers,
+        )
@@ -0,0 +1,291 @@
+import asyncio
+import inspect
+import logging
+import os
+import time
+from collections.abc import Callable, Coroutine
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from typing import Any
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from starlette.responses import StreamingResponse
+from starlette.types import Message
+
+from core.settings.settings import settings
+from core.settings.single_flight import SingleFlightSettings
+
+
+logger = logging.getLogger('single_flight')
+
+RouteHandler = Callable[[Request], Coroutine[Any, Any, Response]]
+
+# Заголовки запроса, от которых зависит ответ: запросы с разными
+# значениями не объединяются
+VARY_HEADERS = ('accept', 'accept-encoding', 'authorization', 'if-none-match')
+SAFE_METHODS = frozenset(('GET', 'HEAD'))
+
+
+@dataclass
+class Flight:
+    '''Выполняющийся вызов эндпоинта, к которому могут присоединиться
+    такие же запросы. generation None -- к вызову присоединяться нельзя
+
+    '''
+    task: asyncio.Task
+    started_at: float
+    generation: int | None
+
+
+class SingleFlight:
+    '''Объединение одинаковых одновременных запросов на чтение: первый
+    запрос начинает вызов эндпоинта, а запросы с тем же методом, путем,
+    параметрами и заголовками из VARY_HEADERS, пришедшие в течение
+    window_ms после начала вызова, ждут его и отдают тот же ответ, не
+    открывая сессию и не делая запросов к БД.
+
+    Вызов идет отдельной задачей с собственной копией запроса: сессию
+    БД и другие зависимости открывает и закрывает сама задача, поэтому
+    отмена или разрыв соединения запроса, который начал вызов, не
+    закрывают их для остальных. Ждущие запросы получают копию тела и
+    заголовков ответа, а не объекты сессии другого запроса.
+
+    Готовые ответы не хранятся, а после завершения любого запроса на
+    запись к начатым до этого вызовам присоединиться нельзя, поэтому
+    клиент видит свои изменения. Счетчик запросов на запись хранится в
+    памяти процесса, а с клиентом Redis -- общий для всех воркеров
+
+    '''
+    def __init__(
+        self,
+        single_flight_settings: SingleFlightSettings,
+        redis_client: Any | None = None,
+    ) -> None:
+        self.settings = single_flight_settings
+        self.redis_client = redis_client
+        self.leaders = 0
+        self.followers = 0
+        self._flights: dict[tuple, Flight] = {}
+        self._generation = 0
+
+    async def handle(
+        self,
+        route_handler: RouteHandler,
+        methods: set[str],
+        request: Request,
+    ) -> Response:
+        '''Обработать запрос к маршруту: чтения объединяются, а запись
+        закрывает начатые до нее вызовы для новых запросов
+
+        '''
+        if methods <= SAFE_METHODS:
+            return await self.run(_make_key(request), route_handler, request)
+
+        try:
+            return await route_handler(request)
+        finally:
+            await self._finish_write()
+
+    async def run(self, key: tuple, route_handler: RouteHandler, request: Request) -> Response:
+        '''Присоединиться к вызову с тем же ключом или начать новый. Начавший
+        вызов запрос отдает сам ответ эндпоинта, в том числе с фоновыми
+        задачами, а присоединившиеся -- его копии без фоновых задач
+
+        '''
+        flight = self._flights.get(key)
+        is_leader = flight is None or not await self._can_join(flight)
+        if is_leader:
+            # Счетчик записей снимается до чтения из БД: запись, которая
+            # завершится позже, закроет вызов для новых запросов
+            generation = await self._get_generation()
+            flight = Flight(
+                task=asyncio.create_task(_call_shared(route_handler, request)),
+                started_at=time.monotonic(),
+                generation=generation,
+            )
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._finish(key, flight))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        # Отмена ждущего запроса не отменяет вызов для остальных
+        response = await asyncio.shield(flight.task)
+        if isinstance(response, StreamingResponse):
+            # Зависимости общего вызова уже закрыты, а поток можно отправить
+            # только один раз. Такие маршруты SingleFlightRoute пропускает
+            raise RuntimeError(
+                f'Streaming response of {request.url.path} cannot be shared, '
+                'annotate the endpoint with its response class',
+            )
+
+        if is_leader:
+            return response
+
+        return _copy_response(response)
+
+    def get_statistics(self) -> dict[str, int]:
+        return {
+            'in_flight': len(self._flights),
+            'leaders': self.leaders,
+            'followers': self.followers,
+        }
+
+    async def close(self) -> None:
+        '''Закрыть соединение с Redis'''
+        if self.redis_client is not None:
+            await self.redis_client.close()
+
+    async def _can_join(self, flight: Flight) -> bool:
+        if (
+            flight.task.done()
+            or flight.generation is None
+            or time.monotonic() - flight.started_at > self.settings.window_ms / 1000
+        ):
+            return False
+
+        return flight.generation == await self._get_generation()
+
+    async def _get_generation(self) -> int | None:
+        '''Количество завершенных запросов на запись. None -- Redis
+        недоступен, и присоединяться к вызовам небезопасно
+
+        '''
+        if self.redis_client is None:
+            return self._generation
+
+        try:
+            return int(await self.redis_client.get(self.settings.generation_key) or 0)
+        except Exception as exception:
+            logger.warning('Failed to read the write generation: %r', exception)
+            return None
+
+    async def _finish_write(self) -> None:
+        self._generation += 1
+        if self.redis_client is None:
+            return
+
+        try:
+            await self.redis_client.incr(self.settings.generation_key)
+        except Exception as exception:
+            logger.warning('Failed to publish the write generation: %r', exception)
+
+    def _finish(self, key: tuple, flight: Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Ошибку получают ждущие запросы, но их может не остаться
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+
+class SingleFlightRoute(APIRoute):
+    '''Маршрут, запросы к которому проходят через single flight текущего
+    процесса, если он включен. Эндпоинты с потоковым ответом(по
+    response_class или аннотации возвращаемого значения) не объединяются:
+    поток читает сессию БД запроса и отправляется только один раз
+
+    '''
+    def get_route_handler(self) -> RouteHandler:
+        route_handler = super().get_route_handler()
+        if self._is_streaming():
+            return route_handler
+
+        methods = self.methods
+
+        async def single_flight_route_handler(request: Request) -> Response:
+            single_flight = get_single_flight()
+            if not single_flight.settings.enabled:
+                return await route_handler(request)
+
+            return await single_flight.handle(route_handler, methods, request)
+
+        return single_flight_route_handler
+
+    def _is_streaming(self) -> bool:
+        response_classes = (
+            getattr(self.response_class, 'value', self.response_class),
+            inspect.signature(self.endpoint, eval_str=True).return_annotation,
+        )
+
+        return any(
+            isinstance(response_class, type) and issubclass(response_class, StreamingResponse)
+            for response_class in response_classes
+        )
+
+
+async def _call_shared(route_handler: RouteHandler, request: Request) -> Response:
+    '''Вызвать эндпоинт с копией запроса, зависимости которой живут в
+    собственном AsyncExitStack задачи
+
+    '''
+    async with AsyncExitStack() as stack:
+        scope = {**request.scope, 'fastapi_astack': stack}
+
+        return await route_handler(Request(scope, receive=_receive_empty_body))
+
+
+async def _receive_empty_body() -> Message:
+    '''У объединяемых запросов нет тела, а соединение клиента общему
+    вызову не принадлежит
+
+    '''
+    return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+
+def _make_key(request: Request) -> tuple:
+    return (
+        request.method,
+        request.url.path,
+        request.scope['query_string'],
+        tuple(request.headers.get(header) for header in VARY_HEADERS),
+    )
+
+
+def _copy_response(response: Response) -> Response:
+    '''Ответ для присоединившегося запроса: тело и заголовки общего
+    вызова без его фоновых задач, которые выполнит начавший вызов запрос
+
+    '''
+    copy = Response(content=response.body, status_code=response.status_code)
+    copy.raw_headers = list(response.raw_headers)
+
+    return copy
+
+
+def create_single_flight(single_flight_settings: SingleFlightSettings) -> SingleFlight:
+    '''Создать single flight в соответствии с настройками'''
+    redis_client = None
+    if single_flight_settings.enabled and single_flight_settings.redis_url:
+        from redis import asyncio as aioredis
+
+        redis_client = aioredis.from_url(single_flight_settings.redis_url)
+
+    return SingleFlight(single_flight_settings, redis_client)
+
+
+# Single flight и pid процесса, в котором он создан: после fork воркер
+# создает свой, вызовы и соединения родительского процесса не используются
+_single_flight: SingleFlight | None = None
+_single_flight_pid: int | None = None
+
+
+def get_single_flight() -> SingleFlight:
+    '''Single flight текущего процесса, создается при первом обращении'''
+    global _single_flight, _single_flight_pid
+
+    if _single_flight is None or _single_flight_pid != os.getpid():
+        _single_flight = create_single_flight(settings.single_flight)
+        _single_flight_pid = os.getpid()
+
+    return _single_flight
+
+
+async def close_single_flight() -> None:
+    '''Закрыть соединения single flight текущего процесса'''
+    global _single_flight, _single_flight_pid
+
+    if _single_flight is not None and _single_flight_pid == os.getpid():
+        await _single_flight.close()
+    _single_flight = None
+    _single_flight_pid = None
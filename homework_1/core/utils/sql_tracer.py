@@ -0,0 +1,98 @@
+import json
+import logging
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core.settings.settings import settings
+from core.settings.sql_tracing import SQLTracingSettings
+from core.utils.request_metrics import cursor_row_count
+
+
+logger = logging.getLogger('sql_tracing')
+
+
+@dataclass(frozen=True)
+class SQLTraceRecord:
+    '''Запись о выполненном SQL запросе'''
+    statement: str
+    parameters: Any
+    duration_ms: float
+    row_count: int | None
+    sampled: bool
+
+
+class SQLTracer:
+    '''Трассировка SQL запросов через события движка SQLAlchemy.
+    Сэмплирование решается один раз на запрос к API, медленные
+    SQL запросы записываются всегда. Выключенная трассировка
+    не вешает обработчики событий на движок
+
+    '''
+    def __init__(self, tracing_settings: SQLTracingSettings) -> None:
+        self.settings = tracing_settings
+        self.records: deque[SQLTraceRecord] = deque(maxlen=tracing_settings.buffer_size)
+        self._request_sampled: ContextVar[bool | None] = ContextVar(
+            'sql_tracing_request_sampled',
+            default=None,
+        )
+
+    def instrument(self, engine: Engine) -> None:
+        '''Повесить обработчики событий на синхронный движок'''
+        if not self.settings.enabled:
+            return
+
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def start_request(self) -> None:
+        '''Принять решение о сэмплировании для текущего запроса к API'''
+        if self.settings.enabled:
+            self._request_sampled.set(random.random() < self.settings.sample_rate)
+
+    def _is_sampled(self) -> bool:
+        '''Сэмплирован ли текущий запрос. Вне запроса к API
+        решение принимается для каждого SQL запроса отдельно
+
+        '''
+        sampled = self._request_sampled.get()
+        if sampled is None:
+            return random.random() < self.settings.sample_rate
+
+        return sampled
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._sql_tracing_started_at = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - context._sql_tracing_started_at) * 1000
+        sampled = self._is_sampled()
+        if not sampled and duration_ms < self.settings.slow_query_threshold_ms:
+            return
+
+        record = SQLTraceRecord(
+            statement=statement,
+            parameters=parameters if self.settings.log_parameters else None,
+            duration_ms=round(duration_ms, 3),
+            row_count=cursor_row_count(cursor),
+            sampled=sampled,
+        )
+
+        if self.settings.sink == 'buffer':
+            self.records.append(record)
+        else:
+            log_level = logging.INFO if sampled else logging.WARNING
+            logger.log(log_level, json.dumps(asdict(record), default=str))
+
+
+@lru_cache(maxsize=None)
+def get_sql_tracer() -> SQLTracer:
+    '''Трассировщик SQL запросов процесса, создается при первом обращении'''
+    return SQLTracer(settings.sql_tracing)
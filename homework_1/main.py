@@ -1,8 +1,123 @@
-from fastapi import FastAPI
+'''Приложение FastAPI. Настройки читаются не при импорте модуля, а при
+создании приложения: create_app() или первое обращение к main.app, как
+делают `uvicorn main:app` и gunicorn
 
-from core.settings.settings import settings
+'''
+from typing import Any
+
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from core.errors.base import BaseAppError
+from core.orm import dispose_db_engine, get_async_engine, warm_up_db_engine
+from core.repositories.cache import close_repository_cache
+from core.settings.settings import get_settings
+from core.utils.jwt_issuer import close_jwt_issuer, get_jwt_issuer
+from core.utils.jwt_keys import is_asymmetric
+from core.utils.request_metrics import RequestMetricsMiddleware, get_request_metrics
+from core.utils.single_flight import close_single_flight, get_single_flight
+from core.utils.sql_tracer import get_sql_tracer
 from menu.routers.routers import router
 
-app = FastAPI(title=settings.app.project_name)
 
-app.include_router(router)
+async def handle_app_error(request: Request, exception: BaseAppError) -> JSONResponse:
+    '''Ответ на ошибку приложения с её HTTP статусом, кодом и деталями'''
+    return JSONResponse(
+        status_code=exception.http_status_code,
+        content=jsonable_encoder({
+            'code': exception.code,
+            'message': exception.user_error,
+            'details': exception.details,
+        }),
+        headers=exception.headers,
+    )
+
+
+async def start_worker() -> None:
+    '''Создать движок БД в процессе воркера и прогреть пул соединений'''
+    await warm_up_db_engine()
+
+
+async def stop_worker() -> None:
+    '''Закрыть соединения воркера с БД, кэшем и Redis single flight
+    и пул подписи токенов
+
+    '''
+    await dispose_db_engine()
+    close_jwt_issuer()
+    await close_repository_cache()
+    await close_single_flight()
+
+
+async def read_db_pool_statistics() -> dict:
+    '''Состояние и статистика пула соединений с БД текущего воркера'''
+    return get_async_engine().pool.get_statistics()
+
+
+async def read_jwks() -> dict:
+    '''Публичные ключи для проверки access токенов другими сервисами'''
+    return get_jwt_issuer().public_jwks()
+
+
+async def read_single_flight_statistics() -> dict:
+    '''Сколько запросов на чтение текущего воркера объединено'''
+    return get_single_flight().get_statistics()
+
+
+async def sample_sql_tracing(request: Request, call_next):
+    '''Принять решение о трассировке SQL запросов на весь запрос к API'''
+    get_sql_tracer().start_request()
+
+    return await call_next(request)
+
+
+async def read_metrics() -> PlainTextResponse:
+    '''Метрики запросов текущего воркера в формате Prometheus'''
+    return PlainTextResponse(
+        get_request_metrics().render(),
+        media_type='text/plain; version=0.0.4',
+    )
+
+
+def create_app() -> FastAPI:
+    '''Создать приложение по настройкам проекта'''
+    settings = get_settings()
+
+    app = FastAPI(title=settings.app.project_name)
+    app.include_router(router, prefix=settings.app.api_v1_str)
+    app.add_exception_handler(BaseAppError, handle_app_error)
+    app.add_event_handler('startup', start_worker)
+    app.add_event_handler('shutdown', stop_worker)
+
+    if is_asymmetric(settings.jwt.algorithm):
+        app.add_api_route('/.well-known/jwks.json', read_jwks, include_in_schema=False)
+
+    # Статистика воркера отдается без авторизации, поэтому выключена по умолчанию
+    if settings.app.internal_routes_enabled:
+        app.add_api_route('/internal/db-pool', read_db_pool_statistics, include_in_schema=False)
+
+    if settings.app.internal_routes_enabled and settings.single_flight.enabled:
+        app.add_api_route(
+            '/internal/single-flight',
+            read_single_flight_statistics,
+            include_in_schema=False,
+        )
+
+    if settings.sql_tracing.enabled:
+        app.middleware('http')(sample_sql_tracing)
+
+    if settings.metrics.enabled:
+        app.add_middleware(RequestMetricsMiddleware, metrics=get_request_metrics())
+        app.add_api_route('/metrics', read_metrics, include_in_schema=False)
+
+    return app
+
+
+def __getattr__(name: str) -> Any:
+    '''Создать приложение при первом обращении к main.app'''
+    if name == 'app':
+        app = globals()['app'] = create_app()
+        return app
+
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
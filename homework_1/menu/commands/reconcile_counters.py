@@ -0,0 +1,135 @@
+'''Пересчет счетчиков подменю и блюд по фактическим данным.
+Запуск из папки проекта:
+
+    python -m menu.commands.reconcile_counters [--dry-run]
+
+'''
+import argparse
+import asyncio
+import logging
+
+from sqlalchemy import distinct, func, or_, select, text, update
+from sqlalchemy.sql.dml import Update as UpdateQuery
+
+from core.orm import dispose_db_engine, get_async_engine
+from core.repositories.cache import close_repository_cache, get_repository_cache
+from menu.models.dish import DishModel
+from menu.models.menu import MenuModel
+from menu.models.submenu import SubmenuModel
+
+
+logger = logging.getLogger('reconcile_counters')
+
+
+def build_submenu_counters_query() -> UpdateQuery:
+    '''UPDATE подменю, у которых счетчик блюд разошелся с данными'''
+    counts = (
+        select(
+            SubmenuModel.id,
+            func.count(DishModel.id).label('amount_of_dishes'),
+        )
+        .select_from(SubmenuModel)
+        .outerjoin(SubmenuModel.dishes)
+        .group_by(SubmenuModel.id)
+        .subquery('counts')
+    )
+
+    return (
+        update(SubmenuModel)
+        .where(
+            SubmenuModel.id == counts.c.id,
+            SubmenuModel.amount_of_dishes != counts.c.amount_of_dishes,
+        )
+        .values(amount_of_dishes=counts.c.amount_of_dishes)
+        .returning(SubmenuModel.id)
+    )
+
+
+def build_menu_counters_query() -> UpdateQuery:
+    '''UPDATE меню, у которых счетчики подменю и блюд разошлись с данными'''
+    counts = (
+        select(
+            MenuModel.id,
+            func.count(distinct(SubmenuModel.id)).label('submenus_amount'),
+            func.count(DishModel.id).label('dishes_amount'),
+        )
+        .select_from(MenuModel)
+        .outerjoin(MenuModel.submenus)
+        .outerjoin(SubmenuModel.dishes)
+        .group_by(MenuModel.id)
+        .subquery('counts')
+    )
+
+    return (
+        update(MenuModel)
+        .where(
+            MenuModel.id == counts.c.id,
+            or_(
+                MenuModel.submenus_amount != counts.c.submenus_amount,
+                MenuModel.dishes_amount != counts.c.dishes_amount,
+            ),
+        )
+        .values(
+            submenus_amount=counts.c.submenus_amount,
+            dishes_amount=counts.c.dishes_amount,
+        )
+        .returning(MenuModel.id)
+    )
+
+
+async def reconcile_counters(*, dry_run: bool = False) -> dict[str, int]:
+    '''Исправить расхождения счетчиков и вернуть количество исправленных
+    строк по таблицам. Вставка и удаление подменю и блюд блокируются
+    на время пересчета, чтение -- нет. При dry_run транзакция
+    откатывается
+
+    '''
+    fixed = {}
+    async with get_async_engine().connect() as connection:
+        transaction = await connection.begin()
+        await connection.execute(text('LOCK TABLE submenu, dish IN SHARE MODE'))
+        for model, query in (
+            (SubmenuModel, build_submenu_counters_query()),
+            (MenuModel, build_menu_counters_query()),
+        ):
+            fixed_ids = (await connection.execute(query)).scalars().all()
+            fixed[model.__tablename__] = len(fixed_ids)
+            for fixed_id in fixed_ids:
+                logger.info('Counters drift: %s %s', model.__tablename__, fixed_id)
+
+        if dry_run:
+            await transaction.rollback()
+        else:
+            await transaction.commit()
+
+    repository_cache = get_repository_cache()
+    if not dry_run and any(fixed.values()) and repository_cache is not None:
+        # Подменю связано и с меню, и с блюдами: инвалидируются все три таблицы
+        await repository_cache.invalidate([SubmenuModel])
+
+    return fixed
+
+
+async def main(dry_run: bool) -> None:
+    try:
+        fixed = await reconcile_counters(dry_run=dry_run)
+    finally:
+        await dispose_db_engine()
+        await close_repository_cache()
+
+    action = 'Found' if dry_run else 'Fixed'
+    for table, amount in fixed.items():
+        logger.info('%s %s rows with drifted counters in %s', action, amount, table)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Пересчитать счетчики подменю и блюд')
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Только найти расхождения, не сохраняя исправления',
+    )
+    arguments = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(arguments.dry_run))
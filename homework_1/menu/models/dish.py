@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, String, Float, ForeignKeyConstraint, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Numeric, ForeignKeyConstraint, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -12,8 +12,10 @@ class DishModel(Base):
     '''Модель для описания таблицы с данными блюда'''
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(length=255), nullable=False)
-    price = Column(Float, nullable=False)
+    price = Column(Numeric(10, 2), nullable=False)
     submenu_id = Column(UUID(as_uuid=True), default=uuid.uuid4)
+    # Версия представления строки, увеличивается триггером БД при изменении строки
+    version = Column(Integer, nullable=False, default=1, server_default='1')
 
     submenu = relationship('SubmenuModel', back_populates='dishes', uselist=False)
 
@@ -28,5 +30,8 @@ class DishModel(Base):
         UniqueConstraint(
             name,
             name='dish__name__uniq'
-        )
+        ),
+        Index('dish__submenu_id__idx', submenu_id),
+        Index('dish__price__idx', price),
+        Index('dish__name__pattern_idx', name, postgresql_ops={'name': 'text_pattern_ops'}),
     )
@@ -1,7 +1,8 @@
 import uuid
 
-from sqlalchemy import Column, String
+from sqlalchemy import Column, Integer, Index, String
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship
 
 from core.orm import Base
 
@@ -10,5 +11,16 @@ class MenuModel(Base):
     '''Модель для описания таблицы с данными меню'''
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String(length=255), nullable=False)
+    # Версия представления строки, увеличивается триггерами БД при изменении
+    # строки, а также при создании и удалении её дочерних строк
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    # Счетчики дочерних строк, поддерживаются триггерами БД
+    submenus_amount = Column(Integer, nullable=False, default=0, server_default='0')
+    dishes_amount = Column(Integer, nullable=False, default=0, server_default='0')
+
+    submenus = relationship('SubmenuModel', back_populates='menu')
 
     __tablename__ = 'menu'
+    __table_args__ = (
+        Index('menu__name_id__idx', name, id),
+    )
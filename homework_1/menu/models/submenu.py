@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, String, ForeignKeyConstraint, UniqueConstraint
+from sqlalchemy import Column, Integer, String, ForeignKeyConstraint, Index, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -12,7 +12,13 @@ class SubmenuModel(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     menu_id = Column(UUID(as_uuid=True), default=uuid.uuid4)
     name = Column(String(length=255), nullable=False)
+    # Версия представления строки, увеличивается триггерами БД при изменении
+    # строки, а также при создании и удалении её дочерних строк
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    # Счетчик блюд подменю, поддерживается триггерами БД
+    amount_of_dishes = Column(Integer, nullable=False, default=0, server_default='0')
 
+    menu = relationship('MenuModel', back_populates='submenus', uselist=False)
     dishes = relationship('DishModel', back_populates='submenu')
 
     __tablename__ = 'submenu'
@@ -26,5 +32,7 @@ class SubmenuModel(Base):
         UniqueConstraint(
             name,
             name='submenu__name__uniq',
-        )
+        ),
+        Index('submenu__menu_id__idx', menu_id),
+        Index('submenu__name__pattern_idx', name, postgresql_ops={'name': 'text_pattern_ops'}),
     )
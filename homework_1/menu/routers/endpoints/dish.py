@@ -1,15 +1,32 @@
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Body, Depends, Header, Query, Response, status
+from decimal import Decimal
 from uuid import UUID
 
-from core.orm import create_db_session
-from core.repositories.base import Repository
 from core.repositories.enums import SQLOperators
+from core.repositories.unit_of_work import UnitOfWork, create_unit_of_work
+from core.schemas.bulk import BulkDeleteSchema
+from core.schemas.delete import DeleteResultSchema
+from core.schemas.pagination import PageSchema
+from core.settings.settings import settings
+from core.utils.limits import get_page_limit, validate_bulk_size
+from core.utils.etag import (
+    is_etag_matched,
+    make_etag,
+    make_page_etag,
+    not_modified_response,
+)
+from core.utils.single_flight import SingleFlightRoute
 from menu.models.dish import DishModel
-from menu.schemas.dish import DishCreateSchema, DishReadSchema, DishUpdateSchema
+from menu.schemas.dish import (
+    DishBulkUpdateSchema,
+    DishCreateSchema,
+    DishReadSchema,
+    DishUpdateSchema,
+    dish_read_serializer,
+)
 
 
-router = APIRouter()
+router = APIRouter(route_class=SingleFlightRoute)
 
 
 @router.post(
@@ -20,18 +37,145 @@ router = APIRouter()
 async def create_dish(
     submenu_id: UUID,
     request_body: DishCreateSchema,
-    db_session: AsyncSession = Depends(create_db_session),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
 ) -> DishModel:
-    repository = Repository(db_session)
-    dish = repository.add_obj_to_session(
+    dish = unit_of_work.add(
         model=DishModel,
         data={**request_body.dict(), 'submenu_id': submenu_id},
     )
-    await repository.commit()
+    await unit_of_work.commit()
 
     return dish
 
 
+@router.get(
+    '/{submenu_id}/dishes',
+    response_model=PageSchema[DishReadSchema],
+    description='Эндпоинт для получения списка блюд(keyset пагинация по name, id)',
+)
+async def list_dishes(
+    submenu_id: UUID,
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Depends(get_page_limit),
+    name_prefix: str | None = Query(
+        None,
+        min_length=1,
+        max_length=255,
+        description='Название блюда начинается с',
+    ),
+    price_min: Decimal | None = Query(None, ge=0, description='Цена не меньше'),
+    price_max: Decimal | None = Query(None, ge=0, description='Цена не больше'),
+    price_gt: Decimal | None = Query(None, ge=0, description='Цена больше'),
+    price_lt: Decimal | None = Query(None, ge=0, description='Цена меньше'),
+    if_none_match: str | None = Header(None),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> dict | Response:
+    conditions = [('submenu_id', SQLOperators.EQ, submenu_id)]
+    if name_prefix is not None:
+        conditions.append(('name', SQLOperators.STARTSWITH, name_prefix))
+    if price_min is not None and price_max is not None:
+        conditions.append(('price', SQLOperators.BETWEEN, (price_min, price_max)))
+    elif price_min is not None:
+        conditions.append(('price', SQLOperators.GE, price_min))
+    elif price_max is not None:
+        conditions.append(('price', SQLOperators.LE, price_max))
+    if price_gt is not None:
+        conditions.append(('price', SQLOperators.GT, price_gt))
+    if price_lt is not None:
+        conditions.append(('price', SQLOperators.LT, price_lt))
+
+    repository = unit_of_work.repository
+    dishes, next_cursor = await repository.select_page(
+        model=DishModel,
+        conditions=conditions,
+        limit=limit,
+        cursor=cursor,
+    )
+
+    etag = make_page_etag(dishes, next_cursor)
+    if is_etag_matched(if_none_match, etag):
+        return not_modified_response(etag)
+    if settings.app.fast_serialization:
+        return dish_read_serializer.page_response(dishes, next_cursor, headers={'ETag': etag})
+    response.headers['ETag'] = etag
+
+    return {'items': dishes, 'next_cursor': next_cursor}
+
+
+@router.post(
+    '/{submenu_id}/dishes/bulk',
+    response_model=list[DishReadSchema],
+    description='Эндпоинт для пакетного создания блюд одним запросом в БД',
+)
+async def create_dishes_bulk(
+    submenu_id: UUID,
+    request_body: list[DishCreateSchema] = Body(
+        min_items=1,
+    ),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> list[DishModel]:
+    validate_bulk_size(request_body, 'items')
+    repository = unit_of_work.repository
+    dishes = await repository.insert_and_return(
+        model=DishModel,
+        data=[{**dish.dict(), 'submenu_id': submenu_id} for dish in request_body],
+    )
+    await unit_of_work.commit()
+
+    return dishes
+
+
+@router.patch(
+    '/{submenu_id}/dishes/bulk',
+    response_model=list[DishReadSchema],
+    description='Эндпоинт для пакетного обновления блюд в одной транзакции',
+)
+async def update_dishes_bulk(
+    submenu_id: UUID,
+    request_body: list[DishBulkUpdateSchema] = Body(
+        min_items=1,
+    ),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> list[DishModel]:
+    validate_bulk_size(request_body, 'items')
+    repository = unit_of_work.repository
+    dishes = await repository.update_many_and_return(
+        model=DishModel,
+        data=[dish.dict(exclude_unset=True) for dish in request_body],
+        conditions=(
+            ('submenu_id', SQLOperators.EQ, submenu_id),
+        ),
+    )
+    await unit_of_work.commit()
+
+    return dishes
+
+
+@router.post(
+    '/{submenu_id}/dishes/bulk-delete',
+    response_model=DeleteResultSchema,
+    description='Эндпоинт для пакетного удаления блюд одним запросом в БД',
+)
+async def delete_dishes_bulk(
+    submenu_id: UUID,
+    request_body: BulkDeleteSchema,
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> dict:
+    validate_bulk_size(request_body.ids, 'ids')
+    repository = unit_of_work.repository
+    deleted = await repository.delete_by_ids(
+        model=DishModel,
+        ids=request_body.ids,
+        conditions=(
+            ('submenu_id', SQLOperators.EQ, submenu_id),
+        ),
+    )
+    await unit_of_work.commit()
+
+    return {'deleted': deleted}
+
+
 @router.get(
     '/{submenu_id}/dishes/{dish_id}',
     response_model=DishReadSchema,
@@ -40,15 +184,25 @@ async def create_dish(
 async def read_dish(
     dish_id: UUID,
     submenu_id: UUID,
-    db_session: AsyncSession = Depends(create_db_session),
-) -> DishModel:
-    repository = Repository(db_session)
-    dish = await repository.select_one(
-        model=DishModel,
-        conditions=(
-            ('id', SQLOperators.EQ, dish_id),
-        ),
+    response: Response,
+    if_none_match: str | None = Header(None),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> DishModel | Response:
+    conditions = (
+        ('id', SQLOperators.EQ, dish_id),
     )
+    repository = unit_of_work.repository
+    if if_none_match is not None:
+        version = await repository.select_version(model=DishModel, conditions=conditions)
+        etag = make_etag(DishModel, dish_id, version)
+        if is_etag_matched(if_none_match, etag):
+            return not_modified_response(etag)
+
+    dish = await repository.select_one(model=DishModel, conditions=conditions)
+    etag = make_etag(DishModel, dish.id, dish.version)
+    if settings.app.fast_serialization:
+        return dish_read_serializer.response(dish, headers={'ETag': etag})
+    response.headers['ETag'] = etag
 
     return dish
 
@@ -62,9 +216,9 @@ async def update_dish(
     dish_id: UUID,
     submenu_id: UUID,
     response_body: DishUpdateSchema,
-    db_session: AsyncSession = Depends(create_db_session),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
 ) -> DishModel:
-    repository = Repository(db_session)
+    repository = unit_of_work.repository
     dish = await repository.update_and_return_one(
         model=DishModel,
         data=response_body.dict(exclude_unset=True),
@@ -72,25 +226,28 @@ async def update_dish(
             ('id', SQLOperators.EQ, dish_id),
         ),
     )
-    await repository.commit()
+    await unit_of_work.commit()
 
     return dish
 
 
 @router.delete(
     '/{submenu_id}/dishes/{dish_id}',
+    response_model=DeleteResultSchema,
     description='Эндпоинта для удаления блюда',
 )
 async def delete_dish(
     dish_id: UUID,
     submenu_id: UUID,
-    db_session: AsyncSession = Depends(create_db_session),
-) -> None:
-    repository = Repository(db_session)
-    await repository.delete(
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> dict:
+    repository = unit_of_work.repository
+    deleted = await repository.delete(
         model=DishModel,
         conditions=(
             ('id', SQLOperators.EQ, dish_id),
         ),
     )
-    await repository.commit()
+    await unit_of_work.commit()
+
+    return {'deleted': deleted}
@@ -1,17 +1,40 @@
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, Header, Query, Response, status
+from fastapi.responses import StreamingResponse
+from decimal import Decimal
 from uuid import UUID
 
-from core.orm import create_db_session
-from core.repositories.base import Repository
+from core.errors.app_errors import ResourceNotFoundError
 from core.repositories.enums import SQLOperators
-from menu.models.dish import DishModel
+from core.repositories.unit_of_work import UnitOfWork, create_unit_of_work
+from core.schemas.delete import DeleteResultSchema
+from core.schemas.pagination import PageSchema
+from core.settings.settings import settings
+from core.utils.limits import get_page_limit, validate_bulk_size
+from core.utils.etag import (
+    is_etag_matched,
+    make_etag,
+    make_page_etag,
+    not_modified_response,
+)
+from core.utils.single_flight import SingleFlightRoute
 from menu.models.menu import MenuModel
-from menu.models.submenu import SubmenuModel
-from menu.schemas.menu import MenuCreateSchema, MenuReadSchema, MenuUpdateSchema
+from menu.schemas.menu import (
+    MenuCreateSchema,
+    MenuReadSchema,
+    MenuTreeSchema,
+    MenuUpdateSchema,
+    menu_read_serializer,
+)
+from menu.schemas.stats import PriceStatsSchema
+from menu.utils.stats import get_price_buckets, select_menus_price_stats
+from menu.utils.tree import (
+    build_menu_tree_query,
+    iterate_menu_tree_json,
+    iterate_menu_trees,
+)
 
 
-router = APIRouter()
+router = APIRouter(route_class=SingleFlightRoute)
 
 
 @router.post(
@@ -21,15 +44,137 @@ router = APIRouter()
 )
 async def create_menu(
     request_body: MenuCreateSchema,
-    db_session: AsyncSession = Depends(create_db_session),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
 ) -> MenuModel:
-    repository = Repository(db_session)
-    menu = repository.add_obj_to_session(model=MenuModel, data=request_body.dict())
-    await repository.commit()
+    menu = unit_of_work.add(model=MenuModel, data=request_body.dict())
+    await unit_of_work.commit()
 
     return menu
 
 
+@router.get(
+    '',
+    response_model=PageSchema[MenuReadSchema],
+    description='Эндпоинт для получения списка меню(keyset пагинация по name, id)',
+)
+async def list_menus(
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Depends(get_page_limit),
+    if_none_match: str | None = Header(None),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> dict | Response:
+    repository = unit_of_work.repository
+    menus, next_cursor = await repository.select_page(
+        model=MenuModel,
+        conditions=(),
+        limit=limit,
+        cursor=cursor,
+    )
+
+    etag = make_page_etag(menus, next_cursor)
+    if is_etag_matched(if_none_match, etag):
+        return not_modified_response(etag)
+    if settings.app.fast_serialization:
+        return menu_read_serializer.page_response(menus, next_cursor, headers={'ETag': etag})
+    response.headers['ETag'] = etag
+
+    return {'items': menus, 'next_cursor': next_cursor}
+
+
+@router.get(
+    '/stats',
+    response_model=list[PriceStatsSchema],
+    description='Эндпоинт для получения статистики цен блюд нескольких меню одним запросом',
+)
+async def list_menus_price_stats(
+    ids: list[UUID] = Query(
+        ...,
+        min_items=1,
+        description='Идентификаторы меню',
+    ),
+    price_buckets: list[Decimal] = Depends(get_price_buckets),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> list[dict]:
+    validate_bulk_size(ids, 'ids')
+    repository = unit_of_work.repository
+
+    return await select_menus_price_stats(repository, ids, price_buckets)
+
+
+@router.get(
+    '/tree',
+    response_class=StreamingResponse,
+    description=(
+        'Эндпоинт для выгрузки всех меню с подменю и блюдами. '
+        'Ответ в формате NDJSON: одно меню на строку'
+    ),
+)
+async def export_menu_trees(
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> StreamingResponse:
+    repository = unit_of_work.repository
+    rows = repository.stream_rows(
+        query=build_menu_tree_query(),
+        chunk_size=settings.app.export_chunk_size,
+    )
+
+    async def generate_lines():
+        async for menu in iterate_menu_trees(rows):
+            yield menu.json() + '\n'
+
+    return StreamingResponse(generate_lines(), media_type='application/x-ndjson')
+
+
+@router.get(
+    '/{menu_id}/stats',
+    response_model=PriceStatsSchema,
+    description='Эндпоинт для получения статистики цен блюд меню',
+)
+async def get_menu_price_stats(
+    menu_id: UUID,
+    price_buckets: list[Decimal] = Depends(get_price_buckets),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> dict:
+    repository = unit_of_work.repository
+    menus_stats = await select_menus_price_stats(repository, [menu_id], price_buckets)
+
+    return menus_stats[0]
+
+
+@router.get(
+    '/{menu_id}/tree',
+    response_class=StreamingResponse,
+    responses={status.HTTP_200_OK: {'model': MenuTreeSchema}},
+    description=(
+        'Эндпоинт для получения меню вместе с подменю и блюдами. '
+        'Подменю отдаются по мере чтения из БД'
+    ),
+)
+async def get_menu_tree(
+    menu_id: UUID,
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> StreamingResponse:
+    repository = unit_of_work.repository
+    rows = repository.stream_rows(
+        query=build_menu_tree_query(menu_id),
+        chunk_size=settings.app.export_chunk_size,
+    )
+    # Первая строка читается до начала ответа, чтобы вернуть 404 для
+    # ненайденного меню: после отправки заголовков статус не изменить
+    first_row = await anext(rows, None)
+    if first_row is None:
+        raise ResourceNotFoundError(
+            user_error_message='Запрашиваемое меню не найдено',
+            details={'menu_id': str(menu_id)},
+        )
+
+    return StreamingResponse(
+        iterate_menu_tree_json(first_row, rows),
+        media_type='application/json',
+    )
+
+
 @router.get(
     '/{menu_id}',
     response_model=MenuReadSchema,
@@ -37,34 +182,25 @@ async def create_menu(
 )
 async def get_menu(
     menu_id: UUID,
-    db_session: AsyncSession = Depends(create_db_session),
-) -> MenuModel:
-    repository = Repository(db_session)
-    menu = await repository.select_one(
-        model=MenuModel,
-        conditions=(
-            ('id', SQLOperators.EQ, menu_id),
-        ),
-    )
-    submenus = await repository.select_list(
-        model=SubmenuModel,
-        conditions=(
-            ('menu_id', SQLOperators.EQ, menu_id),
-        ),
+    response: Response,
+    if_none_match: str | None = Header(None),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> MenuModel | Response:
+    conditions = (
+        ('id', SQLOperators.EQ, menu_id),
     )
-
-    list_id = [item.id for item in submenus]
-    menu.submenus_amount = len(list_id)
-
-    dishes_amount = 0
-    for submenu_id in list_id:
-        dishes_amount += len(await repository.select_list(
-            model=DishModel,
-            conditions=(
-                ('submenu_id', SQLOperators.EQ, submenu_id),
-            ),
-        ))
-    menu.dishes_amount = dishes_amount
+    repository = unit_of_work.repository
+    if if_none_match is not None:
+        version = await repository.select_version(model=MenuModel, conditions=conditions)
+        etag = make_etag(MenuModel, menu_id, version)
+        if is_etag_matched(if_none_match, etag):
+            return not_modified_response(etag)
+
+    menu = await repository.select_one(model=MenuModel, conditions=conditions)
+    etag = make_etag(MenuModel, menu.id, menu.version)
+    if settings.app.fast_serialization:
+        return menu_read_serializer.response(menu, headers={'ETag': etag})
+    response.headers['ETag'] = etag
 
     return menu
 
@@ -77,9 +213,9 @@ async def get_menu(
 async def update_menu(
     menu_id: UUID,
     request_body: MenuUpdateSchema,
-    db_session: AsyncSession = Depends(create_db_session),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
 ) -> MenuModel:
-    repository = Repository(db_session)
+    repository = unit_of_work.repository
     menu = await repository.update_and_return_one(
         model=MenuModel,
         data=request_body.dict(exclude_unset=True),
@@ -87,19 +223,25 @@ async def update_menu(
             ('id', SQLOperators.EQ, menu_id),
         ),
     )
-    await repository.commit()
+    await unit_of_work.commit()
 
     return menu
 
 
 @router.delete(
     '/{menu_id}',
-    description='Эндопоинт для удаления меню',
+    response_model=DeleteResultSchema,
+    description='Эндопоинт для удаления меню вместе с подменю и блюдами',
 )
 async def delete_menu(
     menu_id: UUID,
-    db_session: AsyncSession = Depends(create_db_session),
-) -> None:
-    repository = Repository(db_session)
-    await repository.delete(model=MenuModel, conditions=(('id', SQLOperators.EQ, menu_id),),)
-    await repository.commit()
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> dict:
+    repository = unit_of_work.repository
+    deleted = await repository.delete(
+        model=MenuModel,
+        conditions=(('id', SQLOperators.EQ, menu_id),),
+    )
+    await unit_of_work.commit()
+
+    return {'deleted': deleted}
@@ -1,17 +1,34 @@
-from fastapi import APIRouter, Depends, status
-from sqlalchemy import func
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Body, Depends, Header, Query, Response, status
+from decimal import Decimal
 from uuid import UUID
 
-from core.orm import create_db_session
-from core.repositories.base import Repository
 from core.repositories.enums import SQLOperators
+from core.repositories.unit_of_work import UnitOfWork, create_unit_of_work
+from core.schemas.bulk import BulkDeleteSchema
+from core.schemas.delete import DeleteResultSchema
+from core.schemas.pagination import PageSchema
+from core.settings.settings import settings
+from core.utils.limits import get_page_limit, validate_bulk_size
+from core.utils.etag import (
+    is_etag_matched,
+    make_etag,
+    make_page_etag,
+    not_modified_response,
+)
+from core.utils.single_flight import SingleFlightRoute
 from menu.models.submenu import SubmenuModel
-from menu.models.dish import DishModel
-from menu.schemas.submenu import SubmenuCreateSchema, SubmenuReadSchema, SubmenuUpdateSchema
+from menu.schemas.stats import PriceStatsSchema
+from menu.schemas.submenu import (
+    SubmenuBulkUpdateSchema,
+    SubmenuCreateSchema,
+    SubmenuReadSchema,
+    SubmenuUpdateSchema,
+    submenu_read_serializer,
+)
+from menu.utils.stats import get_price_buckets, select_submenu_price_stats
 
 
-router = APIRouter()
+router = APIRouter(route_class=SingleFlightRoute)
 
 
 @router.post(
@@ -22,44 +39,174 @@ router = APIRouter()
 async def create_submenu(
     request_body: SubmenuCreateSchema,
     menu_id: UUID,
-    db_session: AsyncSession = Depends(create_db_session),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
 ) -> SubmenuModel:
-    repository = Repository(db_session)
-    submenu = repository.add_obj_to_session(
+    submenu = unit_of_work.add(
         model=SubmenuModel,
         data={**request_body.dict(), 'menu_id': menu_id}
     )
-    await repository.commit()
+    await unit_of_work.commit()
 
     return submenu
 
 
 @router.get(
-    '/{menu_id}/submenus/{submenu_id}',
-    response_model=SubmenuReadSchema,
-    description='Эндпоинт для получения данных подменю',
+    '/{menu_id}/submenus',
+    response_model=PageSchema[SubmenuReadSchema],
+    description='Эндпоинт для получения списка подменю(keyset пагинация по name, id)',
 )
-async def get_submenu(
+async def list_submenus(
     menu_id: UUID,
-    submenu_id: UUID,
-    db_session: AsyncSession = Depends(create_db_session),
-) -> SubmenuModel:
-    repository = Repository(db_session)
-    submenu = await repository.select_one(
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Depends(get_page_limit),
+    name_prefix: str | None = Query(
+        None,
+        min_length=1,
+        max_length=255,
+        description='Название подменю начинается с',
+    ),
+    if_none_match: str | None = Header(None),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> dict | Response:
+    conditions = [('menu_id', SQLOperators.EQ, menu_id)]
+    if name_prefix is not None:
+        conditions.append(('name', SQLOperators.STARTSWITH, name_prefix))
+
+    repository = unit_of_work.repository
+    submenus, next_cursor = await repository.select_page(
+        model=SubmenuModel,
+        conditions=conditions,
+        limit=limit,
+        cursor=cursor,
+    )
+
+    etag = make_page_etag(submenus, next_cursor)
+    if is_etag_matched(if_none_match, etag):
+        return not_modified_response(etag)
+    if settings.app.fast_serialization:
+        return submenu_read_serializer.page_response(submenus, next_cursor, headers={'ETag': etag})
+    response.headers['ETag'] = etag
+
+    return {'items': submenus, 'next_cursor': next_cursor}
+
+
+@router.post(
+    '/{menu_id}/submenus/bulk',
+    response_model=list[SubmenuReadSchema],
+    description='Эндпоинт для пакетного создания подменю одним запросом в БД',
+)
+async def create_submenus_bulk(
+    menu_id: UUID,
+    request_body: list[SubmenuCreateSchema] = Body(
+        min_items=1,
+    ),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> list[SubmenuModel]:
+    validate_bulk_size(request_body, 'items')
+    repository = unit_of_work.repository
+    submenus = await repository.insert_and_return(
+        model=SubmenuModel,
+        data=[{**submenu.dict(), 'menu_id': menu_id} for submenu in request_body],
+    )
+    await unit_of_work.commit()
+
+    return submenus
+
+
+@router.patch(
+    '/{menu_id}/submenus/bulk',
+    response_model=list[SubmenuReadSchema],
+    description='Эндпоинт для пакетного обновления подменю в одной транзакции',
+)
+async def update_submenus_bulk(
+    menu_id: UUID,
+    request_body: list[SubmenuBulkUpdateSchema] = Body(
+        min_items=1,
+    ),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> list[SubmenuModel]:
+    validate_bulk_size(request_body, 'items')
+    repository = unit_of_work.repository
+    submenus = await repository.update_many_and_return(
         model=SubmenuModel,
+        data=[submenu.dict(exclude_unset=True) for submenu in request_body],
         conditions=(
-            ('id', SQLOperators.EQ, submenu_id),
+            ('menu_id', SQLOperators.EQ, menu_id),
         ),
     )
+    await unit_of_work.commit()
+
+    return submenus
 
-    amount_of_dishes = await repository.select_list(
-        model=DishModel,
+
+@router.post(
+    '/{menu_id}/submenus/bulk-delete',
+    response_model=DeleteResultSchema,
+    description='Эндпоинт для пакетного удаления подменю одним запросом в БД',
+)
+async def delete_submenus_bulk(
+    menu_id: UUID,
+    request_body: BulkDeleteSchema,
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> dict:
+    validate_bulk_size(request_body.ids, 'ids')
+    repository = unit_of_work.repository
+    deleted = await repository.delete_by_ids(
+        model=SubmenuModel,
+        ids=request_body.ids,
         conditions=(
-            ('submenu_id', SQLOperators.EQ, submenu_id),
+            ('menu_id', SQLOperators.EQ, menu_id),
         ),
     )
+    await unit_of_work.commit()
+
+    return {'deleted': deleted}
+
+
+@router.get(
+    '/{menu_id}/submenus/{submenu_id}/stats',
+    response_model=PriceStatsSchema,
+    description='Эндпоинт для получения статистики цен блюд подменю',
+)
+async def get_submenu_price_stats(
+    menu_id: UUID,
+    submenu_id: UUID,
+    price_buckets: list[Decimal] = Depends(get_price_buckets),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> dict:
+    repository = unit_of_work.repository
 
-    submenu.amount_of_dishes = len(amount_of_dishes)
+    return await select_submenu_price_stats(repository, menu_id, submenu_id, price_buckets)
+
+
+@router.get(
+    '/{menu_id}/submenus/{submenu_id}',
+    response_model=SubmenuReadSchema,
+    description='Эндпоинт для получения данных подменю',
+)
+async def get_submenu(
+    menu_id: UUID,
+    submenu_id: UUID,
+    response: Response,
+    if_none_match: str | None = Header(None),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> SubmenuModel | Response:
+    conditions = (
+        ('id', SQLOperators.EQ, submenu_id),
+    )
+    repository = unit_of_work.repository
+    if if_none_match is not None:
+        version = await repository.select_version(model=SubmenuModel, conditions=conditions)
+        etag = make_etag(SubmenuModel, submenu_id, version)
+        if is_etag_matched(if_none_match, etag):
+            return not_modified_response(etag)
+
+    submenu = await repository.select_one(model=SubmenuModel, conditions=conditions)
+    etag = make_etag(SubmenuModel, submenu.id, submenu.version)
+    if settings.app.fast_serialization:
+        return submenu_read_serializer.response(submenu, headers={'ETag': etag})
+    response.headers['ETag'] = etag
 
     return submenu
 
@@ -73,9 +220,9 @@ async def update_submenus(
     menu_id: UUID,
     submenu_id: UUID,
     request_body: SubmenuUpdateSchema,
-    db_session: AsyncSession = Depends(create_db_session),
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
 ) -> SubmenuModel:
-    repository = Repository(db_session)
+    repository = unit_of_work.repository
     submenu = await repository.update_and_return_one(
         model=SubmenuModel,
         data=request_body.dict(),
@@ -83,25 +230,28 @@ async def update_submenus(
             ('id', SQLOperators.EQ, submenu_id),
         ),
     )
-    await repository.commit()
+    await unit_of_work.commit()
 
     return submenu
 
 
 @router.delete(
     '/{menu_id}/submenus/{submenu_id}',
-    description='Эндпоинт для удаления данных подменю'
+    response_model=DeleteResultSchema,
+    description='Эндпоинт для удаления данных подменю вместе с блюдами'
 )
 async def delete_submenu(
     menu_id: UUID,
     submenu_id: UUID,
-    db_session: AsyncSession = Depends(create_db_session),
-) -> None:
-    repository = Repository(db_session)
-    await repository.delete(
+    unit_of_work: UnitOfWork = Depends(create_unit_of_work),
+) -> dict:
+    repository = unit_of_work.repository
+    deleted = await repository.delete(
         model=SubmenuModel,
         conditions=(
             ('id', SQLOperators.EQ, submenu_id),
         ),
     )
-    await repository.commit()
+    await unit_of_work.commit()
+
+    return {'deleted': deleted}
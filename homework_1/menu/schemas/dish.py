@@ -1,9 +1,20 @@
+from decimal import ROUND_HALF_UP, Decimal
 from pydantic import BaseModel, Field, ValidationError, validator
+from pydantic.json import decimal_encoder
 from uuid import UUID
 
+from core.utils.serialization import FastSerializer
 from menu.models.dish import DishModel
 
 
+PRICE_QUANTUM = Decimal('0.01')
+
+
+def quantize_price(price: Decimal) -> Decimal:
+    '''Цена с точностью до копеек, как она хранится в БД'''
+    return price.quantize(PRICE_QUANTUM, rounding=ROUND_HALF_UP)
+
+
 class DishBaseSchema(BaseModel):
     '''Базовая схема данных блюда'''
     name: str = Field(
@@ -12,7 +23,7 @@ class DishBaseSchema(BaseModel):
         max_length=255,
     )
 
-    price: float = Field(
+    price: Decimal = Field(
         description='Цена блюда',
         gt=0,
         lt=1000000,
@@ -25,17 +36,16 @@ class DishBaseSchema(BaseModel):
 
 class DishCreateSchema(DishBaseSchema):
     '''Схема данных блюда при его создании'''
-    pass
+
+    @validator('price')
+    def round_to_two(cls, price):
+        return quantize_price(price)
 
 
 class DishReadSchema(DishBaseSchema):
     '''Схема данных блюда при получении данных'''
     id: UUID
 
-    @validator('price')
-    def round_to_two(cls, price):
-        return round(price, 2)
-
 
 class DishUpdateSchema(DishBaseSchema):
     '''Схема данных для обновления данных блюда'''
@@ -45,8 +55,22 @@ class DishUpdateSchema(DishBaseSchema):
         max_length=255,
     )
 
-    price: float | None = Field(
+    price: Decimal | None = Field(
         description='Цена блюда',
         gt=0,
         lt=1000000,
     )
+
+    @validator('price')
+    def round_to_two(cls, price):
+        return quantize_price(price)
+
+
+class DishBulkUpdateSchema(DishUpdateSchema):
+    '''Схема данных для обновления блюда в пакетном запросе'''
+    id: UUID
+
+
+# Цена кодируется тем же правилом, что и в jsonable_encoder: Decimal без
+# дробной части -- целым числом, иначе -- float
+dish_read_serializer = FastSerializer(DishReadSchema, converters={'price': decimal_encoder})
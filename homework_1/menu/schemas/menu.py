@@ -1,7 +1,9 @@
 from pydantic import BaseModel, Field
 from uuid import UUID
 
+from core.utils.serialization import FastSerializer
 from menu.models.menu import MenuModel
+from menu.schemas.submenu import SubmenuTreeSchema
 
 
 class MenuBaseSchema(BaseModel):
@@ -29,6 +31,12 @@ class MenuReadSchema(MenuBaseSchema):
     dishes_amount: int = 0
 
 
+class MenuTreeSchema(MenuBaseSchema):
+    '''Схема данных меню вместе с подменю и их блюдами'''
+    id: UUID
+    submenus: list[SubmenuTreeSchema] = []
+
+
 class MenuUpdateSchema(MenuBaseSchema):
     '''Схема данных меню при обновлении данных'''
     name: str | None = Field(
@@ -36,3 +44,6 @@ class MenuUpdateSchema(MenuBaseSchema):
         min_length=1,
         max_length=255,
     )
+
+
+menu_read_serializer = FastSerializer(MenuReadSchema)
@@ -0,0 +1,23 @@
+from decimal import Decimal
+from pydantic import BaseModel, Field
+from uuid import UUID
+
+
+class PriceBucketSchema(BaseModel):
+    '''Корзина гистограммы цен: блюда с ценой в [lower, upper)'''
+    lower: Decimal = Field(description='Нижняя граница цены, включительно')
+    upper: Decimal | None = Field(
+        description='Верхняя граница цены, не включительно, null -- без границы',
+    )
+    dishes_count: int = Field(description='Количество блюд в корзине')
+
+
+class PriceStatsSchema(BaseModel):
+    '''Статистика цен блюд меню или подменю'''
+    id: UUID = Field(description='Идентификатор меню или подменю')
+    dishes_count: int = Field(description='Количество блюд')
+    price_sum: Decimal = Field(description='Сумма цен блюд')
+    price_min: Decimal | None = Field(description='Минимальная цена, null -- блюд нет')
+    price_max: Decimal | None = Field(description='Максимальная цена, null -- блюд нет')
+    price_avg: Decimal | None = Field(description='Средняя цена, null -- блюд нет')
+    buckets: list[PriceBucketSchema] = Field(description='Гистограмма цен')
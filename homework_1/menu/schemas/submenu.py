@@ -1,7 +1,9 @@
 from pydantic import BaseModel, Field
 from uuid import UUID
 
+from core.utils.serialization import FastSerializer
 from menu.models.submenu import SubmenuModel
+from menu.schemas.dish import DishReadSchema
 
 
 class SubmenuBaseSchema(BaseModel):
@@ -28,6 +30,12 @@ class SubmenuReadSchema(SubmenuBaseSchema):
     amount_of_dishes: int = 0
 
 
+class SubmenuTreeSchema(SubmenuBaseSchema):
+    '''Схема данных подменю вместе с его блюдами'''
+    id: UUID
+    dishes: list[DishReadSchema] = []
+
+
 class SubmenuUpdateSchema(SubmenuBaseSchema):
     '''Схема данных подменю при обновлении данных'''
     name: str | None = Field(
@@ -35,3 +43,11 @@ class SubmenuUpdateSchema(SubmenuBaseSchema):
         min_length=1,
         max_length=255,
     )
+
+
+class SubmenuBulkUpdateSchema(SubmenuUpdateSchema):
+    '''Схема данных для обновления подменю в пакетном запросе'''
+    id: UUID
+
+
+submenu_read_serializer = FastSerializer(SubmenuReadSchema)
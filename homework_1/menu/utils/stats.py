@@ -0,0 +1,184 @@
+from collections.abc import Sequence
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+
+from fastapi import Query
+from sqlalchemy import and_, bindparam, func, select
+from sqlalchemy.sql.selectable import Select as SelectQuery
+
+from core.errors.app_errors import BadRequestError, ResourceNotFoundError
+from core.repositories.base import Repository
+from core.repositories.statements import statement_cache
+from core.settings.settings import settings
+from menu.models.dish import DishModel
+from menu.models.menu import MenuModel
+from menu.models.submenu import SubmenuModel
+
+
+MAX_PRICE_BUCKETS = 50
+STATS_MODELS = (MenuModel, SubmenuModel, DishModel)
+
+
+async def get_price_buckets(
+    price_buckets: list[Decimal] | None = Query(
+        None,
+        description='Границы корзин гистограммы цен по возрастанию',
+    ),
+) -> list[Decimal]:
+    '''Границы корзин гистограммы цен из запроса или из настроек'''
+    if price_buckets is None:
+        return settings.app.stats_price_buckets
+
+    validate_price_buckets(price_buckets)
+
+    return price_buckets
+
+
+def validate_price_buckets(bounds: Sequence[Decimal]) -> None:
+    '''Проверить границы корзин гистограммы: положительные и возрастающие'''
+    if len(bounds) > MAX_PRICE_BUCKETS:
+        raise BadRequestError(
+            user_error_message=f'Можно задать не больше {MAX_PRICE_BUCKETS} границ корзин',
+            details={'price_buckets': len(bounds)},
+        )
+
+    if any(bound <= 0 for bound in bounds) or any(
+        lower >= upper for lower, upper in zip(bounds, bounds[1:])
+    ):
+        raise BadRequestError(
+            user_error_message='Границы корзин должны быть положительными и возрастать',
+            details={'price_buckets': [str(bound) for bound in bounds]},
+        )
+
+
+async def select_menus_price_stats(
+    repository: Repository,
+    menu_ids: Sequence[UUID],
+    bounds: Sequence[Decimal],
+) -> list[dict[str, Any]]:
+    '''Статистика цен блюд нескольких меню одним запросом. Порядок
+    результата -- как у menu_ids, для ненайденных меню ошибка 404
+
+    '''
+    shape = ('menus_price_stats', len(bounds))
+    query = statement_cache.get(shape)
+    if query is None:
+        query = _build_price_stats_query(
+            group_column=MenuModel.id,
+            bucket_count=len(bounds),
+        ).outerjoin(MenuModel.submenus).outerjoin(SubmenuModel.dishes).where(
+            MenuModel.id.in_(bindparam('menu_ids', expanding=True)),
+        )
+        statement_cache.set(shape, query)
+
+    rows = await repository.select_rows(
+        operation='menus_price_stats',
+        query=query,
+        params={'menu_ids': list(menu_ids), **_bucket_params(bounds)},
+        models=STATS_MODELS,
+    )
+    stats_by_id = {row['id']: _to_price_stats(row, bounds) for row in rows}
+
+    missing_ids = [menu_id for menu_id in menu_ids if menu_id not in stats_by_id]
+    if missing_ids:
+        raise ResourceNotFoundError(
+            user_error_message='Запрашиваемые меню не найдены',
+            details={'ids': [str(menu_id) for menu_id in missing_ids]},
+        )
+
+    return [stats_by_id[menu_id] for menu_id in menu_ids]
+
+
+async def select_submenu_price_stats(
+    repository: Repository,
+    menu_id: UUID,
+    submenu_id: UUID,
+    bounds: Sequence[Decimal],
+) -> dict[str, Any]:
+    '''Статистика цен блюд подменю'''
+    shape = ('submenu_price_stats', len(bounds))
+    query = statement_cache.get(shape)
+    if query is None:
+        query = _build_price_stats_query(
+            group_column=SubmenuModel.id,
+            bucket_count=len(bounds),
+        ).outerjoin(SubmenuModel.dishes).where(
+            SubmenuModel.id == bindparam('submenu_id'),
+            SubmenuModel.menu_id == bindparam('menu_id'),
+        )
+        statement_cache.set(shape, query)
+
+    rows = await repository.select_rows(
+        operation='submenu_price_stats',
+        query=query,
+        params={'menu_id': menu_id, 'submenu_id': submenu_id, **_bucket_params(bounds)},
+        models=STATS_MODELS,
+    )
+    if not rows:
+        raise ResourceNotFoundError(
+            user_error_message='Запрашиваемое подменю не найдено',
+            details={'menu_id': str(menu_id), 'submenu_id': str(submenu_id)},
+        )
+
+    return _to_price_stats(rows[0], bounds)
+
+
+def _build_price_stats_query(group_column: Any, bucket_count: int) -> SelectQuery:
+    '''SELECT агрегатов цен блюд, сгруппированных по group_column. Каждая
+    корзина гистограммы -- COUNT с FILTER по границам из параметров
+    bucket_<i>, так что на группу приходится одна строка
+
+    '''
+    price = DishModel.price
+    columns = [
+        group_column.label('id'),
+        func.count(DishModel.id).label('dishes_count'),
+        func.coalesce(func.sum(price), 0).label('price_sum'),
+        func.min(price).label('price_min'),
+        func.max(price).label('price_max'),
+        func.round(func.avg(price), 2).label('price_avg'),
+    ]
+
+    bounds = [bindparam(f'bucket_{index}', type_=price.type) for index in range(bucket_count)]
+    for index, (lower, upper) in enumerate(zip([None, *bounds], [*bounds, None])):
+        bucket_conditions = []
+        if lower is not None:
+            bucket_conditions.append(price >= lower)
+        if upper is not None:
+            bucket_conditions.append(price < upper)
+
+        bucket_count_column = func.count(DishModel.id)
+        if bucket_conditions:
+            bucket_count_column = bucket_count_column.filter(and_(*bucket_conditions))
+        columns.append(bucket_count_column.label(f'bucket_{index}_count'))
+
+    return select(*columns).select_from(group_column.table).group_by(group_column)
+
+
+def _bucket_params(bounds: Sequence[Decimal]) -> dict[str, Decimal]:
+    '''Параметры запроса с границами корзин'''
+    return {f'bucket_{index}': bound for index, bound in enumerate(bounds)}
+
+
+def _to_price_stats(row: dict[str, Any], bounds: Sequence[Decimal]) -> dict[str, Any]:
+    '''Строка результата запроса в виде PriceStatsSchema'''
+    lowers = [Decimal(0), *bounds]
+    uppers = [*bounds, None]
+
+    return {
+        'id': row['id'],
+        'dishes_count': row['dishes_count'],
+        'price_sum': row['price_sum'],
+        'price_min': row['price_min'],
+        'price_max': row['price_max'],
+        'price_avg': row['price_avg'],
+        'buckets': [
+            {
+                'lower': lower,
+                'upper': upper,
+                'dishes_count': row[f'bucket_{index}_count'],
+            }
+            for index, (lower, upper) in enumerate(zip(lowers, uppers))
+        ],
+    }
@@ -0,0 +1,122 @@
+from collections.abc import AsyncIterator
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.engine.row import Row as SQLAlchemyRow
+from sqlalchemy.sql.selectable import Select as SelectQuery
+
+from menu.models.dish import DishModel
+from menu.models.menu import MenuModel
+from menu.models.submenu import SubmenuModel
+from menu.schemas.dish import DishReadSchema
+from menu.schemas.menu import MenuTreeSchema
+from menu.schemas.submenu import SubmenuTreeSchema
+
+
+def build_menu_tree_query(menu_id: UUID | None = None) -> SelectQuery:
+    '''Составить один SELECT с LEFT JOIN подменю и блюд по связям моделей.
+    Строки упорядочены так, что данные каждого меню и каждого подменю
+    идут подряд, что позволяет собирать дерево потоково
+
+    '''
+    query = (
+        select(
+            MenuModel.id.label('menu_id'),
+            MenuModel.name.label('menu_name'),
+            SubmenuModel.id.label('submenu_id'),
+            SubmenuModel.name.label('submenu_name'),
+            DishModel.id.label('dish_id'),
+            DishModel.name.label('dish_name'),
+            DishModel.price.label('dish_price'),
+        )
+        .select_from(MenuModel)
+        .outerjoin(MenuModel.submenus)
+        .outerjoin(SubmenuModel.dishes)
+        .order_by(
+            MenuModel.name,
+            MenuModel.id,
+            SubmenuModel.name,
+            SubmenuModel.id,
+            DishModel.name,
+            DishModel.id,
+        )
+    )
+    if menu_id is not None:
+        query = query.where(MenuModel.id == menu_id)
+
+    return query
+
+
+async def iterate_menu_trees(rows: AsyncIterator[SQLAlchemyRow]) -> AsyncIterator[MenuTreeSchema]:
+    '''Собрать деревья меню из упорядоченных строк запроса
+    build_menu_tree_query. В памяти держится только текущее меню
+
+    '''
+    menu = None
+    submenu = None
+    async for row in rows:
+        if menu is None or menu.id != row.menu_id:
+            if menu is not None:
+                yield menu
+            menu = MenuTreeSchema(id=row.menu_id, name=row.menu_name)
+            submenu = None
+
+        if row.submenu_id is None:
+            continue
+
+        if submenu is None or submenu.id != row.submenu_id:
+            submenu = SubmenuTreeSchema(id=row.submenu_id, name=row.submenu_name)
+            menu.submenus.append(submenu)
+
+        if row.dish_id is not None:
+            submenu.dishes.append(
+                DishReadSchema(id=row.dish_id, name=row.dish_name, price=row.dish_price),
+            )
+
+    if menu is not None:
+        yield menu
+
+
+async def iterate_menu_tree_json(
+    first_row: SQLAlchemyRow,
+    rows: AsyncIterator[SQLAlchemyRow],
+) -> AsyncIterator[str]:
+    '''Отдавать JSON дерева одного меню по частям из строк запроса
+    build_menu_tree_query(menu_id): first_row -- уже прочитанная первая
+    строка, rows -- остальные. Подменю сериализуется, как только собраны
+    его блюда, поэтому в памяти держится только текущее подменю
+
+    '''
+    menu = MenuTreeSchema(id=first_row.menu_id, name=first_row.menu_name)
+    # Объект меню без закрывающей скобки, подменю дописываются в массив
+    yield menu.json(exclude={'submenus'})[:-1] + ', "submenus": ['
+
+    submenu = None
+    separator = ''
+    async for row in _prepend(first_row, rows):
+        if row.submenu_id is None:
+            continue
+
+        if submenu is None or submenu.id != row.submenu_id:
+            if submenu is not None:
+                yield separator + submenu.json()
+                separator = ', '
+            submenu = SubmenuTreeSchema(id=row.submenu_id, name=row.submenu_name)
+
+        if row.dish_id is not None:
+            submenu.dishes.append(
+                DishReadSchema(id=row.dish_id, name=row.dish_name, price=row.dish_price),
+            )
+
+    if submenu is not None:
+        yield separator + submenu.json()
+    yield ']}'
+
+
+async def _prepend(
+    first_row: SQLAlchemyRow,
+    rows: AsyncIterator[SQLAlchemyRow],
+) -> AsyncIterator[SQLAlchemyRow]:
+    yield first_row
+    async for row in rows:
+        yield row
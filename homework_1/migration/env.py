@@ -25,6 +25,7 @@ from menu.models.menu import MenuModel
 from menu.models.submenu import SubmenuModel
 from menu.models.dish import DishModel
 from core.orm import Base
+from migration.helpers import set_timeouts
 
 target_metadata = Base.metadata
 
@@ -36,7 +37,12 @@ target_metadata = Base.metadata
 from core.settings.settings import settings
 
 
-config.set_main_option('sqlalchemy.url', settings.db.url)
+# Урл БД из настроек DB__*, его можно заменить аргументом -x db_url=...,
+# например, чтобы накатить миграции на тестовую БД
+config.set_main_option(
+    'sqlalchemy.url',
+    context.get_x_argument(as_dictionary=True).get('db_url') or settings.db.url,
+)
 
 
 def run_migrations_offline() -> None:
@@ -60,6 +66,7 @@ def run_migrations_offline() -> None:
     )
 
     with context.begin_transaction():
+        set_timeouts(db_settings=settings.db)
         context.run_migrations()
 
 
@@ -67,6 +74,9 @@ def do_run_migrations(connection: Connection) -> None:
     context.configure(connection=connection, target_metadata=target_metadata)
 
     with context.begin_transaction():
+        # DDL, не дождавшийся блокировки, падает по lock_timeout, а не
+        # копит за собой очередь запросов приложения к таблице
+        set_timeouts(db_settings=settings.db)
         context.run_migrations()
 
 
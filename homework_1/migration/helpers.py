@@ -0,0 +1,265 @@
+'''Помощники для миграций больших таблиц без остановки трафика: таймауты
+блокировок на каждый шаг, индексы CONCURRENTLY вне транзакции и
+заполнение колонок пачками по ключу с отчетом о прогрессе
+
+'''
+import logging
+import re
+import time
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from typing import Any
+
+import sqlalchemy as sa
+from alembic import context, op
+
+from core.settings.db import TIMEOUT_REGEX, DBSettings
+from core.settings.settings import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+# lock_not_available: не дождались блокировки за lock_timeout
+LOCK_NOT_AVAILABLE = '55P03'
+PROGRESS_INTERVAL = 10
+
+
+def set_timeouts(
+    lock_timeout: str | None = None,
+    statement_timeout: str | None = None,
+    db_settings: DBSettings | None = None,
+) -> None:
+    '''Задать lock_timeout и statement_timeout сессии миграции. None --
+    значение по умолчанию из db_settings(по умолчанию настройки DB__*
+    проекта), '0' -- без ограничения
+
+    '''
+    db_settings = db_settings or get_settings().db
+    timeouts = {
+        'lock_timeout': lock_timeout or db_settings.migration_lock_timeout,
+        'statement_timeout': statement_timeout or db_settings.migration_statement_timeout,
+    }
+    for name, value in timeouts.items():
+        if not re.match(TIMEOUT_REGEX, value):
+            raise ValueError(f'Invalid {name}: {value!r}')
+        context.execute(f"SET {name} = '{value}'")
+
+
+@contextmanager
+def step_timeouts(
+    lock_timeout: str | None = None,
+    statement_timeout: str | None = None,
+    db_settings: DBSettings | None = None,
+) -> Iterator[None]:
+    '''Таймауты на время шага миграции, после него, в том числе если шаг
+    упал, -- значения по умолчанию. Задаются на сессию, поэтому действуют
+    и в autocommit_block
+
+    '''
+    set_timeouts(lock_timeout, statement_timeout, db_settings)
+    try:
+        yield
+    finally:
+        set_timeouts(db_settings=db_settings)
+
+
+def create_index_concurrently(
+    index_name: str,
+    table_name: str,
+    columns: Sequence[str],
+    lock_timeout: str | None = None,
+    statement_timeout: str | None = '0',
+    **kwargs: Any,
+) -> None:
+    '''Построить индекс без блокировки записи в таблицу. CONCURRENTLY
+    нельзя выполнить в транзакции, поэтому индекс строится в
+    autocommit_block: предыдущие шаги миграции к этому моменту
+    коммитятся. Если прошлая попытка упала и оставила невалидный
+    индекс, он удаляется и строится заново, а готовый индекс не
+    перестраивается
+
+    '''
+    with op.get_context().autocommit_block(), step_timeouts(lock_timeout, statement_timeout):
+        is_valid = _is_valid_index(index_name)
+        if is_valid:
+            logger.info('Index %s already exists', index_name)
+            return
+
+        if is_valid is not None:
+            logger.warning('Dropping invalid index %s left by a failed build', index_name)
+            op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True)
+
+        op.create_index(
+            index_name,
+            table_name,
+            columns,
+            postgresql_concurrently=True,
+            **kwargs,
+        )
+
+
+def drop_index_concurrently(
+    index_name: str,
+    table_name: str,
+    lock_timeout: str | None = None,
+) -> None:
+    '''Удалить индекс без блокировки чтения и записи таблицы'''
+    with op.get_context().autocommit_block(), step_timeouts(lock_timeout):
+        op.drop_index(index_name, table_name=table_name, postgresql_concurrently=True)
+
+
+def backfill_in_batches(
+    table_name: str,
+    set_clause: str,
+    where: str | None = None,
+    key: str = 'id',
+    batch_size: int | None = None,
+    pause_seconds: float = 0,
+    retries: int = 3,
+    lock_timeout: str | None = None,
+    statement_timeout: str | None = None,
+    db_settings: DBSettings | None = None,
+) -> int:
+    '''Выполнить UPDATE table_name SET set_clause [WHERE where] пачками
+    по batch_size строк в порядке ключа key. Каждая пачка -- отдельная
+    транзакция, поэтому блокировки строк держатся недолго, а прерванное
+    заполнение можно повторить: с where, отсекающим уже заполненные
+    строки, повтор продолжит с места остановки. Пачка, не дождавшаяся
+    блокировки за lock_timeout, повторяется до retries раз. Прогресс
+    пишется в лог не реже раза в PROGRESS_INTERVAL секунд. batch_size и
+    таймауты по умолчанию берутся из db_settings. Возвращает количество
+    обновленных строк
+
+    '''
+    if context.is_offline_mode():
+        raise RuntimeError(
+            f'Batched backfill of {table_name} needs a database connection, '
+            'run the migration without --sql',
+        )
+
+    db_settings = db_settings or get_settings().db
+    batch_size = batch_size or db_settings.migration_batch_size
+    condition = f' AND ({where})' if where else ''
+    first_batch, next_batch = (
+        sa.text(
+            f'''
+            WITH batch AS (
+                SELECT {key} FROM {table_name}
+                WHERE {key_condition}{condition}
+                ORDER BY {key}
+                LIMIT :batch_size
+            ),
+            updated AS (
+                UPDATE {table_name} SET {set_clause}
+                WHERE {key} IN (SELECT {key} FROM batch)
+                RETURNING 1
+            )
+            SELECT
+                (SELECT {key} FROM batch ORDER BY {key} DESC LIMIT 1) AS last_key,
+                (SELECT count(*) FROM updated) AS updated
+            '''
+        )
+        for key_condition in ('TRUE', f'{key} > :last_key')
+    )
+
+    with (
+        op.get_context().autocommit_block(),
+        step_timeouts(lock_timeout, statement_timeout, db_settings),
+    ):
+        connection = op.get_bind()
+        estimated_rows = _estimate_rows(table_name)
+        started_at = reported_at = time.monotonic()
+        last_key = None
+        total_updated = 0
+        while True:
+            statement = first_batch if last_key is None else next_batch
+            last_key, updated = _execute_batch(
+                connection,
+                statement,
+                {'batch_size': batch_size, 'last_key': last_key},
+                retries,
+            )
+            if last_key is None:
+                break
+
+            total_updated += updated
+            if time.monotonic() - reported_at >= PROGRESS_INTERVAL:
+                reported_at = time.monotonic()
+                _report_progress(table_name, total_updated, estimated_rows, started_at)
+
+            if pause_seconds:
+                time.sleep(pause_seconds)
+
+    _report_progress(table_name, total_updated, estimated_rows, started_at)
+
+    return total_updated
+
+
+def _is_valid_index(index_name: str) -> bool | None:
+    '''Валиден ли индекс: False -- невалидный индекс, оставшийся от
+    упавшего CONCURRENTLY, None -- индекса нет
+
+    '''
+    if context.is_offline_mode():
+        return None
+
+    return op.get_bind().execute(
+        sa.text(
+            '''
+            SELECT indisvalid FROM pg_index
+            WHERE indexrelid = to_regclass(:index_name)
+            '''
+        ),
+        {'index_name': index_name},
+    ).scalar()
+
+
+def _estimate_rows(table_name: str) -> int | None:
+    '''Оценка количества строк по статистике планировщика: count(*)
+    по большой таблице слишком дорог ради процентов в логе
+
+    '''
+    estimate = op.get_bind().execute(
+        sa.text('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table_name)'),
+        {'table_name': table_name},
+    ).scalar()
+
+    # -1 -- таблица еще ни разу не анализировалась
+    return estimate if estimate and estimate > 0 else None
+
+
+def _execute_batch(
+    connection: sa.engine.Connection,
+    statement: sa.sql.elements.TextClause,
+    parameters: dict[str, Any],
+    retries: int,
+) -> tuple[Any, int]:
+    for attempt in range(retries + 1):
+        try:
+            return tuple(connection.execute(statement, parameters).one())
+        except sa.exc.DBAPIError as error:
+            if getattr(error.orig, 'pgcode', None) != LOCK_NOT_AVAILABLE or attempt == retries:
+                raise
+            logger.warning('Batch lock timeout, retry %s of %s', attempt + 1, retries)
+            time.sleep(2 ** attempt)
+
+
+def _report_progress(
+    table_name: str,
+    updated: int,
+    estimated_rows: int | None,
+    started_at: float,
+) -> None:
+    elapsed = time.monotonic() - started_at
+    rate = updated / elapsed if elapsed else 0
+    if estimated_rows:
+        logger.info(
+            'Backfill %s: %s rows updated (~%.1f%% of ~%s), %.0f rows/s',
+            table_name,
+            updated,
+            min(updated / estimated_rows * 100, 100),
+            estimated_rows,
+            rate,
+        )
+    else:
+        logger.info('Backfill %s: %s rows updated, %.0f rows/s', table_name, updated, rate)
@@ -0,0 +1,46 @@
+"""add_filter_indexes
+
+Revision ID: 8f3c2a91d4e7
+Revises: 5b0ade5c1192
+Create Date: 2026-10-18 10:12:31.482113
+
+"""
+from migration.helpers import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3c2a91d4e7'
+down_revision = '5b0ade5c1192'
+branch_labels = None
+depends_on = None
+
+
+# Индексы строятся CONCURRENTLY и не блокируют запись в таблицы
+INDEXES = (
+    ('menu__name_id__idx', 'menu', ['name', 'id'], {}),
+    ('submenu__menu_id__idx', 'submenu', ['menu_id'], {}),
+    (
+        'submenu__name__pattern_idx',
+        'submenu',
+        ['name'],
+        {'postgresql_ops': {'name': 'text_pattern_ops'}},
+    ),
+    ('dish__submenu_id__idx', 'dish', ['submenu_id'], {}),
+    ('dish__price__idx', 'dish', ['price'], {}),
+    (
+        'dish__name__pattern_idx',
+        'dish',
+        ['name'],
+        {'postgresql_ops': {'name': 'text_pattern_ops'}},
+    ),
+)
+
+
+def upgrade() -> None:
+    for index_name, table_name, columns, kwargs in INDEXES:
+        create_index_concurrently(index_name, table_name, columns, unique=False, **kwargs)
+
+
+def downgrade() -> None:
+    for index_name, table_name, _, _ in reversed(INDEXES):
+        drop_index_concurrently(index_name, table_name)
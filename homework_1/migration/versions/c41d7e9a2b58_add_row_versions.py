@@ -0,0 +1,103 @@
+"""add_row_versions
+
+Revision ID: c41d7e9a2b58
+Revises: 8f3c2a91d4e7
+Create Date: 2026-10-18 13:40:05.913270
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7e9a2b58'
+down_revision = '8f3c2a91d4e7'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('menu', 'submenu', 'dish')
+
+
+def upgrade() -> None:
+    # Колонка с константным DEFAULT добавляется без перезаписи таблицы
+    for table in TABLES:
+        op.add_column(
+            table,
+            sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+        )
+
+    # Любой UPDATE строки увеличивает её версию
+    op.execute(
+        '''
+        CREATE FUNCTION bump_row_version() RETURNS trigger AS $$
+        BEGIN
+            NEW.version := OLD.version + 1;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        '''
+    )
+    for table in TABLES:
+        op.execute(
+            f'''
+            CREATE TRIGGER {table}__bump_version__trg
+            BEFORE UPDATE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION bump_row_version()
+            '''
+        )
+
+    # Создание и удаление дочерних строк меняет количества в представлении
+    # родителей, поэтому увеличивает их версии. Триггеры уровня выражения:
+    # пакетная вставка обновляет каждого родителя один раз
+    op.execute(
+        '''
+        CREATE FUNCTION submenu__bump_parent_versions() RETURNS trigger AS $$
+        BEGIN
+            UPDATE menu SET version = version + 1
+            WHERE id IN (SELECT menu_id FROM changed_rows);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        '''
+    )
+    op.execute(
+        '''
+        CREATE FUNCTION dish__bump_parent_versions() RETURNS trigger AS $$
+        BEGIN
+            UPDATE submenu SET version = version + 1
+            WHERE id IN (SELECT submenu_id FROM changed_rows);
+            UPDATE menu SET version = version + 1
+            WHERE id IN (
+                SELECT submenu.menu_id
+                FROM submenu JOIN changed_rows ON submenu.id = changed_rows.submenu_id
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        '''
+    )
+    for table in ('submenu', 'dish'):
+        for event, transition_table in (('INSERT', 'NEW'), ('DELETE', 'OLD')):
+            op.execute(
+                f'''
+                CREATE TRIGGER {table}__{event.lower()}_bump_parent_versions__trg
+                AFTER {event} ON {table}
+                REFERENCING {transition_table} TABLE AS changed_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION {table}__bump_parent_versions()
+                '''
+            )
+
+
+def downgrade() -> None:
+    for table in ('submenu', 'dish'):
+        for event in ('insert', 'delete'):
+            op.execute(f'DROP TRIGGER {table}__{event}_bump_parent_versions__trg ON {table}')
+        op.execute(f'DROP FUNCTION {table}__bump_parent_versions()')
+
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER {table}__bump_version__trg ON {table}')
+    op.execute('DROP FUNCTION bump_row_version()')
+
+    for table in TABLES:
+        op.drop_column(table, 'version')
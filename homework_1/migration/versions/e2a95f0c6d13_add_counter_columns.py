@@ -0,0 +1,285 @@
+"""add_counter_columns
+
+Revision ID: e2a95f0c6d13
+Revises: c41d7e9a2b58
+Create Date: 2026-10-18 15:02:47.120584
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migration.helpers import backfill_in_batches
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a95f0c6d13'
+down_revision = 'c41d7e9a2b58'
+branch_labels = None
+depends_on = None
+
+
+CHILD_TABLES = ('submenu', 'dish')
+EVENTS = (('INSERT', 'NEW'), ('DELETE', 'OLD'))
+# Колонки, при изменении которых строка переходит к другому родителю
+PARENT_COLUMNS = {'submenu': 'menu_id', 'dish': 'submenu_id'}
+
+
+def upgrade() -> None:
+    op.add_column(
+        'menu',
+        sa.Column('submenus_amount', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.add_column(
+        'menu',
+        sa.Column('dishes_amount', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.add_column(
+        'submenu',
+        sa.Column('amount_of_dishes', sa.Integer(), server_default='0', nullable=False),
+    )
+
+    # Счетчики меняются только триггерами ниже. Обновление родителя
+    # триггером также увеличивает его версию, поэтому триггеры с
+    # отдельным увеличением версий родителей больше не нужны
+    _drop_parent_triggers('bump_parent_versions')
+
+    op.execute(
+        '''
+        CREATE FUNCTION submenu__update_parent_counters() RETURNS trigger AS $$
+        DECLARE
+            delta_sign integer := CASE TG_OP WHEN 'INSERT' THEN 1 ELSE -1 END;
+        BEGIN
+            UPDATE menu SET
+                submenus_amount = submenus_amount + delta_sign * changes.submenus_amount,
+                dishes_amount = dishes_amount + delta_sign * changes.dishes_amount
+            FROM (
+                SELECT
+                    menu_id,
+                    count(*) AS submenus_amount,
+                    sum(amount_of_dishes) AS dishes_amount
+                FROM changed_rows
+                GROUP BY menu_id
+            ) AS changes
+            WHERE menu.id = changes.menu_id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        '''
+    )
+    # При каскадном удалении подменю его строки уже удалены к моменту
+    # срабатывания триггера блюд, и меню не обновляется повторно:
+    # количество блюд меню уменьшает триггер подменю
+    op.execute(
+        '''
+        CREATE FUNCTION dish__update_parent_counters() RETURNS trigger AS $$
+        DECLARE
+            delta_sign integer := CASE TG_OP WHEN 'INSERT' THEN 1 ELSE -1 END;
+        BEGIN
+            UPDATE submenu SET
+                amount_of_dishes = amount_of_dishes + delta_sign * changes.dishes_amount
+            FROM (
+                SELECT submenu_id, count(*) AS dishes_amount
+                FROM changed_rows
+                GROUP BY submenu_id
+            ) AS changes
+            WHERE submenu.id = changes.submenu_id;
+
+            UPDATE menu SET
+                dishes_amount = dishes_amount + delta_sign * changes.dishes_amount
+            FROM (
+                SELECT submenu.menu_id, count(*) AS dishes_amount
+                FROM changed_rows JOIN submenu ON submenu.id = changed_rows.submenu_id
+                GROUP BY submenu.menu_id
+            ) AS changes
+            WHERE menu.id = changes.menu_id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        '''
+    )
+
+    # Сначала создаются триггеры, затем счетчики существующих строк
+    # заполняются пачками без блокировки таблиц: изменения, сделанные
+    # во время заполнения, учитывают триггеры
+    _create_parent_triggers('update_parent_counters')
+    _create_move_triggers()
+
+    # Функции подсчета VOLATILE: запрос в них видит данные, закоммиченные
+    # к моменту вызова. Строку, которую триггер конкурентной вставки или
+    # удаления уже обновил, UPDATE пачки дожидается и пересчитывает
+    # заново, поэтому изменение не теряется и не учитывается дважды.
+    # Счетчик блюд меню считается по блюдам, а не по счетчикам подменю,
+    # которые в этот момент еще заполняются
+    op.execute(
+        '''
+        CREATE FUNCTION submenu__count_dishes(uuid) RETURNS integer AS $$
+        BEGIN
+            RETURN (SELECT count(*) FROM dish WHERE dish.submenu_id = $1);
+        END;
+        $$ LANGUAGE plpgsql VOLATILE
+        '''
+    )
+    op.execute(
+        '''
+        CREATE FUNCTION menu__count_submenus(uuid) RETURNS integer AS $$
+        BEGIN
+            RETURN (SELECT count(*) FROM submenu WHERE submenu.menu_id = $1);
+        END;
+        $$ LANGUAGE plpgsql VOLATILE
+        '''
+    )
+    op.execute(
+        '''
+        CREATE FUNCTION menu__count_dishes(uuid) RETURNS integer AS $$
+        BEGIN
+            RETURN (
+                SELECT count(*)
+                FROM dish JOIN submenu ON submenu.id = dish.submenu_id
+                WHERE submenu.menu_id = $1
+            );
+        END;
+        $$ LANGUAGE plpgsql VOLATILE
+        '''
+    )
+
+    # Подменю заполняются первыми: триггер удаления подменю уменьшает
+    # счетчик блюд меню на счетчик удаленного подменю
+    backfill_in_batches('submenu', 'amount_of_dishes = submenu__count_dishes(id)')
+    backfill_in_batches(
+        'menu',
+        'submenus_amount = menu__count_submenus(id), dishes_amount = menu__count_dishes(id)',
+    )
+
+    op.execute('DROP FUNCTION submenu__count_dishes(uuid)')
+    op.execute('DROP FUNCTION menu__count_submenus(uuid)')
+    op.execute('DROP FUNCTION menu__count_dishes(uuid)')
+
+
+def downgrade() -> None:
+    _drop_move_triggers()
+    _drop_parent_triggers('update_parent_counters')
+
+    op.execute(
+        '''
+        CREATE FUNCTION submenu__bump_parent_versions() RETURNS trigger AS $$
+        BEGIN
+            UPDATE menu SET version = version + 1
+            WHERE id IN (SELECT menu_id FROM changed_rows);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        '''
+    )
+    op.execute(
+        '''
+        CREATE FUNCTION dish__bump_parent_versions() RETURNS trigger AS $$
+        BEGIN
+            UPDATE submenu SET version = version + 1
+            WHERE id IN (SELECT submenu_id FROM changed_rows);
+            UPDATE menu SET version = version + 1
+            WHERE id IN (
+                SELECT submenu.menu_id
+                FROM submenu JOIN changed_rows ON submenu.id = changed_rows.submenu_id
+            );
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        '''
+    )
+    _create_parent_triggers('bump_parent_versions')
+
+    op.drop_column('submenu', 'amount_of_dishes')
+    op.drop_column('menu', 'dishes_amount')
+    op.drop_column('menu', 'submenus_amount')
+
+
+def _create_parent_triggers(name: str) -> None:
+    '''Создать триггеры уровня выражения на вставку и удаление дочерних
+    строк, вызывающие функцию <таблица>__<name>
+
+    '''
+    for table in CHILD_TABLES:
+        for event, transition_table in EVENTS:
+            op.execute(
+                f'''
+                CREATE TRIGGER {table}__{event.lower()}_{name}__trg
+                AFTER {event} ON {table}
+                REFERENCING {transition_table} TABLE AS changed_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION {table}__{name}()
+                '''
+            )
+
+
+def _drop_parent_triggers(name: str) -> None:
+    '''Удалить триггеры и функцию, созданные _create_parent_triggers'''
+    for table in CHILD_TABLES:
+        for event, _ in EVENTS:
+            op.execute(f'DROP TRIGGER {table}__{event.lower()}_{name}__trg ON {table}')
+        op.execute(f'DROP FUNCTION {table}__{name}()')
+
+
+def _create_move_triggers() -> None:
+    '''Создать триггеры уровня строки на смену родителя подменю или
+    блюда: счетчики старого родителя уменьшаются, нового -- увеличиваются.
+    Условие WHEN отсекает остальные обновления без вызова функции
+
+    '''
+    op.execute(
+        '''
+        CREATE FUNCTION submenu__move_parent_counters() RETURNS trigger AS $$
+        BEGIN
+            UPDATE menu SET
+                submenus_amount = submenus_amount - 1,
+                dishes_amount = dishes_amount - OLD.amount_of_dishes
+            WHERE id = OLD.menu_id;
+            UPDATE menu SET
+                submenus_amount = submenus_amount + 1,
+                dishes_amount = dishes_amount + NEW.amount_of_dishes
+            WHERE id = NEW.menu_id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        '''
+    )
+    # Если старое и новое подменю в одном меню, счетчик меню не меняется
+    op.execute(
+        '''
+        CREATE FUNCTION dish__move_parent_counters() RETURNS trigger AS $$
+        BEGIN
+            UPDATE submenu SET amount_of_dishes = amount_of_dishes - 1
+            WHERE id = OLD.submenu_id;
+            UPDATE submenu SET amount_of_dishes = amount_of_dishes + 1
+            WHERE id = NEW.submenu_id;
+
+            UPDATE menu SET dishes_amount = dishes_amount + changes.dishes_amount
+            FROM (
+                SELECT
+                    menu_id,
+                    sum(CASE id WHEN NEW.submenu_id THEN 1 ELSE -1 END) AS dishes_amount
+                FROM submenu
+                WHERE id IN (OLD.submenu_id, NEW.submenu_id)
+                GROUP BY menu_id
+            ) AS changes
+            WHERE menu.id = changes.menu_id AND changes.dishes_amount <> 0;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        '''
+    )
+    for table, column in PARENT_COLUMNS.items():
+        op.execute(
+            f'''
+            CREATE TRIGGER {table}__update_move_parent_counters__trg
+            AFTER UPDATE OF {column} ON {table}
+            FOR EACH ROW
+            WHEN (OLD.{column} IS DISTINCT FROM NEW.{column})
+            EXECUTE FUNCTION {table}__move_parent_counters()
+            '''
+        )
+
+
+def _drop_move_triggers() -> None:
+    '''Удалить триггеры и функции, созданные _create_move_triggers'''
+    for table in PARENT_COLUMNS:
+        op.execute(f'DROP TRIGGER {table}__update_move_parent_counters__trg ON {table}')
+        op.execute(f'DROP FUNCTION {table}__move_parent_counters()')
@@ -0,0 +1,105 @@
+"""dish_price_numeric
+
+Revision ID: f5b3c8e1a7d4
+Revises: e2a95f0c6d13
+Create Date: 2026-10-18 16:25:11.307452
+
+"""
+from alembic import op
+
+from migration.helpers import backfill_in_batches, create_index_concurrently, step_timeouts
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5b3c8e1a7d4'
+down_revision = 'e2a95f0c6d13'
+branch_labels = None
+depends_on = None
+
+
+BATCH_SIZE = 5000
+LOCK_TIMEOUT = '5s'
+
+
+def upgrade() -> None:
+    '''Перевести dish.price из double precision в NUMERIC(10, 2) без
+    перезаписи таблицы под долгой блокировкой
+
+    '''
+    _replace_price_column('price_numeric', 'numeric(10, 2)', 'round({price}::numeric, 2)')
+
+
+def downgrade() -> None:
+    '''Вернуть dish.price тип double precision тем же способом'''
+    _replace_price_column('price_float', 'double precision', '{price}::double precision')
+
+
+def _replace_price_column(new_column: str, column_type: str, expression: str) -> None:
+    '''Заменить dish.price колонкой new_column типа column_type со
+    значениями expression: новая колонка заполняется пачками в отдельных
+    транзакциях, затем колонки меняются местами. Шаги, закоммиченные
+    упавшей попыткой, при повторе пропускаются или повторяются без ошибок
+
+    '''
+    op.execute(f'ALTER TABLE dish ADD COLUMN IF NOT EXISTS {new_column} {column_type}')
+
+    # Пока идет заполнение, новые и измененные строки синхронизирует триггер
+    op.execute(
+        f'''
+        CREATE OR REPLACE FUNCTION dish__sync_{new_column}() RETURNS trigger AS $$
+        BEGIN
+            NEW.{new_column} := {expression.format(price='NEW.price')};
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        '''
+    )
+    op.execute(f'DROP TRIGGER IF EXISTS dish__sync_{new_column}__trg ON dish')
+    op.execute(
+        f'''
+        CREATE TRIGGER dish__sync_{new_column}__trg
+        BEFORE INSERT OR UPDATE OF price ON dish
+        FOR EACH ROW EXECUTE FUNCTION dish__sync_{new_column}()
+        '''
+    )
+
+    backfill_in_batches(
+        'dish',
+        f'{new_column} = {expression.format(price="price")}',
+        # Строки, измененные во время заполнения, уже обработал триггер
+        where=f'{new_column} IS NULL',
+        batch_size=BATCH_SIZE,
+    )
+    create_index_concurrently(f'dish__{new_column}__idx', 'dish', [new_column])
+
+    # NOT NULL через проверенный CHECK: проверка идет без блокировки
+    # записи, а SET NOT NULL затем не сканирует таблицу
+    with op.get_context().autocommit_block():
+        op.execute(
+            f'''
+            DO $$
+            BEGIN
+                IF NOT EXISTS (
+                    SELECT FROM pg_constraint
+                    WHERE conname = 'dish__{new_column}__not_null'
+                    AND conrelid = 'dish'::regclass
+                ) THEN
+                    ALTER TABLE dish ADD CONSTRAINT dish__{new_column}__not_null
+                    CHECK ({new_column} IS NOT NULL) NOT VALID;
+                END IF;
+            END;
+            $$
+            '''
+        )
+        with step_timeouts(statement_timeout='0'):
+            op.execute(f'ALTER TABLE dish VALIDATE CONSTRAINT dish__{new_column}__not_null')
+
+    # Замена колонок -- только изменения каталога, блокировка короткая
+    with step_timeouts(lock_timeout=LOCK_TIMEOUT):
+        op.alter_column('dish', new_column, nullable=False)
+        op.drop_constraint(f'dish__{new_column}__not_null', 'dish', type_='check')
+        op.execute(f'DROP TRIGGER dish__sync_{new_column}__trg ON dish')
+        op.execute(f'DROP FUNCTION dish__sync_{new_column}()')
+        op.drop_column('dish', 'price')
+        op.alter_column('dish', new_column, new_column_name='price')
+        op.execute(f'ALTER INDEX dish__{new_column}__idx RENAME TO dish__price__idx')
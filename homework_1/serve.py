@@ -0,0 +1,39 @@
+'''Запуск API в несколько процессов-воркеров. Запуск из папки проекта:
+
+    python serve.py
+
+Каждый воркер -- отдельный процесс со своим движком БД и пулом
+соединений: движок создается и пул прогревается при старте воркера,
+а при остановке(SIGINT/SIGTERM) воркер дожидается текущих запросов
+и закрывает соединения
+
+'''
+import os
+
+import uvicorn
+
+from core.settings.settings import settings
+
+
+def main() -> None:
+    workers = settings.server.workers or os.cpu_count()
+    if workers > 1 and settings.cache.enabled and settings.cache.backend == 'memory':
+        # Запись инвалидирует кэш в памяти только своего воркера, остальные
+        # отдавали бы устаревшие данные до истечения CACHE__TTL_SECONDS
+        raise SystemExit(
+            'CACHE__BACKEND=memory works with a single worker only, '
+            'use CACHE__BACKEND=redis or SERVER__WORKERS=1',
+        )
+
+    uvicorn.run(
+        'main:app',
+        host=settings.server.host,
+        port=settings.server.port,
+        workers=workers,
+        timeout_keep_alive=settings.server.timeout_keep_alive,
+        lifespan='on',
+    )
+
+
+if __name__ == '__main__':
+    main()
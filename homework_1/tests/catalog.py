@@ -0,0 +1,118 @@
+'''Каталог меню для тестов и бенчмарков: засев пачками INSERT и удаление.
+С SQLite схема создается по моделям, поэтому UUID колонки Postgres
+компилируются для нее в CHAR(36)
+
+'''
+import random
+import uuid
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.ext.compiler import compiles
+
+from core.orm import Base
+from menu.models.dish import DishModel
+from menu.models.menu import MenuModel
+from menu.models.submenu import SubmenuModel
+
+
+SEED_CHUNK_SIZE = 5000
+
+
+@compiles(UUID, 'sqlite')
+def compile_uuid_for_sqlite(type_, compiler, **kwargs) -> str:
+    '''UUID колонки моделей в схеме SQLite'''
+    return 'CHAR(36)'
+
+
+@dataclass(frozen=True)
+class Catalog:
+    '''Идентификаторы засеянного каталога'''
+    menu_ids: list[uuid.UUID]
+    submenu_ids: list[tuple[uuid.UUID, uuid.UUID]]
+    dish_ids: list[tuple[uuid.UUID, uuid.UUID]]
+
+
+async def seed_catalog(
+    engine: AsyncEngine,
+    menus: int,
+    submenus: int,
+    dishes: int,
+    rnd: random.Random,
+) -> Catalog:
+    '''Засеять каталог пачками INSERT. Счетчики выставляются явно
+    после вставки, поэтому результат не зависит от наличия триггеров
+
+    '''
+    run_id = uuid.uuid4().hex[:8]
+    menu_rows = [
+        {'id': uuid.uuid4(), 'name': f'bench-{run_id} меню {menu_index}'}
+        for menu_index in range(menus)
+    ]
+    submenu_rows = [
+        {
+            'id': uuid.uuid4(),
+            'menu_id': menu_row['id'],
+            'name': f'bench-{run_id} подменю {menu_index}-{submenu_index}',
+        }
+        for menu_index, menu_row in enumerate(menu_rows)
+        for submenu_index in range(submenus)
+    ]
+
+    async with engine.begin() as connection:
+        await _insert_chunked(connection, MenuModel, menu_rows)
+        await _insert_chunked(connection, SubmenuModel, submenu_rows)
+
+        dish_ids = []
+        dish_rows = []
+        for submenu_index, submenu_row in enumerate(submenu_rows):
+            for dish_index in range(dishes):
+                dish_id = uuid.uuid4()
+                dish_rows.append({
+                    'id': dish_id,
+                    'submenu_id': submenu_row['id'],
+                    'name': f'bench-{run_id} блюдо {submenu_index}-{dish_index}',
+                    'price': Decimal(rnd.randint(100, 100000)) / 100,
+                })
+                dish_ids.append((submenu_row['id'], dish_id))
+            if len(dish_rows) >= SEED_CHUNK_SIZE:
+                await _insert_chunked(connection, DishModel, dish_rows)
+                dish_rows = []
+        await _insert_chunked(connection, DishModel, dish_rows)
+
+        menu_ids = [menu_row['id'] for menu_row in menu_rows]
+        await connection.execute(
+            update(SubmenuModel)
+            .where(SubmenuModel.menu_id.in_(menu_ids))
+            .values(amount_of_dishes=dishes),
+        )
+        await connection.execute(
+            update(MenuModel)
+            .where(MenuModel.id.in_(menu_ids))
+            .values(submenus_amount=submenus, dishes_amount=submenus * dishes),
+        )
+
+    return Catalog(
+        menu_ids=menu_ids,
+        submenu_ids=[(row['menu_id'], row['id']) for row in submenu_rows],
+        dish_ids=dish_ids,
+    )
+
+
+async def drop_catalog(engine: AsyncEngine, catalog: Catalog) -> None:
+    '''Удалить засеянный каталог, подменю и блюда удаляются каскадно'''
+    async with engine.begin() as connection:
+        for index in range(0, len(catalog.menu_ids), SEED_CHUNK_SIZE):
+            menu_ids = catalog.menu_ids[index:index + SEED_CHUNK_SIZE]
+            await connection.execute(
+                delete(MenuModel).where(MenuModel.id.in_(menu_ids)),
+            )
+
+
+async def _insert_chunked(connection: Any, model: type[Base], rows: list[dict]) -> None:
+    for index in range(0, len(rows), SEED_CHUNK_SIZE):
+        await connection.execute(insert(model), rows[index:index + SEED_CHUNK_SIZE])
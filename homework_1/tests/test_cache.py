@@ -0,0 +1,164 @@
+import decimal
+import uuid
+from collections.abc import AsyncIterator
+
+import fakeredis
+import httpx
+import pytest
+
+import core.repositories.unit_of_work
+from tests.catalog import Catalog
+from core.repositories.cache import (
+    CacheBackend,
+    LRUCacheBackend,
+    RedisCacheBackend,
+    RepositoryCache,
+)
+from menu.models.dish import DishModel
+from menu.models.menu import MenuModel
+from menu.models.submenu import SubmenuModel
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(params=['memory', 'redis'])
+async def backend(request: pytest.FixtureRequest) -> AsyncIterator[CacheBackend]:
+    if request.param == 'redis':
+        backend = RedisCacheBackend(fakeredis.FakeAsyncRedis(), key_prefix='test')
+    else:
+        backend = LRUCacheBackend(max_size=100)
+
+    yield backend
+
+    await backend.close()
+
+
+@pytest.fixture
+def repository_cache(backend: CacheBackend) -> RepositoryCache:
+    return RepositoryCache(backend, ttl=60, key_prefix='test')
+
+
+def make_dish() -> DishModel:
+    return DishModel(
+        id=uuid.uuid4(),
+        submenu_id=uuid.uuid4(),
+        name='Блюдо',
+        price=decimal.Decimal('12.50'),
+        version=1,
+    )
+
+
+async def test_round_trip_keeps_column_types(repository_cache: RepositoryCache) -> None:
+    dish = make_dish()
+    key = repository_cache.make_key('select_one', DishModel, conditions=(('id', dish.id),))
+    generations = await repository_cache.get_generations([DishModel])
+
+    stored = await repository_cache.set(
+        key,
+        [dish],
+        models=[DishModel],
+        generations=generations,
+        meta=[{'menu_id': dish.submenu_id, 'total': decimal.Decimal('1.5')}],
+    )
+    (cached_dish,), meta = await repository_cache.get(key, DishModel)
+
+    assert stored
+    assert cached_dish is not dish
+    assert cached_dish.id == dish.id
+    assert cached_dish.price == decimal.Decimal('12.50')
+    assert isinstance(cached_dish.price, decimal.Decimal)
+    assert meta == [{'menu_id': dish.submenu_id, 'total': decimal.Decimal('1.5')}]
+
+
+async def test_invalidation_removes_dependent_entries(repository_cache: RepositoryCache) -> None:
+    menu_key = repository_cache.make_key('select_list', MenuModel)
+    dish_key = repository_cache.make_key('select_list', DishModel)
+    for key, model in ((menu_key, MenuModel), (dish_key, DishModel)):
+        generations = await repository_cache.get_generations([model])
+        await repository_cache.set(key, [], models=[model], generations=generations)
+
+    # Изменение подменю меняет счетчики меню и каскадно удаляет блюда
+    await repository_cache.invalidate([SubmenuModel])
+
+    assert await repository_cache.get(menu_key, MenuModel) is None
+    assert await repository_cache.get(dish_key, DishModel) is None
+
+
+async def test_result_read_before_invalidation_is_not_stored(
+    repository_cache: RepositoryCache,
+) -> None:
+    key = repository_cache.make_key('select_list', MenuModel)
+    generations = await repository_cache.get_generations([MenuModel, SubmenuModel])
+
+    # Запись в БД и инвалидация произошли, пока результат читался из БД
+    await repository_cache.invalidate([DishModel])
+    stored = await repository_cache.set(
+        key,
+        [],
+        models=[MenuModel, SubmenuModel],
+        generations=generations,
+    )
+
+    assert not stored
+    assert await repository_cache.get(key, MenuModel) is None
+
+
+async def test_redis_invalidation_retries_when_tag_changes() -> None:
+    client = fakeredis.FakeAsyncRedis()
+    backend = RedisCacheBackend(client, key_prefix='test')
+    generations = await backend.get_generations(['menu'])
+    await backend.set('first', 1, ttl=60, tags=['menu'], generations=generations)
+
+    create_pipeline = client.pipeline
+    concurrent_writes = []
+
+    def create_racing_pipeline(*args, **kwargs):
+        '''Pipeline, в котором после чтения множества тега другой клиент
+        успевает сохранить новую запись с этим тегом
+
+        '''
+        pipeline = create_pipeline(*args, **kwargs)
+        read_members = pipeline.smembers
+
+        async def smembers(name):
+            members = await read_members(name)
+            if not concurrent_writes:
+                concurrent_writes.append(name)
+                await client.set('second', b'2')
+                await client.sadd(name, 'second')
+            return members
+
+        pipeline.smembers = smembers
+        return pipeline
+
+    client.pipeline = create_racing_pipeline
+    await backend.invalidate_tags(['menu'])
+
+    assert concurrent_writes
+    assert await client.get('first') is None
+    assert await client.get('second') is None
+    assert await backend.get_generations(['menu']) == (1,)
+
+
+async def test_api_reads_fresh_data_after_write(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    repository_cache = RepositoryCache(LRUCacheBackend(max_size=100), ttl=60, key_prefix='test')
+    monkeypatch.setattr(
+        core.repositories.unit_of_work,
+        'get_repository_cache',
+        lambda: repository_cache,
+    )
+
+    first_page = (await client.get('/menus')).json()
+    assert (await client.get('/menus')).json() == first_page
+
+    created = await client.post('/menus', json={'name': 'Новое меню'})
+    assert created.is_success
+
+    ids = [menu['id'] for menu in (await client.get('/menus')).json()['items']]
+    assert created.json()['id'] in ids
+    assert len(ids) == len(first_page['items']) + 1
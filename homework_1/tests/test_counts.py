@@ -0,0 +1,91 @@
+import httpx
+import pytest
+from sqlalchemy import event, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from conftest import postgres
+from tests.catalog import Catalog
+from menu.models.dish import DishModel
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_menu_and_submenu_counts_are_read_in_one_statement(
+    client: httpx.AsyncClient,
+    engine: AsyncEngine,
+    catalog: Catalog,
+) -> None:
+    menu_id, submenu_id = catalog.submenu_ids[0]
+    statements = []
+
+    def count_statement(*args) -> None:
+        statements.append(args[2])
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', count_statement)
+    try:
+        menu = (await client.get(f'/menus/{menu_id}')).json()
+        menu_statements = len(statements)
+        submenu = (await client.get(f'/menus/{menu_id}/submenus/{submenu_id}')).json()
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', count_statement)
+
+    assert (menu['submenus_amount'], menu['dishes_amount']) == (2, 4)
+    assert submenu['amount_of_dishes'] == 2
+    assert menu_statements == 1
+    assert len(statements) == 2
+
+
+@postgres
+async def test_triggers_keep_counts_after_writes(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+) -> None:
+    menu_id = catalog.menu_ids[0]
+
+    submenu = (await client.post(f'/menus/{menu_id}/submenus', json={'name': 'new'})).json()
+    dish = (
+        await client.post(
+            f'/submenus/{submenu["id"]}/dishes',
+            json={'name': 'new', 'price': '1.50'},
+        )
+    ).json()
+
+    menu = (await client.get(f'/menus/{menu_id}')).json()
+    assert (menu['submenus_amount'], menu['dishes_amount']) == (3, 5)
+    submenu = (await client.get(f'/menus/{menu_id}/submenus/{submenu["id"]}')).json()
+    assert submenu['amount_of_dishes'] == 1
+
+    await client.delete(f'/submenus/{submenu["id"]}/dishes/{dish["id"]}')
+
+    menu = (await client.get(f'/menus/{menu_id}')).json()
+    assert (menu['submenus_amount'], menu['dishes_amount']) == (3, 4)
+
+
+@postgres
+async def test_triggers_follow_dish_moved_to_other_menu(
+    client: httpx.AsyncClient,
+    engine: AsyncEngine,
+    catalog: Catalog,
+) -> None:
+    source_submenu_id, dish_id = catalog.dish_ids[0]
+    target_menu_id, target_submenu_id = catalog.submenu_ids[-1]
+    source_menu_id = catalog.menu_ids[0]
+
+    async with engine.begin() as connection:
+        await connection.execute(
+            update(DishModel)
+            .where(DishModel.id == dish_id)
+            .values(submenu_id=target_submenu_id),
+        )
+
+    source_menu = (await client.get(f'/menus/{source_menu_id}')).json()
+    target_menu = (await client.get(f'/menus/{target_menu_id}')).json()
+    source_submenu = (
+        await client.get(f'/menus/{source_menu_id}/submenus/{source_submenu_id}')
+    ).json()
+    target_submenu = (
+        await client.get(f'/menus/{target_menu_id}/submenus/{target_submenu_id}')
+    ).json()
+    assert (source_menu['dishes_amount'], target_menu['dishes_amount']) == (3, 5)
+    assert (source_submenu['amount_of_dishes'], target_submenu['amount_of_dishes']) == (1, 3)
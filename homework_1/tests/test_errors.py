@@ -0,0 +1,104 @@
+import uuid
+
+import httpx
+import pytest
+
+from conftest import postgres
+from tests.catalog import Catalog
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_get_missing_menu_returns_404(client: httpx.AsyncClient, catalog: Catalog) -> None:
+    menu_id = uuid.uuid4()
+
+    response = await client.get(f'/menus/{menu_id}')
+
+    assert response.status_code == 404
+    assert response.json()['code'] == 'RESOURCENOTFOUND'
+    assert response.json()['details'] == {'conditions': {'id': str(menu_id)}}
+
+
+async def test_get_missing_submenu_and_dish_return_404(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+) -> None:
+    menu_id, submenu_id = catalog.submenu_ids[0]
+
+    submenu_response = await client.get(f'/menus/{menu_id}/submenus/{uuid.uuid4()}')
+    dish_response = await client.get(f'/submenus/{submenu_id}/dishes/{uuid.uuid4()}')
+
+    assert submenu_response.status_code == 404
+    assert dish_response.status_code == 404
+
+
+@postgres
+async def test_delete_missing_menu_returns_404(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+) -> None:
+    response = await client.delete(f'/menus/{uuid.uuid4()}')
+
+    assert response.status_code == 404
+    assert response.json()['code'] == 'RESOURCENOTFOUND'
+
+
+@postgres
+async def test_delete_menu_reports_cascade_counts(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+) -> None:
+    response = await client.delete(f'/menus/{catalog.menu_ids[0]}')
+
+    assert response.status_code == 200
+    assert response.json() == {'deleted': {'menu': 1, 'submenu': 2, 'dish': 4}}
+
+
+async def test_bulk_create_conflicts_return_409_with_row_indexes(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+) -> None:
+    submenu_id, existing_dish_id = catalog.dish_ids[0]
+    existing_dish = (await client.get(f'/submenus/{submenu_id}/dishes/{existing_dish_id}')).json()
+
+    response = await client.post(
+        f'/submenus/{submenu_id}/dishes/bulk',
+        json=[
+            {'name': 'Новое блюдо', 'price': '10.00'},
+            {'name': existing_dish['name'], 'price': '20.00'},
+            {'name': 'Новое блюдо', 'price': '30.00'},
+        ],
+    )
+
+    assert response.status_code == 409
+    assert response.json()['code'] == 'RESOURCECONFLICT'
+    assert response.json()['details'] == {
+        'errors': [
+            {'index': 1, 'constraint': 'dish__name__uniq', 'existing_id': str(existing_dish_id)},
+            {'index': 2, 'constraint': 'dish__name__uniq', 'duplicate_of_index': 0},
+        ],
+    }
+
+
+async def test_bulk_update_conflict_returns_409_with_row_index(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+) -> None:
+    (submenu_id, first_dish_id), (_, second_dish_id) = catalog.dish_ids[:2]
+    second_dish = (await client.get(f'/submenus/{submenu_id}/dishes/{second_dish_id}')).json()
+
+    response = await client.patch(
+        f'/submenus/{submenu_id}/dishes/bulk',
+        json=[
+            {'id': str(second_dish_id), 'price': '15.00'},
+            {'id': str(first_dish_id), 'name': second_dish['name']},
+        ],
+    )
+
+    assert response.status_code == 409
+    assert response.json()['details'] == {
+        'errors': [
+            {'index': 1, 'constraint': 'dish__name__uniq', 'existing_id': str(second_dish_id)},
+        ],
+    }
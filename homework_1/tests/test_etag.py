@@ -0,0 +1,61 @@
+import httpx
+import pytest
+
+from conftest import postgres
+from tests.catalog import Catalog
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize('make_header', [lambda etag: etag, lambda etag: f'"other", W/{etag}'])
+async def test_matching_etag_returns_304(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+    make_header,
+) -> None:
+    menu_id, submenu_id = catalog.submenu_ids[0]
+
+    for path in (
+        f'/menus/{menu_id}',
+        f'/menus/{menu_id}/submenus/{submenu_id}',
+        '/menus',
+        f'/menus/{menu_id}/submenus',
+    ):
+        etag = (await client.get(path)).headers['ETag']
+
+        response = await client.get(path, headers={'If-None-Match': make_header(etag)})
+
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert response.content == b''
+
+
+async def test_other_etag_returns_body(client: httpx.AsyncClient, catalog: Catalog) -> None:
+    response = await client.get(f'/menus/{catalog.menu_ids[0]}', headers={'If-None-Match': '"x"'})
+
+    assert response.status_code == 200
+    assert response.json()['id'] == str(catalog.menu_ids[0])
+
+
+async def test_page_etag_depends_on_page(client: httpx.AsyncClient, catalog: Catalog) -> None:
+    first_page = await client.get('/menus', params={'limit': 1})
+    second_page = await client.get(
+        '/menus',
+        params={'limit': 1, 'cursor': first_page.json()['next_cursor']},
+    )
+
+    assert first_page.headers['ETag'] != second_page.headers['ETag']
+
+
+@postgres
+async def test_update_changes_etag(client: httpx.AsyncClient, catalog: Catalog) -> None:
+    path = f'/menus/{catalog.menu_ids[0]}'
+    etag = (await client.get(path)).headers['ETag']
+
+    await client.patch(path, json={'name': 'renamed'})
+    response = await client.get(path, headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.json()['name'] == 'renamed'
+    assert response.headers['ETag'] != etag
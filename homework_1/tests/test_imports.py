@@ -0,0 +1,5 @@
+from benchmarks.imports import reads_settings_on_import
+
+
+def test_importing_app_does_not_read_settings() -> None:
+    assert not reads_settings_on_import('main')
@@ -0,0 +1,19 @@
+import pytest
+
+import main
+from core.settings.settings import get_settings
+
+
+@pytest.mark.parametrize('enabled', [False, True])
+def test_internal_routes_follow_settings(monkeypatch: pytest.MonkeyPatch, enabled: bool) -> None:
+    settings = get_settings()
+    settings = settings.copy(update={
+        'app': settings.app.copy(update={'internal_routes_enabled': enabled}),
+        'single_flight': settings.single_flight.copy(update={'enabled': True}),
+    })
+    monkeypatch.setattr(main, 'get_settings', lambda: settings)
+
+    paths = {route.path for route in main.create_app().routes}
+
+    assert ('/internal/db-pool' in paths) is enabled
+    assert ('/internal/single-flight' in paths) is enabled
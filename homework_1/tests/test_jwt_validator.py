@@ -0,0 +1,34 @@
+import pytest
+
+import core.utils.jwt_validator
+from core.settings.jwt import JWTSettings
+from core.utils.jwt_validator import JWTValidator, get_jwt_validator
+
+
+def test_revoked_subjects_are_pruned_after_token_lifetime(monkeypatch: pytest.MonkeyPatch) -> None:
+    validator = JWTValidator(
+        JWTSettings(
+            access_token_exp_in_time_period='minutes',
+            access_token_exp_in_value=15,
+            refresh_token_exp_in_time_period='hours',
+            refresh_token_exp_in_value=1,
+        ),
+    )
+    now = 1_000_000.0
+    monkeypatch.setattr(core.utils.jwt_validator.time, 'time', lambda: now)
+    validator.revoke_subject('old')
+
+    # Токены, выпущенные до отзыва, живут не больше часа
+    now += 3600
+    validator.revoke_subject('new')
+
+    assert validator._revoked_subjects == {'new': now}
+
+
+def test_validator_is_recreated_in_forked_process(monkeypatch: pytest.MonkeyPatch) -> None:
+    validator = get_jwt_validator()
+    assert get_jwt_validator() is validator
+
+    monkeypatch.setattr(core.utils.jwt_validator.os, 'getpid', lambda: -1)
+
+    assert get_jwt_validator() is not validator
@@ -0,0 +1,93 @@
+'''Миграции на Postgres из TEST_DATABASE_URL. Тесты откатывают схему и
+накатывают ее обратно до head, поэтому БД после них остается в том же
+состоянии
+
+'''
+import argparse
+import os
+from decimal import Decimal
+
+import anyio
+import pytest
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from conftest import postgres
+from tests.catalog import Catalog
+from menu.models.dish import DishModel
+from menu.models.menu import MenuModel
+from menu.models.submenu import SubmenuModel
+
+
+pytestmark = [pytest.mark.anyio, postgres]
+
+BEFORE_COUNTERS = 'c41d7e9a2b58'
+
+
+def make_alembic_config() -> Config:
+    return Config(
+        'alembic.ini',
+        cmd_opts=argparse.Namespace(x=[f'db_url={os.environ["TEST_DATABASE_URL"]}']),
+    )
+
+
+async def run_alembic(action, revision: str) -> None:
+    '''env.py сам запускает цикл событий, поэтому alembic идет в потоке'''
+    await anyio.to_thread.run_sync(action, make_alembic_config(), revision)
+
+
+async def read_revision(engine: AsyncEngine) -> str | None:
+    async with engine.connect() as connection:
+        return await connection.scalar(text('SELECT version_num FROM alembic_version'))
+
+
+async def test_counters_and_prices_survive_downgrade_and_upgrade(
+    engine: AsyncEngine,
+    catalog: Catalog,
+) -> None:
+    async with engine.connect() as connection:
+        prices = dict((await connection.execute(select(DishModel.id, DishModel.price))).all())
+
+    await run_alembic(command.downgrade, BEFORE_COUNTERS)
+    await run_alembic(command.upgrade, 'head')
+
+    async with engine.connect() as connection:
+        menus = (
+            await connection.execute(
+                select(MenuModel.submenus_amount, MenuModel.dishes_amount)
+                .where(MenuModel.id.in_(catalog.menu_ids)),
+            )
+        ).all()
+        submenus = (
+            await connection.execute(
+                select(SubmenuModel.amount_of_dishes)
+                .where(SubmenuModel.menu_id.in_(catalog.menu_ids)),
+            )
+        ).scalars().all()
+        new_prices = dict((await connection.execute(select(DishModel.id, DishModel.price))).all())
+
+    assert menus == [(2, 4)] * len(catalog.menu_ids)
+    assert submenus == [2] * len(catalog.submenu_ids)
+    assert new_prices == prices
+    assert all(isinstance(price, Decimal) for price in new_prices.values())
+
+
+async def test_downgrade_to_base_and_upgrade_again(engine: AsyncEngine) -> None:
+    head = ScriptDirectory.from_config(make_alembic_config()).get_current_head()
+
+    await run_alembic(command.downgrade, 'base')
+    assert await read_revision(engine) is None
+
+    await run_alembic(command.upgrade, 'head')
+    assert await read_revision(engine) == head
+
+
+async def test_upgrade_is_noop_at_head(engine: AsyncEngine) -> None:
+    revision = await read_revision(engine)
+
+    await run_alembic(command.upgrade, 'head')
+
+    assert await read_revision(engine) == revision
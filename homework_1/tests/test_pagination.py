@@ -0,0 +1,66 @@
+import base64
+import json
+
+import httpx
+import pytest
+
+from tests.catalog import Catalog
+from core.settings.settings import settings
+
+
+pytestmark = pytest.mark.anyio
+
+
+def make_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+async def test_pages_follow_cursor_in_name_order(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+) -> None:
+    menu_id = catalog.menu_ids[0]
+    submenu_id = catalog.submenu_ids[0][1]
+
+    for path, total in ((f'/menus/{menu_id}/submenus', 2), (f'/submenus/{submenu_id}/dishes', 2)):
+        first_page = (await client.get(path, params={'limit': 1})).json()
+        second_page = (
+            await client.get(path, params={'limit': 1, 'cursor': first_page['next_cursor']})
+        ).json()
+
+        assert len(first_page['items']) == len(second_page['items']) == 1
+        assert first_page['items'][0]['name'] < second_page['items'][0]['name']
+        assert second_page['next_cursor'] is None
+        everything = (await client.get(path, params={'limit': total})).json()
+        assert everything['items'] == first_page['items'] + second_page['items']
+
+
+@pytest.mark.parametrize(
+    'cursor',
+    [
+        'not a cursor',
+        make_cursor(['name']),
+        make_cursor(['name', 'not-a-uuid']),
+        make_cursor(['name', {'id': 1}]),
+        make_cursor({'name': 'id'}),
+    ],
+)
+async def test_bad_cursor_returns_400(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+    cursor: str,
+) -> None:
+    response = await client.get('/menus', params={'cursor': cursor})
+
+    assert response.status_code == 400
+    assert response.json()['code'] == 'BADREQUEST'
+    assert response.json()['details'] == {'cursor': cursor}
+
+
+async def test_limit_over_max_returns_400(client: httpx.AsyncClient, catalog: Catalog) -> None:
+    limit = settings.app.page_size_max + 1
+
+    response = await client.get('/menus', params={'limit': limit})
+
+    assert response.status_code == 400
+    assert response.json()['details'] == {'limit': limit}
@@ -0,0 +1,21 @@
+import uuid
+from decimal import Decimal
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from menu.models.dish import DishModel
+from menu.schemas.dish import DishReadSchema, dish_read_serializer
+
+
+@pytest.mark.parametrize(
+    'price',
+    [Decimal('772117'), Decimal('772117.00'), Decimal('0.50'), Decimal('999999.99')],
+)
+def test_fast_dish_response_matches_jsonable_encoder(price: Decimal) -> None:
+    dish = DishModel(id=uuid.uuid4(), name='Борщ', price=price, submenu_id=uuid.uuid4())
+
+    expected = JSONResponse(jsonable_encoder(DishReadSchema.from_orm(dish))).body
+
+    assert dish_read_serializer.response(dish).body == expected
@@ -0,0 +1,215 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
+
+import fakeredis
+import httpx
+import pytest
+from fastapi import APIRouter, BackgroundTasks, Depends, FastAPI
+from fastapi.responses import StreamingResponse
+
+import core.utils.single_flight
+from core.settings.single_flight import SingleFlightSettings
+from core.utils.single_flight import Flight, SingleFlight, SingleFlightRoute
+
+
+pytestmark = pytest.mark.anyio
+
+
+class Endpoint:
+    '''Эндпоинт, который ждет release и записывает открытие и закрытие
+    своей зависимости(как сессии БД)
+
+    '''
+    def __init__(self) -> None:
+        self.calls = 0
+        self.background_calls = 0
+        self.entered = asyncio.Event()
+        self.release = asyncio.Event()
+        self.events: list[str] = []
+
+    async def session(self) -> AsyncIterator[str]:
+        self.events.append('open')
+        yield 'session'
+        self.events.append('close')
+
+    def create_app(self) -> FastAPI:
+        router = APIRouter(route_class=SingleFlightRoute)
+
+        @router.get('/items')
+        async def read_items(session: str = Depends(self.session)) -> dict:
+            self.calls += 1
+            self.entered.set()
+            await self.release.wait()
+            return {'session': session, 'calls': self.calls}
+
+        @router.post('/items')
+        async def create_item() -> dict:
+            return {}
+
+        @router.get('/export')
+        async def export_items(session: str = Depends(self.session)) -> StreamingResponse:
+            self.calls += 1
+            self.entered.set()
+            await self.release.wait()
+
+            async def generate_lines():
+                yield f'{session}\n'
+
+            return StreamingResponse(generate_lines())
+
+        @router.get('/audited-items')
+        async def read_audited_items(background_tasks: BackgroundTasks) -> dict:
+            self.calls += 1
+            self.entered.set()
+            background_tasks.add_task(self.audit)
+            await self.release.wait()
+            return {'calls': self.calls}
+
+        app = FastAPI()
+        app.include_router(router)
+
+        return app
+
+
+    def audit(self) -> None:
+        self.background_calls += 1
+
+
+@pytest.fixture
+def endpoint() -> Endpoint:
+    return Endpoint()
+
+
+@pytest.fixture
+def single_flight(monkeypatch: pytest.MonkeyPatch) -> SingleFlight:
+    single_flight = SingleFlight(SingleFlightSettings(enabled=True, window_ms=10000))
+    monkeypatch.setattr(core.utils.single_flight, 'get_single_flight', lambda: single_flight)
+
+    return single_flight
+
+
+@pytest.fixture
+async def client(endpoint: Endpoint) -> AsyncIterator[httpx.AsyncClient]:
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=endpoint.create_app()),
+        base_url='http://test',
+    ) as client:
+        yield client
+
+
+async def test_concurrent_reads_share_one_call(
+    client: httpx.AsyncClient,
+    endpoint: Endpoint,
+    single_flight: SingleFlight,
+) -> None:
+    leader = asyncio.create_task(client.get('/items'))
+    await endpoint.entered.wait()
+    follower = asyncio.create_task(client.get('/items'))
+    await asyncio.sleep(0.01)
+    endpoint.release.set()
+
+    responses = await asyncio.gather(leader, follower)
+
+    assert [response.json() for response in responses] == [{'session': 'session', 'calls': 1}] * 2
+    assert endpoint.calls == 1
+    assert endpoint.events == ['open', 'close']
+    assert single_flight.get_statistics() == {'in_flight': 0, 'leaders': 1, 'followers': 1}
+
+
+async def test_streaming_endpoint_is_called_once_per_request(
+    client: httpx.AsyncClient,
+    endpoint: Endpoint,
+    single_flight: SingleFlight,
+) -> None:
+    first = asyncio.create_task(client.get('/export'))
+    await endpoint.entered.wait()
+    second = asyncio.create_task(client.get('/export'))
+    await asyncio.sleep(0.01)
+    endpoint.release.set()
+
+    responses = await asyncio.gather(first, second)
+
+    assert [response.text for response in responses] == ['session\n'] * 2
+    assert endpoint.calls == 2
+    assert sorted(endpoint.events) == ['close', 'close', 'open', 'open']
+    assert single_flight.get_statistics()['leaders'] == 0
+
+
+async def test_background_tasks_run_once_for_shared_call(
+    client: httpx.AsyncClient,
+    endpoint: Endpoint,
+    single_flight: SingleFlight,
+) -> None:
+    leader = asyncio.create_task(client.get('/audited-items'))
+    await endpoint.entered.wait()
+    follower = asyncio.create_task(client.get('/audited-items'))
+    await asyncio.sleep(0.01)
+    endpoint.release.set()
+
+    responses = await asyncio.gather(leader, follower)
+
+    assert [response.json() for response in responses] == [{'calls': 1}] * 2
+    assert endpoint.calls == 1
+    assert endpoint.background_calls == 1
+
+
+async def test_cancelled_leader_does_not_close_shared_session(
+    client: httpx.AsyncClient,
+    endpoint: Endpoint,
+    single_flight: SingleFlight,
+) -> None:
+    leader = asyncio.create_task(client.get('/items'))
+    await endpoint.entered.wait()
+    follower = asyncio.create_task(client.get('/items'))
+    await asyncio.sleep(0.01)
+
+    # Клиент первого запроса отключился, пока общий вызов читает данные
+    leader.cancel()
+    await asyncio.sleep(0.01)
+    assert endpoint.events == ['open']
+
+    endpoint.release.set()
+    response = await follower
+
+    assert response.status_code == 200
+    assert endpoint.events == ['open', 'close']
+
+
+async def test_reads_after_write_do_not_join_earlier_call(
+    client: httpx.AsyncClient,
+    endpoint: Endpoint,
+    single_flight: SingleFlight,
+) -> None:
+    first = asyncio.create_task(client.get('/items'))
+    await endpoint.entered.wait()
+
+    await client.post('/items')
+    second = asyncio.create_task(client.get('/items'))
+    await asyncio.sleep(0.01)
+    endpoint.release.set()
+    await asyncio.gather(first, second)
+
+    assert endpoint.calls == 2
+    assert single_flight.get_statistics()['followers'] == 0
+
+
+async def test_write_generation_is_shared_through_redis() -> None:
+    settings = SingleFlightSettings(enabled=True, window_ms=10000)
+    redis_client = fakeredis.FakeAsyncRedis()
+    worker = SingleFlight(settings, redis_client)
+    other_worker = SingleFlight(settings, redis_client)
+    release = asyncio.Event()
+    flight = Flight(
+        task=asyncio.create_task(release.wait()),
+        started_at=time.monotonic(),
+        generation=await worker._get_generation(),
+    )
+    assert await worker._can_join(flight)
+
+    # Запрос на запись завершился в другом воркере
+    await other_worker._finish_write()
+
+    assert not await worker._can_join(flight)
+    release.set()
+    await flight.task
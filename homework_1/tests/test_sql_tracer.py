@@ -0,0 +1,27 @@
+import pytest
+from sqlalchemy import event, select, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from tests.catalog import Catalog
+from core.settings.sql_tracing import SQLTracingSettings
+from core.utils.sql_tracer import SQLTracer
+from menu.models.submenu import SubmenuModel
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_row_count(engine: AsyncEngine, catalog: Catalog) -> None:
+    sql_tracer = SQLTracer(SQLTracingSettings(enabled=True, sample_rate=1, sink='buffer'))
+    sql_tracer.instrument(engine.sync_engine)
+    try:
+        async with engine.connect() as connection:
+            submenus = (await connection.execute(select(SubmenuModel.id))).all()
+            await connection.execute(update(SubmenuModel).values(name=SubmenuModel.name))
+    finally:
+        event.remove(engine.sync_engine, 'before_cursor_execute', sql_tracer._before_cursor_execute)
+        event.remove(engine.sync_engine, 'after_cursor_execute', sql_tracer._after_cursor_execute)
+
+    # Для SELECT драйвер не сообщает rowcount, для UPDATE -- измененные строки
+    assert len(submenus) == len(catalog.submenu_ids)
+    assert [record.row_count for record in sql_tracer.records] == [None, len(submenus)]
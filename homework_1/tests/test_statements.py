@@ -0,0 +1,75 @@
+import httpx
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from conftest import postgres
+from tests.catalog import Catalog
+
+from core.repositories.base import Repository
+from core.repositories.enums import SQLOperators
+from core.repositories.statements import (
+    conditions_params,
+    conditions_shape,
+    prefix_upper_bound,
+)
+from menu.models.dish import DishModel
+
+
+@pytest.mark.parametrize(
+    ('prefix', 'upper_bound'),
+    [
+        ('Борщ', 'Борщ'[:-1] + chr(ord('щ') + 1)),
+        ('a\uD7FF', 'a\uE000'),
+        ('a\U0010FFFF', 'b'),
+        ('ab\U0010FFFF\U0010FFFF', 'ac'),
+        ('\U0010FFFF', None),
+    ],
+)
+def test_prefix_upper_bound(prefix: str, upper_bound: str | None) -> None:
+    assert prefix_upper_bound(prefix) == upper_bound
+
+
+@pytest.mark.parametrize('prefix', ['a', 'я', '\uD7FF', 'z\U0010FFFF'])
+def test_prefix_upper_bound_is_above_prefixed_strings(prefix: str) -> None:
+    upper_bound = prefix_upper_bound(prefix)
+
+    for value in (prefix, prefix + '\x01', prefix + '\U0010FFFF' * 3):
+        assert value.encode() < upper_bound.encode()
+
+
+def test_prefix_without_upper_bound_is_searched_by_like_only() -> None:
+    conditions = [('name', SQLOperators.STARTSWITH, '\U0010FFFF')]
+
+    query = Repository._parse_conditions(DishModel, conditions)
+    params = conditions_params(conditions, 'where')
+
+    assert conditions_shape(conditions) != conditions_shape(
+        [('name', SQLOperators.STARTSWITH, 'a')],
+    )
+    compiled = [str(condition.compile(dialect=postgresql.dialect())) for condition in query]
+    assert not any('~<~' in condition for condition in compiled)
+    assert 'where_0_high' not in params
+
+
+@postgres
+@pytest.mark.anyio
+@pytest.mark.parametrize('suffix', ['', '\uD7FF', '\U0010FFFF'])
+async def test_dishes_filtered_by_name_prefix(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+    suffix: str,
+) -> None:
+    submenu_id, dish_id = catalog.dish_ids[0]
+    dish = (await client.get(f'/submenus/{submenu_id}/dishes/{dish_id}')).json()
+    await client.patch(
+        f'/submenus/{submenu_id}/dishes/{dish_id}',
+        json={'name': dish['name'] + suffix},
+    )
+
+    response = await client.get(
+        f'/submenus/{submenu_id}/dishes',
+        params={'name_prefix': dish['name'] + suffix},
+    )
+
+    assert response.status_code == 200
+    assert [item['id'] for item in response.json()['items']] == [str(dish_id)]
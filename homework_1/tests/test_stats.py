@@ -0,0 +1,84 @@
+import uuid
+
+import httpx
+import pytest
+
+from tests.catalog import Catalog
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_menu_stats_count_all_dishes(client: httpx.AsyncClient, catalog: Catalog) -> None:
+    menu_id = catalog.menu_ids[0]
+
+    response = await client.get(f'/menus/{menu_id}/stats', params={'price_buckets': ['500']})
+
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats['id'] == str(menu_id)
+    assert stats['dishes_count'] == 4
+    assert sum(bucket['dishes_count'] for bucket in stats['buckets']) == 4
+    assert [(bucket['lower'], bucket['upper']) for bucket in stats['buckets']] == [
+        (0, 500),
+        (500, None),
+    ]
+
+
+async def test_several_menus_stats_keep_requested_order(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+) -> None:
+    menu_ids = [str(menu_id) for menu_id in reversed(catalog.menu_ids)]
+
+    response = await client.get('/menus/stats', params={'ids': menu_ids})
+
+    assert [stats['id'] for stats in response.json()] == menu_ids
+
+
+async def test_stats_of_missing_menus_return_404(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+) -> None:
+    missing_id = str(uuid.uuid4())
+
+    single_response = await client.get(f'/menus/{missing_id}/stats')
+    many_response = await client.get(
+        '/menus/stats',
+        params={'ids': [str(catalog.menu_ids[0]), missing_id]},
+    )
+
+    assert single_response.status_code == many_response.status_code == 404
+    assert many_response.json()['details'] == {'ids': [missing_id]}
+
+
+async def test_stats_of_missing_submenu_return_404(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+) -> None:
+    menu_id, submenu_id = catalog.submenu_ids[0]
+    other_menu_id = catalog.menu_ids[1]
+
+    assert (await client.get(f'/menus/{menu_id}/submenus/{submenu_id}/stats')).status_code == 200
+    response = await client.get(f'/menus/{other_menu_id}/submenus/{submenu_id}/stats')
+
+    assert response.status_code == 404
+    assert response.json()['code'] == 'RESOURCENOTFOUND'
+
+
+@pytest.mark.parametrize(
+    'price_buckets',
+    [['500', '100'], ['100', '100'], ['0'], [str(bound) for bound in range(1, 52)]],
+)
+async def test_invalid_price_buckets_return_400(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+    price_buckets: list[str],
+) -> None:
+    response = await client.get(
+        f'/menus/{catalog.menu_ids[0]}/stats',
+        params={'price_buckets': price_buckets},
+    )
+
+    assert response.status_code == 400
+    assert response.json()['code'] == 'BADREQUEST'
@@ -0,0 +1,60 @@
+import json
+import uuid
+
+import httpx
+import pytest
+
+from tests.catalog import Catalog
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_menu_tree_is_streamed_as_one_json_object(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+) -> None:
+    menu_id = catalog.menu_ids[0]
+
+    response = await client.get(f'/menus/{menu_id}/tree')
+
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/json'
+    tree = response.json()
+    assert tree['id'] == str(menu_id)
+    assert [submenu['id'] for submenu in tree['submenus']] == [
+        str(submenu_id)
+        for tree_menu_id, submenu_id in catalog.submenu_ids
+        if tree_menu_id == menu_id
+    ]
+    assert all(len(submenu['dishes']) == 2 for submenu in tree['submenus'])
+
+
+async def test_menu_tree_without_submenus(client: httpx.AsyncClient) -> None:
+    menu = (await client.post('/menus', json={'name': 'Пустое меню'})).json()
+
+    response = await client.get(f'/menus/{menu["id"]}/tree')
+
+    assert response.json() == {'name': 'Пустое меню', 'id': menu['id'], 'submenus': []}
+
+
+async def test_missing_menu_tree_returns_404(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+) -> None:
+    response = await client.get(f'/menus/{uuid.uuid4()}/tree')
+
+    assert response.status_code == 404
+    assert response.json()['code'] == 'RESOURCENOTFOUND'
+
+
+async def test_tree_export_is_ndjson_with_menu_per_line(
+    client: httpx.AsyncClient,
+    catalog: Catalog,
+) -> None:
+    response = await client.get('/menus/tree')
+
+    menus = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(menu['id'] for menu in menus) == sorted(map(str, catalog.menu_ids))
+    for menu in menus:
+        assert menu == (await client.get(f'/menus/{menu["id"]}/tree')).json()
@@ -0,0 +1,80 @@
+from collections.abc import AsyncIterator
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from tests.catalog import Catalog
+from core.repositories.enums import SQLOperators
+from core.repositories.unit_of_work import UnitOfWork
+from menu.models.dish import DishModel
+from menu.models.menu import MenuModel
+from menu.models.submenu import SubmenuModel
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def unit_of_work(engine: AsyncEngine) -> AsyncIterator[UnitOfWork]:
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as db_session:
+        async with UnitOfWork(db_session, cache=None) as unit_of_work:
+            yield unit_of_work
+
+
+@pytest.fixture
+def statements(engine: AsyncEngine) -> list[str]:
+    '''SQL запросы, выполненные движком во время теста'''
+    executed = []
+
+    def record(connection, cursor, statement, *args) -> None:
+        executed.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', record)
+
+    return executed
+
+
+def by_id(obj_id) -> tuple:
+    return (('id', SQLOperators.EQ, obj_id),)
+
+
+async def test_repeated_reads_use_identity_map(
+    unit_of_work: UnitOfWork,
+    catalog: Catalog,
+    statements: list[str],
+) -> None:
+    repository = unit_of_work.repository
+    menu = await repository.select_one(model=MenuModel, conditions=by_id(catalog.menu_ids[0]))
+    statements.clear()
+
+    assert await repository.select_one(model=MenuModel, conditions=by_id(menu.id)) is menu
+    assert await repository.select_version(model=MenuModel, conditions=by_id(menu.id)) == 1
+    assert statements == []
+
+
+async def test_commit_expires_only_parents_of_created_objects(
+    unit_of_work: UnitOfWork,
+    catalog: Catalog,
+    statements: list[str],
+) -> None:
+    repository = unit_of_work.repository
+    menu_id, submenu_id = catalog.submenu_ids[0]
+    _, dish_id = catalog.dish_ids[-1]
+    menu = await repository.select_one(model=MenuModel, conditions=by_id(menu_id))
+    submenu = await repository.select_one(model=SubmenuModel, conditions=by_id(submenu_id))
+    dish = await repository.select_one(model=DishModel, conditions=by_id(dish_id))
+
+    created = unit_of_work.add(SubmenuModel, {'menu_id': menu_id, 'name': 'Новое подменю'})
+    await unit_of_work.commit()
+    statements.clear()
+
+    # Создание подменю меняет счетчики меню, подменю и блюда не затронуты
+    assert created.name == 'Новое подменю'
+    assert await repository.select_one(model=DishModel, conditions=by_id(dish_id)) is dish
+    assert statements == []
+    assert await repository.select_one(model=MenuModel, conditions=by_id(menu_id)) is menu
+    assert len(statements) == 1
+    assert submenu in unit_of_work.session.identity_map.values()